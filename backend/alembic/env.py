@@ -0,0 +1,73 @@
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.database import db_url
+from app.db.models import Base
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Структуры полнотекстового поиска создает миграция 0007 вне моделей
+# (app.db.search): autogenerate не должен предлагать их удалить
+SEARCH_TABLE_PREFIX = "clubs_fts"
+SEARCH_COLUMNS = {("clubs", "search_vector")}
+SEARCH_INDEXES = {"ix_clubs_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table":
+        return not name.startswith(SEARCH_TABLE_PREFIX)
+    if type_ == "column":
+        return (object.table.name, name) not in SEARCH_COLUMNS
+    if type_ == "index":
+        return name not in SEARCH_INDEXES
+    return True
+
+
+def run_migrations_offline():
+    """Генерирует SQL миграций без подключения к базе (alembic upgrade --sql)"""
+    context.configure(
+        url=db_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    # batch-режим нужен SQLite, который не умеет ALTER TABLE ADD CONSTRAINT
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=True,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    connectable = create_async_engine(db_url, poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,81 @@
+"""Исходная схема: пользователи, кружки, расписание, членство, посещаемость
+
+Совпадает с таблицами, которые создавал init_db до появления миграций.
+Существующую базу, созданную так, нужно пометить этой ревизией:
+alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("is_teacher", sa.Boolean(), nullable=False),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "clubs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("max_students", sa.Integer(), nullable=False),
+        sa.Column("recruitment_open", sa.Boolean(), nullable=False),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    )
+    op.create_index("ix_clubs_id", "clubs", ["id"])
+
+    op.create_table(
+        "schedules",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("club_id", sa.Integer(), sa.ForeignKey("clubs.id"), nullable=False),
+        sa.Column("day_of_week", sa.String(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+    )
+    op.create_index("ix_schedules_id", "schedules", ["id"])
+
+    op.create_table(
+        "club_memberships",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("club_id", sa.Integer(), sa.ForeignKey("clubs.id"), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("joined_at", sa.Date(), nullable=False),
+    )
+    op.create_index("ix_club_memberships_id", "club_memberships", ["id"])
+
+    op.create_table(
+        "attendances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("club_id", sa.Integer(), sa.ForeignKey("clubs.id"), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("marked_at", sa.Date(), nullable=False),
+    )
+    op.create_index("ix_attendances_id", "attendances", ["id"])
+
+
+def downgrade():
+    op.drop_table("attendances")
+    op.drop_table("club_memberships")
+    op.drop_table("schedules")
+    op.drop_table("clubs")
+    op.drop_table("users")
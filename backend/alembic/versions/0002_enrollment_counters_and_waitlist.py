@@ -0,0 +1,55 @@
+"""Счетчик участников кружка, уникальность членства и очередь ожидания
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("clubs") as batch_op:
+        batch_op.add_column(
+            sa.Column("current_students", sa.Integer(), server_default="0", nullable=False)
+        )
+
+    # Повторные записи в кружок, появившиеся до уникального ограничения
+    op.execute(
+        "DELETE FROM club_memberships WHERE id NOT IN ("
+        "SELECT MIN(id) FROM club_memberships GROUP BY club_id, student_id)"
+    )
+    with op.batch_alter_table("club_memberships") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_club_memberships_club_student", ["club_id", "student_id"]
+        )
+
+    op.execute(
+        "UPDATE clubs SET current_students = ("
+        "SELECT COUNT(*) FROM club_memberships WHERE club_memberships.club_id = clubs.id)"
+    )
+
+    op.create_table(
+        "club_waitlist",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("club_id", sa.Integer(), sa.ForeignKey("clubs.id"), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.Date(), nullable=False),
+        sa.UniqueConstraint("club_id", "student_id", name="uq_club_waitlist_club_student"),
+    )
+    op.create_index("ix_club_waitlist_id", "club_waitlist", ["id"])
+    op.create_index("ix_club_waitlist_club_id_id", "club_waitlist", ["club_id", "id"])
+
+
+def downgrade():
+    op.drop_table("club_waitlist")
+    with op.batch_alter_table("club_memberships") as batch_op:
+        batch_op.drop_constraint("uq_club_memberships_club_student", type_="unique")
+    with op.batch_alter_table("clubs") as batch_op:
+        batch_op.drop_column("current_students")
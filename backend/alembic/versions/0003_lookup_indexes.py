@@ -0,0 +1,56 @@
+"""Индексы и ограничения уникальности для частых выборок
+
+- clubs(owner_id), clubs(category): профиль преподавателя и фильтр каталога
+- schedules(club_id): расписание кружка
+- club_memberships(student_id, club_id): кружки студента
+- attendances: уникальная отметка (club_id, student_id, date), а также
+  (club_id, date, student_id) и (student_id, club_id) для подсчета
+  занятий и посещений только по индексу
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_clubs_owner_id", "clubs", ["owner_id"])
+    op.create_index("ix_clubs_category", "clubs", ["category"])
+    op.create_index("ix_schedules_club_id", "schedules", ["club_id"])
+    op.create_index(
+        "ix_club_memberships_student_id_club_id", "club_memberships", ["student_id", "club_id"]
+    )
+
+    # Повторные отметки за одну дату, появившиеся до уникального ограничения
+    op.execute(
+        "DELETE FROM attendances WHERE id NOT IN ("
+        "SELECT MIN(id) FROM attendances GROUP BY club_id, student_id, date)"
+    )
+    with op.batch_alter_table("attendances") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_attendances_club_student_date", ["club_id", "student_id", "date"]
+        )
+    op.create_index(
+        "ix_attendances_club_id_date_student_id", "attendances", ["club_id", "date", "student_id"]
+    )
+    op.create_index(
+        "ix_attendances_student_id_club_id", "attendances", ["student_id", "club_id"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_attendances_student_id_club_id", table_name="attendances")
+    op.drop_index("ix_attendances_club_id_date_student_id", table_name="attendances")
+    with op.batch_alter_table("attendances") as batch_op:
+        batch_op.drop_constraint("uq_attendances_club_student_date", type_="unique")
+    op.drop_index("ix_club_memberships_student_id_club_id", table_name="club_memberships")
+    op.drop_index("ix_schedules_club_id", table_name="schedules")
+    op.drop_index("ix_clubs_category", table_name="clubs")
+    op.drop_index("ix_clubs_owner_id", table_name="clubs")
@@ -0,0 +1,48 @@
+"""Календарь проведенных занятий кружков и счетчик занятий
+
+Заполняется по уже отмеченной посещаемости: каждая уникальная дата
+посещений кружка считается проведенным занятием.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "club_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("club_id", sa.Integer(), sa.ForeignKey("clubs.id"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.UniqueConstraint("club_id", "date", name="uq_club_sessions_club_date"),
+    )
+    op.create_index("ix_club_sessions_id", "club_sessions", ["id"])
+
+    with op.batch_alter_table("clubs") as batch_op:
+        batch_op.add_column(
+            sa.Column("sessions_count", sa.Integer(), server_default="0", nullable=False)
+        )
+
+    op.execute(
+        "INSERT INTO club_sessions (club_id, date) "
+        "SELECT DISTINCT club_id, date FROM attendances"
+    )
+    op.execute(
+        "UPDATE clubs SET sessions_count = ("
+        "SELECT COUNT(*) FROM club_sessions WHERE club_sessions.club_id = clubs.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("clubs") as batch_op:
+        batch_op.drop_column("sessions_count")
+    op.drop_table("club_sessions")
@@ -0,0 +1,33 @@
+"""Сводка посещений по паре (кружок, студент)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "attendance_stats",
+        sa.Column("club_id", sa.Integer(), sa.ForeignKey("clubs.id"), primary_key=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("visits", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_index("ix_attendance_stats_student_id", "attendance_stats", ["student_id"])
+
+    op.execute(
+        "INSERT INTO attendance_stats (club_id, student_id, visits) "
+        "SELECT club_id, student_id, COUNT(*) FROM attendances GROUP BY club_id, student_id"
+    )
+
+
+def downgrade():
+    op.drop_table("attendance_stats")
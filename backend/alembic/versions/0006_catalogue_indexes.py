@@ -0,0 +1,38 @@
+"""Индексы постраничного каталога кружков
+
+- clubs(category, id), clubs(recruitment_open, id): фильтр и порядок
+  страницы по id без сортировки; заменяют clubs(category)
+- schedules(club_id, day_of_week, start_time): фильтр по дню и времени
+  занятия; заменяет schedules(club_id)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_clubs_category_id", "clubs", ["category", "id"])
+    op.create_index("ix_clubs_recruitment_open_id", "clubs", ["recruitment_open", "id"])
+    op.drop_index("ix_clubs_category", table_name="clubs")
+    op.create_index(
+        "ix_schedules_club_id_day_of_week_start_time",
+        "schedules",
+        ["club_id", "day_of_week", "start_time"]
+    )
+    op.drop_index("ix_schedules_club_id", table_name="schedules")
+
+
+def downgrade():
+    op.create_index("ix_schedules_club_id", "schedules", ["club_id"])
+    op.drop_index("ix_schedules_club_id_day_of_week_start_time", table_name="schedules")
+    op.create_index("ix_clubs_category", "clubs", ["category"])
+    op.drop_index("ix_clubs_recruitment_open_id", table_name="clubs")
+    op.drop_index("ix_clubs_category_id", table_name="clubs")
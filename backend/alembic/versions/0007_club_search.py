@@ -0,0 +1,69 @@
+"""Полнотекстовый поиск кружков
+
+- PostgreSQL: хранимая колонка clubs.search_vector (tsvector, конфигурация
+  russian; веса: название A, категория B, описание C) и GIN-индекс по ней
+- SQLite: внешняя FTS5-таблица clubs_fts с триггерами синхронизации.
+  Пересоздание clubs в batch-режиме удаляет триггеры: такие миграции
+  должны создавать их заново
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            "ALTER TABLE clubs ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('russian', coalesce(category, '')), 'B') || "
+            "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX ix_clubs_search_vector ON clubs USING gin (search_vector)")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE clubs_fts USING fts5("
+            "title, description, category, content='clubs', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER clubs_fts_insert AFTER INSERT ON clubs BEGIN "
+            "INSERT INTO clubs_fts (rowid, title, description, category) "
+            "VALUES (new.id, new.title, new.description, new.category); END"
+        )
+        op.execute(
+            "CREATE TRIGGER clubs_fts_delete AFTER DELETE ON clubs BEGIN "
+            "INSERT INTO clubs_fts (clubs_fts, rowid, title, description, category) "
+            "VALUES ('delete', old.id, old.title, old.description, old.category); END"
+        )
+        op.execute(
+            "CREATE TRIGGER clubs_fts_update AFTER UPDATE OF title, description, category ON clubs BEGIN "
+            "INSERT INTO clubs_fts (clubs_fts, rowid, title, description, category) "
+            "VALUES ('delete', old.id, old.title, old.description, old.category); "
+            "INSERT INTO clubs_fts (rowid, title, description, category) "
+            "VALUES (new.id, new.title, new.description, new.category); END"
+        )
+        op.execute("INSERT INTO clubs_fts (clubs_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX ix_clubs_search_vector")
+        op.execute("ALTER TABLE clubs DROP COLUMN search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER clubs_fts_update")
+        op.execute("DROP TRIGGER clubs_fts_delete")
+        op.execute("DROP TRIGGER clubs_fts_insert")
+        op.execute("DROP TABLE clubs_fts")
@@ -0,0 +1,91 @@
+"""Длительность занятий и интервалы для проверки пересечений
+
+- schedules.duration_minutes (по умолчанию 90 минут - одна пара)
+- schedules.weekday, start_minute, end_minute: занятие как интервал минут
+  дня недели; заполняются из day_of_week и start_time, для нераспознанных
+  названий дня weekday остается NULL
+- schedules(location, weekday, start_minute): занятия в той же аудитории,
+  пересекающиеся по времени
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+DEFAULT_DURATION_MINUTES = 90
+
+# Копия словаря из app.db.schedule: миграция не должна меняться вместе с кодом
+WEEKDAY_ALIASES = {
+    **{name: index for index, name in enumerate(
+        ["понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье"]
+    )},
+    **{name: index for index, name in enumerate(["пн", "вт", "ср", "чт", "пт", "сб", "вс"])},
+}
+
+schedules = sa.table(
+    "schedules",
+    sa.column("id", sa.Integer),
+    sa.column("day_of_week", sa.String),
+    sa.column("start_time", sa.Time),
+    sa.column("weekday", sa.Integer),
+    sa.column("start_minute", sa.Integer),
+    sa.column("end_minute", sa.Integer),
+)
+
+
+def upgrade():
+    with op.batch_alter_table("schedules") as batch_op:
+        batch_op.add_column(
+            sa.Column("duration_minutes", sa.Integer(), server_default="90", nullable=False)
+        )
+        batch_op.add_column(sa.Column("weekday", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("start_minute", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("end_minute", sa.Integer(), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(schedules.c.id, schedules.c.day_of_week, schedules.c.start_time)
+    ).all()
+    updates = []
+    for schedule_id, day_of_week, start_time in rows:
+        start_minute = start_time.hour * 60 + start_time.minute
+        updates.append({
+            "b_id": schedule_id,
+            "b_weekday": WEEKDAY_ALIASES.get(day_of_week.strip().rstrip(".").lower()),
+            "b_start_minute": start_minute,
+            "b_end_minute": start_minute + DEFAULT_DURATION_MINUTES,
+        })
+    if updates:
+        connection.execute(
+            schedules.update()
+            .where(schedules.c.id == sa.bindparam("b_id"))
+            .values(
+                weekday=sa.bindparam("b_weekday"),
+                start_minute=sa.bindparam("b_start_minute"),
+                end_minute=sa.bindparam("b_end_minute"),
+            ),
+            updates
+        )
+
+    op.create_index(
+        "ix_schedules_location_weekday_start_minute",
+        "schedules",
+        ["location", "weekday", "start_minute"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_schedules_location_weekday_start_minute", table_name="schedules")
+    with op.batch_alter_table("schedules") as batch_op:
+        batch_op.drop_column("end_minute")
+        batch_op.drop_column("start_minute")
+        batch_op.drop_column("weekday")
+        batch_op.drop_column("duration_minutes")
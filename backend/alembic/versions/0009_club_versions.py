@@ -0,0 +1,31 @@
+"""Версия кружка для ETag
+
+- clubs.version: увеличивается в той же транзакции, что и изменение кружка,
+  его расписания или состава участников; ETag карточки и страниц каталога
+  строится из нее, а не из состояния процесса
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+# Без batch_alter_table: пересоздание таблицы в SQLite удалило бы триггеры
+# поискового индекса clubs_fts (миграция 0007); ADD/DROP COLUMN SQLite
+# выполняет на месте
+
+
+def upgrade():
+    op.add_column("clubs", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    op.drop_column("clubs", "version")
@@ -0,0 +1,44 @@
+"""Номера мест в очереди ожидания
+
+- club_waitlist.seq: номер записи в очереди кружка без разрывов от головы;
+  позиция студента - seq - min(seq) + 1 (app.db.waitlist)
+- индекс (club_id, seq) вместо (club_id, id): по нему ищутся голова очереди
+  и позиция
+
+Существующие записи нумеруются в порядке id внутри кружка.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("club_waitlist", sa.Column("seq", sa.Integer(), nullable=True))
+    op.execute(
+        """
+        UPDATE club_waitlist SET seq = (
+            SELECT count(*) FROM club_waitlist AS earlier
+            WHERE earlier.club_id = club_waitlist.club_id AND earlier.id <= club_waitlist.id
+        )
+        """
+    )
+    # В SQLite таблица пересоздается; триггеров у club_waitlist нет
+    with op.batch_alter_table("club_waitlist") as batch_op:
+        batch_op.alter_column("seq", existing_type=sa.Integer(), nullable=False)
+    op.create_index("ix_club_waitlist_club_id_seq", "club_waitlist", ["club_id", "seq"])
+    op.drop_index("ix_club_waitlist_club_id_id", table_name="club_waitlist")
+
+
+def downgrade():
+    op.create_index("ix_club_waitlist_club_id_id", "club_waitlist", ["club_id", "id"])
+    op.drop_index("ix_club_waitlist_club_id_seq", table_name="club_waitlist")
+    op.drop_column("club_waitlist", "seq")
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-import bcrypt
+from sqlalchemy import select, update, and_
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from app.db.database import get_db
+from app.db.database import get_db, async_session, read_session, request_user_id
 from app.db.models import User
 from app.schemas.auth import UserLogin, UserRegister, Token, UserResponse
 from app.core.config import settings
+from app.core.cache import principal_cache
+from app.core.hashing import (
+    hashing_pool, HashingPoolBusy, hash_password, check_password, needs_rehash
+)
 
 router = APIRouter()
 security = HTTPBearer()
@@ -21,19 +24,62 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверяет пароль с использованием bcrypt"""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'),
-        hashed_password.encode('utf-8')
-    )
+    """Проверяет пароль (bcrypt или scrypt, по формату хеша)"""
+    return check_password(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Хеширует пароль с использованием bcrypt"""
-    # Генерируем соль и хешируем пароль
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Хеширует пароль по текущей политике"""
+    return hash_password(password)
+
+
+async def _run_hashing(func, *args):
+    """Выполняет хеширование в пуле потоков; при переполнении очереди отвечает 503"""
+    try:
+        return await hashing_pool.run(func, *args)
+    except HashingPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, повторите попытку позже",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(check_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+
+async def upgrade_password_hash(user_id: int, password: str, old_hash: str):
+    """Перехеширует пароль по текущей политике после успешного входа"""
+    try:
+        new_hash = await hashing_pool.run(hash_password, password)
+    except HashingPoolBusy:
+        # Пул занят входами - обновим хеш при следующем входе
+        return
+    
+    async with async_session() as session:
+        # Условие по старому хешу не даст затереть пароль, смененный за это время
+        await session.execute(
+            update(User)
+            .where(and_(User.id == user_id, User.password_hash == old_hash))
+            .values(password_hash=new_hash)
+        )
+        await session.commit()
+
+
+def _snapshot_user(user: User) -> User:
+    """Отвязанная от сессии копия пользователя без хеша пароля для кэша"""
+    return User(
+        id=user.id,
+        username=user.username,
+        full_name=user.full_name,
+        password_hash="",
+        is_teacher=user.is_teacher
+    )
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -42,7 +88,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -70,25 +116,63 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    # Токен уже содержит user_id: повторные запросы с тем же токеном
+    # обходятся без обращения к таблице users
+    user_id = payload.get("user_id")
+    issued_at = payload.get("iat")
+    cache_key = (user_id, issued_at) if user_id is not None and issued_at is not None else None
+    if cache_key is not None:
+        cached_user = principal_cache.get(cache_key)
+        if cached_user is not None:
+            request_user_id.set(cached_user.id)
+            return cached_user
+    generation = principal_cache.generation
+    
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
+    
+    if cache_key is not None and user.id == user_id:
+        principal_cache.set(cache_key, _snapshot_user(user), generation=generation)
+    request_user_id.set(user.id)
     return user
 
 
+async def get_read_db(current_user: User = Depends(get_current_user)):
+    """Сессия для читающих обработчиков: реплика, если пользователь недавно ничего не менял"""
+    async with read_session(user_id=current_user.id) as session:
+        yield session
+
+
+async def get_club_read_db(current_user: User = Depends(get_current_user)):
+    """Как get_read_db, но для общих данных кружков: после их изменения читаем с основной базы"""
+    async with read_session(user_id=current_user.id, shared=True) as session:
+        yield session
+
+
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
+async def login(
+    user_data: UserLogin,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
     # Проверяем пользователя
     result = await db.execute(select(User).where(User.username == user_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user or not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный логин или пароль"
         )
     
+    # Хеш со старым алгоритмом или стоимостью обновляем после ответа
+    if needs_rehash(user.password_hash):
+        background_tasks.add_task(
+            upgrade_password_hash, user.id, user_data.password, user.password_hash
+        )
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username, "user_id": user.id, "is_teacher": user.is_teacher},
@@ -123,7 +207,7 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
     is_teacher = False
     
     # Создаем нового пользователя
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         username=user_data.username,
         full_name=user_data.full_name,
@@ -1,61 +1,308 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import hashlib
+from dataclasses import dataclass, astuple
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, update, delete, and_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from app.db.database import get_db
-from app.db.models import Club, User, ClubMembership, Schedule
-from app.schemas.club import ClubCreate, ClubResponse, ClubDetailResponse, ScheduleCreate
-from app.api.auth import get_current_user
+from pydantic import TypeAdapter
+from datetime import date, time
+from app.db.database import get_db, get_catalogue_db, read_session, replicas
+from app.db.models import Club, User, ClubMembership, Schedule, WaitlistEntry
+from app.schemas.club import (
+    ClubCreate, ClubResponse, ClubDetailResponse, ClubSearchResult, ScheduleCreate,
+    WaitlistPositionResponse
+)
+from app.api.auth import get_current_user, get_club_read_db
+from app.core.cache import catalogue_cache
+from app.core.config import settings
+from app.core.events import seat_events, RESYNC
+from app.core.etag import make_etag, is_not_modified
+from app.db.search import search_clubs, render_highlight
+from app.db.schedule import find_student_conflict, format_minute
+from app.db.waitlist import add_to_waitlist, remove_from_waitlist, waitlist_position
 
 router = APIRouter()
 
 
+_catalogue_adapter = TypeAdapter(List[ClubResponse])
+
+
+def invalidate_club(club_id: int):
+    """Сбрасывает кэш каталога после зафиксированного изменения кружка"""
+    catalogue_cache.invalidate()
+    replicas.mark_shared_write()
+
+
+def bump_club_version(club_id: int):
+    """UPDATE версии кружка для ETag; выполняется в транзакции изменения"""
+    return (
+        update(Club)
+        .where(Club.id == club_id)
+        .values(version=Club.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def seat_state_query(club_id: int):
+    """Заполненность кружка для потока мест"""
+    return select(
+        Club.id.label("club_id"),
+        Club.current_students,
+        Club.max_students,
+        Club.recruitment_open
+    ).where(Club.id == club_id)
+
+
+async def publish_seats(club_id: int, db: AsyncSession):
+    """Публикует заполненность кружка из текущей транзакции; подписчики получат ее после коммита"""
+    await seat_events.publish(db, seat_state_query(club_id))
+
+
+@dataclass(frozen=True)
+class CatalogueFilters:
+    """Фильтры каталога кружков"""
+    category: Optional[str] = None
+    recruitment_open: Optional[bool] = None
+    has_free_seats: Optional[bool] = None
+    day_of_week: Optional[str] = None
+    time_from: Optional[time] = None
+    time_to: Optional[time] = None
+    location: Optional[str] = None
+
+    def key(self) -> tuple:
+        """Ключ для кэша и ETag: одинаковые фильтры дают одинаковый ключ"""
+        return tuple(
+            value.strftime("%H:%M") if isinstance(value, time) else value
+            for value in astuple(self)
+        )
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.category:
+            conditions.append(Club.category == self.category)
+        if self.recruitment_open is not None:
+            conditions.append(Club.recruitment_open == self.recruitment_open)
+        if self.has_free_seats is True:
+            conditions.append(Club.current_students < Club.max_students)
+        elif self.has_free_seats is False:
+            conditions.append(Club.current_students >= Club.max_students)
+
+        # Все условия на расписание должно выполнять одно и то же занятие
+        schedule_conditions = []
+        if self.day_of_week:
+            schedule_conditions.append(Schedule.day_of_week == self.day_of_week)
+        if self.time_from is not None:
+            schedule_conditions.append(Schedule.start_time >= self.time_from)
+        if self.time_to is not None:
+            schedule_conditions.append(Schedule.start_time <= self.time_to)
+        if self.location:
+            schedule_conditions.append(Schedule.location == self.location)
+        if schedule_conditions:
+            conditions.append(
+                select(Schedule.id)
+                .where(Schedule.club_id == Club.id, *schedule_conditions)
+                .exists()
+            )
+        return conditions
+
+
+def get_catalogue_filters(
+    category: Optional[str] = None,
+    recruitment_open: Optional[bool] = None,
+    has_free_seats: Optional[bool] = None,
+    day_of_week: Optional[str] = None,
+    time_from: Optional[time] = None,
+    time_to: Optional[time] = None,
+    location: Optional[str] = None
+) -> CatalogueFilters:
+    return CatalogueFilters(
+        # "Все" во фронтенде означает отсутствие фильтра по категории
+        category=category if category and category != "Все" else None,
+        recruitment_open=recruitment_open,
+        has_free_seats=has_free_seats,
+        day_of_week=day_of_week or None,
+        time_from=time_from,
+        time_to=time_to,
+        location=location or None
+    )
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Возвращает id последнего кружка предыдущей страницы"""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, last_id = decoded.split(":", 1)
+        if prefix != "id":
+            raise ValueError(prefix)
+        return int(last_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+
+
+def serialize_club(club: Club) -> dict:
+    """Кружок каталога с расписанием"""
+    return {
+        "id": club.id,
+        "title": club.title,
+        "description": club.description,
+        "category": club.category,
+        "max_students": club.max_students,
+        "recruitment_open": club.recruitment_open,
+        "image_url": club.image_url,
+        "owner_id": club.owner_id,
+        "current_students": club.current_students,
+        "schedules": [
+            {
+                "id": s.id,
+                "day_of_week": s.day_of_week,
+                "start_time": s.start_time.strftime("%H:%M"),
+                "location": s.location,
+                "duration_minutes": s.duration_minutes
+            }
+            for s in club.schedules
+        ]
+    }
+
+
 @router.get("/", response_model=List[ClubResponse])
 async def get_clubs(
-    category: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    filters: CatalogueFilters = Depends(get_catalogue_filters),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_catalogue_db)
 ):
-    query = select(Club).options(selectinload(Club.schedules))
-    if category and category != "Все":
-        query = query.where(Club.category == category)
+    """Каталог кружков в порядке id.
+
+    Без limit возвращается весь каталог. С limit возвращается страница, а курсор
+    следующей страницы передается в заголовке X-Next-Cursor (нет заголовка -
+    страница последняя). Страница выбирается условием id > курсор, поэтому
+    любая страница стоит столько же, сколько первая.
+    """
+    after_id = decode_cursor(cursor) if cursor else None
+    
+    query = select(Club.id, Club.version).where(*filters.conditions()).order_by(Club.id)
+    if after_id is not None:
+        query = query.where(Club.id > after_id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    
+    # Валидатор страницы - id и версии ее кружков из базы: одна легкая выборка
+    # без расписаний и сериализации. Версии читаются до данных, поэтому
+    # изменение во время запроса даст новый ETag в следующем запросе
+    page_versions = [tuple(row) for row in (await db.execute(query)).all()]
+    digest = hashlib.sha1(repr((filters.key(), limit, after_id, page_versions)).encode()).hexdigest()
+    cache_key = (filters.key(), limit, after_id, digest)
+    etag = make_etag("catalogue", digest[:16])
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Ключ кэша содержит версии, поэтому изменение на другом воркере не отдаст
+    # отсюда устаревшую страницу
+    cached = catalogue_cache.get(cache_key)
+    if cached is not None:
+        body, next_cursor = cached
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    # Запоминаем поколение кэша до чтения: если каталог изменится во время
+    # запроса, устаревший ответ не будет сохранен
+    generation = catalogue_cache.generation
+    
+    query = (
+        select(Club)
+        .options(selectinload(Club.schedules))
+        .where(*filters.conditions())
+        .order_by(Club.id)
+    )
+    if after_id is not None:
+        query = query.where(Club.id > after_id)
+    if limit is not None:
+        # Лишняя строка показывает, есть ли следующая страница
+        query = query.limit(limit + 1)
     
     result = await db.execute(query)
     clubs = result.scalars().all()
     
-    # Преобразуем в список словарей для сериализации
-    clubs_list = []
-    for club in clubs:
-        club_dict = {
-            "id": club.id,
-            "title": club.title,
-            "description": club.description,
-            "category": club.category,
-            "max_students": club.max_students,
-            "recruitment_open": club.recruitment_open,
-            "image_url": club.image_url,
-            "owner_id": club.owner_id,
-            "schedules": [
-                {
-                    "id": s.id,
-                    "day_of_week": s.day_of_week,
-                    "start_time": s.start_time.strftime("%H:%M"),
-                    "location": s.location
-                }
-                for s in club.schedules
-            ]
-        }
-        clubs_list.append(club_dict)
+    next_cursor = None
+    if limit is not None and len(clubs) > limit:
+        clubs = clubs[:limit]
+        next_cursor = encode_cursor(clubs[-1].id)
     
-    return clubs_list
+    clubs_list = [serialize_club(club) for club in clubs]
+    
+    body = _catalogue_adapter.dump_json(_catalogue_adapter.validate_python(clubs_list))
+    catalogue_cache.set(cache_key, (body, next_cursor), generation=generation)
+    
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/search", response_model=List[ClubSearchResult])
+async def search_catalogue(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    filters: CatalogueFilters = Depends(get_catalogue_filters),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_catalogue_db)
+):
+    """Поиск по названию, описанию и категории с учетом фильтров каталога.
+
+    Слова запроса ищутся как префиксы, результаты отсортированы по релевантности.
+    Ранжируются только SEARCH_MAX_CANDIDATES последних добавленных совпадений;
+    если более старые были отброшены, в ответе есть заголовок
+    X-Search-Truncated: true, и запрос стоит уточнить.
+    """
+    rows = await search_clubs(db, q, filters.conditions(), limit=limit, offset=offset)
+    if any(row.truncated for row in rows):
+        response.headers["X-Search-Truncated"] = "true"
+    return [
+        {
+            **serialize_club(club),
+            "rank": rank,
+            "title_highlight": render_highlight(title_highlight),
+            "description_highlight": render_highlight(description_highlight),
+        }
+        for club, rank, title_highlight, description_highlight, _ in rows
+    ]
 
 
 @router.get("/{club_id}", response_model=ClubDetailResponse)
 async def get_club(
     club_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_club_read_db)
 ):
+    # Ответ зависит от пользователя (is_member), поэтому он входит в ETag;
+    # вступление и выход из кружка увеличивают его версию
+    version = await db.scalar(select(Club.version).where(Club.id == club_id))
+    etag = make_etag("club", club_id, version, current_user.id)
+    if version is not None and is_not_modified(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+        )
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    
     result = await db.execute(
         select(Club).options(selectinload(Club.schedules)).where(Club.id == club_id)
     )
@@ -67,12 +314,6 @@ async def get_club(
             detail="Кружок не найден"
         )
     
-    # Получаем количество студентов
-    members_count = await db.execute(
-        select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club_id)
-    )
-    current_students = members_count.scalar() or 0
-    
     # Получаем имя преподавателя
     owner_result = await db.execute(select(User).where(User.id == club.owner_id))
     owner = owner_result.scalar_one()
@@ -96,7 +337,8 @@ async def get_club(
             "id": s.id,
             "day_of_week": s.day_of_week,
             "start_time": s.start_time.strftime("%H:%M"),
-            "location": s.location
+            "location": s.location,
+            "duration_minutes": s.duration_minutes
         }
         for s in club.schedules
     ]
@@ -110,7 +352,7 @@ async def get_club(
         "recruitment_open": club.recruitment_open,
         "image_url": club.image_url,
         "owner_id": club.owner_id,
-        "current_students": current_students,
+        "current_students": club.current_students,
         "owner_name": owner.full_name,
         "schedules": schedules_list,
         "is_member": is_member
@@ -119,6 +361,74 @@ async def get_club(
     return ClubDetailResponse(**club_dict)
 
 
+async def load_seat_state(club_id: int) -> Optional[dict]:
+    """Текущая заполненность кружка; сессия закрывается сразу после чтения"""
+    async with read_session(shared=True) as db:
+        row = (await db.execute(seat_state_query(club_id))).mappings().one_or_none()
+    return dict(row) if row is not None else None
+
+
+def format_seat_event(state: dict) -> bytes:
+    return f"event: seats\ndata: {json.dumps(state)}\n\n".encode("utf-8")
+
+
+@router.get("/{club_id}/seats/stream")
+async def stream_seats(club_id: int):
+    """Поток заполненности кружка (text/event-stream) вместо опроса карточки.
+
+    Первое событие - текущее состояние, дальше - каждое изменение мест,
+    лимита или набора. Соединение с базой не удерживается: ожидающий
+    подписчик занимает только ячейку в памяти процесса.
+    """
+    try:
+        await seat_events.start()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Поток событий временно недоступен"
+        )
+    
+    # Подписываемся до чтения состояния, чтобы не пропустить изменение между ними
+    subscription = seat_events.subscribe(club_id)
+    try:
+        state = await load_seat_state(club_id)
+    except BaseException:
+        seat_events.unsubscribe(subscription)
+        raise
+    if state is None:
+        seat_events.unsubscribe(subscription)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Кружок не найден"
+        )
+    
+    async def events():
+        last_state = state
+        try:
+            yield b"retry: 3000\n" + format_seat_event(state)
+            while True:
+                changed = await subscription.next(settings.SEAT_STREAM_HEARTBEAT)
+                if changed is None:
+                    # Комментарий не дает прокси закрыть простаивающее соединение
+                    yield b": ping\n\n"
+                    continue
+                if changed is RESYNC:
+                    changed = await load_seat_state(club_id)
+                    if changed is None:
+                        return
+                if changed != last_state:
+                    last_state = changed
+                    yield format_seat_event(changed)
+        finally:
+            seat_events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/", response_model=ClubResponse)
 async def create_club(
     club_data: ClubCreate,
@@ -138,11 +448,13 @@ async def create_club(
         max_students=club_data.max_students,
         image_url=club_data.image_url,
         owner_id=current_user.id,
-        recruitment_open=True
+        recruitment_open=True,
+        current_students=0
     )
     
     db.add(new_club)
     await db.commit()
+    invalidate_club(new_club.id)
     await db.refresh(new_club, ["schedules"])
     
     # Преобразуем в словарь для сериализации
@@ -155,12 +467,14 @@ async def create_club(
         "recruitment_open": new_club.recruitment_open,
         "image_url": new_club.image_url,
         "owner_id": new_club.owner_id,
+        "current_students": new_club.current_students,
         "schedules": [
             {
                 "id": s.id,
                 "day_of_week": s.day_of_week,
                 "start_time": s.start_time.strftime("%H:%M"),
-                "location": s.location
+                "location": s.location,
+                "duration_minutes": s.duration_minutes
             }
             for s in new_club.schedules
         ]
@@ -169,19 +483,74 @@ async def create_club(
     return club_dict
 
 
-@router.post("/{club_id}/join")
-async def join_club(
-    club_id: int,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
-    if current_user.is_teacher:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Преподаватели не могут записываться на кружки"
+def schedule_conflict_error(conflict) -> HTTPException:
+    """Ошибка записи: занятие кружка пересекается с занятием другого кружка студента"""
+    target, other, other_title = conflict
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=(
+            f"Занятие {target.day_of_week} {format_minute(target.start_minute)}-"
+            f"{format_minute(target.end_minute)} пересекается с кружком {other_title} "
+            f"({other.day_of_week} {format_minute(other.start_minute)}-{format_minute(other.end_minute)})"
+        )
+    )
+
+
+async def promote_from_waitlist(club_id: int, db: AsyncSession) -> List[int]:
+    """Переводит студентов из головы очереди ожидания в кружок, пока есть места.
+    
+    Пока студент стоял в очереди, он мог записаться в кружок с занятиями
+    в то же время: такая запись удаляется из очереди без перевода.
+    Выполняется в транзакции вызывающего кода, коммит остается за ним.
+    """
+    promoted = []
+    
+    while True:
+        # SKIP LOCKED: параллельные освобождения мест продвигают разных студентов
+        head_result = await db.execute(
+            select(WaitlistEntry)
+            .where(WaitlistEntry.club_id == club_id)
+            .order_by(WaitlistEntry.seq)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        entry = head_result.scalar_one_or_none()
+        if not entry:
+            break
+        
+        if await find_student_conflict(db, entry.student_id, club_id):
+            await remove_from_waitlist(db, club_id, WaitlistEntry.id == entry.id)
+            continue
+        
+        seat_result = await db.execute(
+            update(Club)
+            .where(
+                and_(
+                    Club.id == club_id,
+                    Club.recruitment_open == True,
+                    Club.current_students < Club.max_students
+                )
+            )
+            .values(current_students=Club.current_students + 1, version=Club.version + 1)
+            .returning(Club.id)
+            .execution_options(synchronize_session=False)
         )
+        if seat_result.scalar_one_or_none() is None:
+            break
+        
+        await remove_from_waitlist(db, club_id, WaitlistEntry.id == entry.id)
+        db.add(ClubMembership(
+            club_id=club_id,
+            student_id=entry.student_id,
+            joined_at=date.today()
+        ))
+        promoted.append(entry.student_id)
     
-    # Проверяем, существует ли кружок
+    return promoted
+
+
+async def raise_enrollment_error(club_id: int, student_id: int, db: AsyncSession):
+    """Определяет, почему не удалось занять место в кружке, и выбрасывает ошибку"""
     result = await db.execute(select(Club).where(Club.id == club_id))
     club = result.scalar_one_or_none()
     
@@ -191,15 +560,47 @@ async def join_club(
             detail="Кружок не найден"
         )
     
+    existing_membership = await db.execute(
+        select(ClubMembership.id).where(
+            and_(
+                ClubMembership.club_id == club_id,
+                ClubMembership.student_id == student_id
+            )
+        )
+    )
+    if existing_membership.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вы уже записаны на этот кружок"
+        )
+    
     if not club.recruitment_open:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Набор в кружок закрыт"
         )
     
-    # Проверяем, не состоит ли уже студент в кружке
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Кружок переполнен"
+    )
+
+
+@router.post("/{club_id}/join")
+async def join_club(
+    club_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Преподаватели не могут записываться на кружки"
+        )
+    
+    # Повторная запись - ошибка "уже записаны", а не пересечение расписания
     existing_membership = await db.execute(
-        select(ClubMembership).where(
+        select(ClubMembership.id).where(
             and_(
                 ClubMembership.club_id == club_id,
                 ClubMembership.student_id == current_user.id
@@ -212,29 +613,59 @@ async def join_club(
             detail="Вы уже записаны на этот кружок"
         )
     
-    # Проверяем, не превышен ли лимит студентов
-    members_count = await db.execute(
-        select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club_id)
-    )
-    current_students = members_count.scalar() or 0
+    # Занятия нового кружка не должны совпадать по времени с занятиями кружков студента
+    conflict = await find_student_conflict(db, current_user.id, club_id)
+    if conflict:
+        raise schedule_conflict_error(conflict)
     
-    if current_students >= club.max_students:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Кружок переполнен"
+    # Занимаем место одним условным UPDATE: проверка набора и лимита
+    # выполняется атомарно под блокировкой строки кружка, без блокировки таблицы
+    seat_result = await db.execute(
+        update(Club)
+        .where(
+            and_(
+                Club.id == club_id,
+                Club.recruitment_open == True,
+                Club.current_students < Club.max_students
+            )
         )
+        .values(current_students=Club.current_students + 1, version=Club.version + 1)
+        .returning(Club.id)
+        .execution_options(synchronize_session=False)
+    )
+    if seat_result.scalar_one_or_none() is None:
+        # Откат истекает загруженные объекты, поэтому id берем до него
+        student_id = current_user.id
+        await db.rollback()
+        await raise_enrollment_error(club_id, student_id, db)
+    
+    # Если студент стоял в очереди ожидания, место в ней больше не нужно
+    await remove_from_waitlist(db, club_id, WaitlistEntry.student_id == current_user.id)
     
-    # Создаем членство
-    from datetime import date
+    # Создаем членство; повторная запись отсекается уникальным ограничением
     new_membership = ClubMembership(
         club_id=club_id,
         student_id=current_user.id,
         joined_at=date.today()
     )
-    
     db.add(new_membership)
+    
+    try:
+        # Вставка до публикации мест, иначе ее выполнит автосброс вне этого блока
+        await db.flush()
+    except IntegrityError:
+        # Откат возвращает и занятое место
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вы уже записаны на этот кружок"
+        )
+    await publish_seats(club_id, db)
     await db.commit()
     
+    # Каталог и карточка кружка показывают заполненность
+    invalidate_club(club_id)
+    
     return {"message": "Вы успешно записались на кружок"}
 
 
@@ -250,32 +681,47 @@ async def leave_club(
             detail="Преподаватели не могут покидать кружки"
         )
     
-    # Проверяем, состоит ли студент в кружке
-    membership_result = await db.execute(
-        select(ClubMembership).where(
+    # Удаляем членство одним оператором: из двух одновременных запросов
+    # строку удалит только один, и счетчик уменьшится ровно один раз
+    delete_result = await db.execute(
+        delete(ClubMembership)
+        .where(
             and_(
                 ClubMembership.club_id == club_id,
                 ClubMembership.student_id == current_user.id
             )
         )
+        .execution_options(synchronize_session=False)
     )
-    membership = membership_result.scalar_one_or_none()
     
-    if not membership:
+    if delete_result.rowcount == 0:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Вы не состоите в этом кружке"
         )
     
-    # Удаляем членство
-    await db.delete(membership)
+    await db.execute(
+        update(Club)
+        .where(Club.id == club_id)
+        .values(
+            current_students=Club.current_students - delete_result.rowcount,
+            version=Club.version + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    
+    # Освободившееся место сразу занимает первый в очереди ожидания
+    await promote_from_waitlist(club_id, db)
+    await publish_seats(club_id, db)
     await db.commit()
+    invalidate_club(club_id)
     
     return {"message": "Вы успешно покинули кружок"}
 
 
-@router.delete("/{club_id}/leave")
-async def leave_club(
+@router.post("/{club_id}/waitlist")
+async def join_waitlist(
     club_id: int,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -283,31 +729,110 @@ async def leave_club(
     if current_user.is_teacher:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Преподаватели не могут покидать кружки"
+            detail="Преподаватели не могут записываться на кружки"
         )
     
-    # Проверяем, состоит ли студент в кружке
-    membership_result = await db.execute(
-        select(ClubMembership).where(
+    result = await db.execute(select(Club).where(Club.id == club_id))
+    club = result.scalar_one_or_none()
+    
+    if not club:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Кружок не найден"
+        )
+    
+    if not club.recruitment_open:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Набор в кружок закрыт"
+        )
+    
+    existing_membership = await db.execute(
+        select(ClubMembership.id).where(
             and_(
                 ClubMembership.club_id == club_id,
                 ClubMembership.student_id == current_user.id
             )
         )
     )
-    membership = membership_result.scalar_one_or_none()
+    if existing_membership.scalar_one_or_none():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вы уже записаны на этот кружок"
+        )
     
-    if not membership:
+    if club.current_students < club.max_students:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Вы не состоите в этом кружке"
+            detail="В кружке есть свободные места, запишитесь напрямую"
+        )
+    
+    # Из очереди студент попадет в кружок автоматически, поэтому расписание
+    # проверяется уже при постановке в очередь
+    conflict = await find_student_conflict(db, current_user.id, club_id)
+    if conflict:
+        raise schedule_conflict_error(conflict)
+    
+    try:
+        await add_to_waitlist(db, club_id, current_user.id, date.today())
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вы уже стоите в очереди на этот кружок"
         )
     
-    # Удаляем членство
-    await db.delete(membership)
+    # Место могло освободиться между проверкой и постановкой в очередь
+    promoted = await promote_from_waitlist(club_id, db)
+    if promoted:
+        await publish_seats(club_id, db)
+    # Позиция - под блокировкой очереди, до коммита
+    position = await waitlist_position(db, club_id, current_user.id)
     await db.commit()
+    if promoted:
+        invalidate_club(club_id)
     
-    return {"message": "Вы успешно покинули кружок"}
+    if current_user.id in promoted:
+        return {"message": "Вы успешно записались на кружок", "position": 0}
+    
+    return {"message": "Вы добавлены в очередь ожидания", "position": position}
+
+
+@router.get("/{club_id}/waitlist", response_model=WaitlistPositionResponse)
+async def get_my_waitlist_position(
+    club_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    position = await waitlist_position(db, club_id, current_user.id)
+    
+    if position is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Вы не стоите в очереди на этот кружок"
+        )
+    
+    return WaitlistPositionResponse(club_id=club_id, position=position)
+
+
+@router.delete("/{club_id}/waitlist")
+async def leave_waitlist(
+    club_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    removed = await remove_from_waitlist(db, club_id, WaitlistEntry.student_id == current_user.id)
+    
+    if not removed:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вы не стоите в очереди на этот кружок"
+        )
+    
+    await db.commit()
+    
+    return {"message": "Вы покинули очередь ожидания"}
 
 
 @router.get("/categories/list", response_model=List[str])
@@ -1,7 +1,36 @@
+import os
 from fastapi import APIRouter
+from app.core.cache import catalogue_cache, principal_cache
+from app.core.hashing import hashing_pool
+from app.db.database import engine, pool_stats, replicas
 
 router = APIRouter()
 
 @router.get("/")
 def health_check():
     return {"status": "ok"}
+
+
+@router.get("/cache")
+def cache_stats():
+    """Счетчики попаданий, промахов и вытеснений кэшей процесса"""
+    return {
+        "catalogue": catalogue_cache.stats(),
+        "principal": principal_cache.stats(),
+    }
+
+
+@router.get("/hashing")
+def hashing_stats():
+    """Загрузка пула хеширования паролей, задержки хеширования и ожидания в очереди"""
+    return hashing_pool.stats()
+
+
+@router.get("/db")
+def db_pool_stats():
+    """Состояние пула соединений воркера, ответившего на запрос"""
+    return {
+        "pid": os.getpid(),
+        "primary": pool_stats(engine),
+        "replicas": [pool_stats(replica_engine) for replica_engine in replicas.engines],
+    }
@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from typing import List
+from sqlalchemy import select, delete, func, and_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Literal, Optional
 from datetime import date, time
-from app.db.database import get_db
-from app.db.models import Club, User, ClubMembership, Attendance, Schedule
+from app.db.database import get_db, read_session
+from app.db.attendance import insert_skipping_duplicates, record_session, add_visits
+from app.db.export import EXPORT_MEDIA_TYPES, attendance_export_query, stream_attendance
+from app.db.models import Club, User, ClubMembership, Attendance, AttendanceStats, Schedule
+from app.db.schedule import (
+    WEEKDAYS, MIN_DURATION_MINUTES, MAX_DURATION_MINUTES, MINUTES_PER_DAY,
+    parse_weekday, schedule_slot, format_minute, find_location_conflict
+)
 from app.schemas.management import (
     StudentAttendanceInfo, MarkAttendanceRequest,
+    BulkAttendanceRequest, BulkAttendanceResult, BulkAttendanceResponse,
     ClubSettingsUpdate, ScheduleItemCreate
 )
-from app.api.auth import get_current_user
+from app.api.auth import get_current_user, get_read_db
+from app.api.clubs import promote_from_waitlist, invalidate_club, publish_seats, bump_club_version
 
 router = APIRouter()
 
@@ -34,54 +44,61 @@ async def verify_club_owner(club_id: int, user: User, db: AsyncSession) -> Club:
     return club
 
 
-@router.get("/{club_id}/students", response_model=List[StudentAttendanceInfo])
-async def get_club_students(
-    club_id: int,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
-    await verify_club_owner(club_id, current_user, db)
+async def build_club_roster(
+    club: Club,
+    db: AsyncSession,
+    sort: Optional[str] = None,
+    order: str = "asc",
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> List[StudentAttendanceInfo]:
+    """Собирает таблицу посещаемости кружка фиксированным числом запросов"""
+    club_id = club.id
+    # Общее количество занятий одинаково для всех студентов и хранится в кружке
+    total_classes = club.sessions_count
     
-    # Получаем всех студентов кружка
-    memberships_result = await db.execute(
-        select(ClubMembership).where(ClubMembership.club_id == club_id)
-    )
-    memberships = memberships_result.scalars().all()
-    
-    students_info = []
+    # Посещения берем из сводной таблицы по первичному ключу (club_id, student_id)
+    visits = func.coalesce(AttendanceStats.visits, 0)
     
-    for membership in memberships:
-        student_result = await db.execute(
-            select(User).where(User.id == membership.student_id)
-        )
-        student = student_result.scalar_one()
-        
-        # Подсчитываем посещения
-        visits_result = await db.execute(
-            select(func.count(Attendance.id)).where(
-                and_(
-                    Attendance.club_id == club_id,
-                    Attendance.student_id == student.id
-                )
-            )
-        )
-        visits = visits_result.scalar() or 0
-        
-        # Подсчитываем общее количество занятий (уникальные даты)
-        total_classes_result = await db.execute(
-            select(func.count(func.distinct(Attendance.date))).where(
-                Attendance.club_id == club_id
+    query = (
+        select(User.id, User.full_name, visits.label("visits"))
+        .select_from(ClubMembership)
+        .join(User, User.id == ClubMembership.student_id)
+        .outerjoin(
+            AttendanceStats,
+            and_(
+                AttendanceStats.club_id == ClubMembership.club_id,
+                AttendanceStats.student_id == ClubMembership.student_id
             )
         )
-        total_classes = total_classes_result.scalar() or 0
-        
-        # Процент посещаемости
-        attendance_percentage = (visits / total_classes * 100) if total_classes > 0 else 0
-        
+        .where(ClubMembership.club_id == club_id)
+    )
+    
+    # Общее число занятий одинаково для всех, поэтому сортировка по проценту
+    # посещаемости совпадает с сортировкой по числу посещений
+    sort_columns = {
+        "name": User.full_name,
+        "attendance": visits,
+    }
+    if sort in sort_columns:
+        column = sort_columns[sort]
+        query = query.order_by(column.desc() if order == "desc" else column.asc())
+    query = query.order_by(ClubMembership.id)
+    
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    
+    result = await db.execute(query)
+    
+    students_info = []
+    for student_id, student_name, student_visits in result.all():
+        attendance_percentage = (student_visits / total_classes * 100) if total_classes > 0 else 0
         students_info.append(StudentAttendanceInfo(
-            student_id=student.id,
-            student_name=student.full_name,
-            visits=visits,
+            student_id=student_id,
+            student_name=student_name,
+            visits=student_visits,
             total_classes=total_classes,
             attendance_percentage=round(attendance_percentage, 1)
         ))
@@ -89,6 +106,21 @@ async def get_club_students(
     return students_info
 
 
+@router.get("/{club_id}/students", response_model=List[StudentAttendanceInfo])
+async def get_club_students(
+    club_id: int,
+    sort: Optional[Literal["name", "attendance"]] = None,
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    club = await verify_club_owner(club_id, current_user, db)
+    
+    return await build_club_roster(club, db, sort=sort, order=order, limit=limit, offset=offset)
+
+
 @router.post("/{club_id}/attendance")
 async def mark_attendance(
     club_id: int,
@@ -131,6 +163,9 @@ async def mark_attendance(
             detail="Посещаемость на эту дату уже отмечена"
         )
     
+    # Отметка посещения означает, что занятие в эту дату проводилось
+    await record_session(db, club_id, attendance_data.date)
+    
     # Создаем запись о посещении
     new_attendance = Attendance(
         club_id=club_id,
@@ -140,11 +175,210 @@ async def mark_attendance(
     )
     
     db.add(new_attendance)
-    await db.commit()
+    
+    try:
+        await db.flush()
+        await add_visits(db, club_id, [attendance_data.student_id])
+        await db.commit()
+    except IntegrityError:
+        # Параллельная отметка того же студента на ту же дату
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Посещаемость на эту дату уже отмечена"
+        )
     
     return {"message": "Attendance marked successfully"}
 
 
+@router.post("/{club_id}/attendance/bulk", response_model=BulkAttendanceResponse)
+async def mark_attendance_bulk(
+    club_id: int,
+    attendance_data: BulkAttendanceRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await verify_club_owner(club_id, current_user, db)
+    
+    # Порядок сохраняем, повторы убираем; присутствие важнее отметки об отсутствии
+    present_ids = list(dict.fromkeys(attendance_data.student_ids))
+    present_set = set(present_ids)
+    absent_ids = [
+        student_id for student_id in dict.fromkeys(attendance_data.absent_ids)
+        if student_id not in present_set
+    ]
+    all_ids = present_ids + absent_ids
+    
+    members = set()
+    already_marked = set()
+    if all_ids:
+        # Членство всех студентов проверяем одним запросом
+        members_result = await db.execute(
+            select(ClubMembership.student_id).where(
+                and_(
+                    ClubMembership.club_id == club_id,
+                    ClubMembership.student_id.in_(all_ids)
+                )
+            )
+        )
+        members = set(members_result.scalars().all())
+        
+        # Уже отмеченные на эту дату
+        marked_result = await db.execute(
+            select(Attendance.student_id).where(
+                and_(
+                    Attendance.club_id == club_id,
+                    Attendance.date == attendance_data.date,
+                    Attendance.student_id.in_(all_ids)
+                )
+            )
+        )
+        already_marked = set(marked_result.scalars().all())
+    
+    to_mark = [
+        student_id for student_id in present_ids
+        if student_id in members and student_id not in already_marked
+    ]
+    to_unmark = [
+        student_id for student_id in absent_ids
+        if student_id in members and student_id in already_marked
+    ]
+    
+    # Перекличка означает, что занятие в эту дату проводилось,
+    # даже если никто не пришел
+    if members:
+        await record_session(db, club_id, attendance_data.date)
+    
+    # Счетчики посещений меняем только для строк, действительно вставленных
+    # или удаленных: параллельная перекличка могла успеть раньше
+    marked = set()
+    if to_mark:
+        today = date.today()
+        insert_result = await db.execute(
+            insert_skipping_duplicates(db, Attendance, [
+                {
+                    "club_id": club_id,
+                    "student_id": student_id,
+                    "date": attendance_data.date,
+                    "marked_at": today
+                }
+                for student_id in to_mark
+            ]).returning(Attendance.student_id)
+        )
+        marked = set(insert_result.scalars().all())
+        await add_visits(db, club_id, list(marked))
+    
+    # Отсутствующих, ошибочно отмеченных ранее, снимаем
+    unmarked = set()
+    if to_unmark:
+        delete_result = await db.execute(
+            delete(Attendance)
+            .where(
+                and_(
+                    Attendance.club_id == club_id,
+                    Attendance.date == attendance_data.date,
+                    Attendance.student_id.in_(to_unmark)
+                )
+            )
+            .returning(Attendance.student_id)
+            .execution_options(synchronize_session=False)
+        )
+        unmarked = set(delete_result.scalars().all())
+        await add_visits(db, club_id, list(unmarked), delta=-1)
+    
+    await db.commit()
+    
+    results = []
+    for student_id in present_ids:
+        if student_id not in members:
+            result_status = "not_member"
+        elif student_id in marked:
+            result_status = "marked"
+        else:
+            result_status = "already_marked"
+        results.append(BulkAttendanceResult(student_id=student_id, status=result_status))
+    for student_id in absent_ids:
+        if student_id not in members:
+            result_status = "not_member"
+        elif student_id in unmarked:
+            result_status = "unmarked"
+        else:
+            result_status = "absent"
+        results.append(BulkAttendanceResult(student_id=student_id, status=result_status))
+    
+    return BulkAttendanceResponse(
+        date=attendance_data.date,
+        marked=len(marked),
+        results=results
+    )
+
+
+def attendance_export_response(
+    query, export_format: str, filename: str, user_id: int
+) -> StreamingResponse:
+    """Потоковый ответ с выгрузкой посещаемости.
+
+    Сессия зависимости закрывается до отправки тела ответа, поэтому
+    генератор открывает собственную сессию на время выгрузки.
+    """
+    async def body():
+        async with read_session(user_id=user_id) as session:
+            async for chunk in stream_attendance(session, query, export_format):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+
+@router.get("/attendance/export")
+async def export_owned_clubs_attendance(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Выгрузка посещаемости всех кружков преподавателя"""
+    if not current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Этот endpoint предназначен только для преподавателей"
+        )
+    
+    result = await db.execute(select(Club.id).where(Club.owner_id == current_user.id))
+    club_ids = result.scalars().all()
+    
+    return attendance_export_response(
+        attendance_export_query(club_ids, date_from, date_to),
+        export_format,
+        "attendance",
+        current_user.id
+    )
+
+
+@router.get("/{club_id}/attendance/export")
+async def export_club_attendance(
+    club_id: int,
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Выгрузка посещаемости кружка: занятие, участник, присутствие"""
+    await verify_club_owner(club_id, current_user, db)
+    
+    return attendance_export_response(
+        attendance_export_query([club_id], date_from, date_to),
+        export_format,
+        f"attendance-club-{club_id}",
+        current_user.id
+    )
+
+
 @router.get("/{club_id}/settings")
 async def get_club_settings(
     club_id: int,
@@ -169,7 +403,8 @@ async def get_club_settings(
                 "id": s.id,
                 "day_of_week": s.day_of_week,
                 "start_time": s.start_time.strftime("%H:%M"),
-                "location": s.location
+                "location": s.location,
+                "duration_minutes": s.duration_minutes
             }
             for s in schedules
         ]
@@ -193,8 +428,19 @@ async def update_club_settings(
         club.max_students = settings.max_students
     if settings.recruitment_open is not None:
         club.recruitment_open = settings.recruitment_open
+    club.version = Club.version + 1
+    
+    # Увеличение лимита или открытие набора освобождает места для очереди ожидания
+    if settings.max_students is not None or settings.recruitment_open:
+        await db.flush()
+        await promote_from_waitlist(club_id, db)
+    
+    # Подписчики потока мест видят новый лимит и открытие или закрытие набора
+    if settings.max_students is not None or settings.recruitment_open is not None:
+        await publish_seats(club_id, db)
     
     await db.commit()
+    invalidate_club(club_id)
     await db.refresh(club)
     
     return {"message": "Settings updated successfully"}
@@ -213,15 +459,52 @@ async def add_schedule_item(
     time_parts = schedule_data.start_time.split(":")
     start_time_obj = time(int(time_parts[0]), int(time_parts[1]))
     
+    weekday = parse_weekday(schedule_data.day_of_week)
+    if weekday is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Неизвестный день недели"
+        )
+    duration = schedule_data.duration_minutes
+    if not MIN_DURATION_MINUTES <= duration <= MAX_DURATION_MINUTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Длительность занятия - от {MIN_DURATION_MINUTES} до {MAX_DURATION_MINUTES} минут"
+        )
+    slot = schedule_slot(schedule_data.day_of_week, start_time_obj, duration)
+    if slot["end_minute"] > MINUTES_PER_DAY:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Занятие должно закончиться до полуночи"
+        )
+    
+    location = schedule_data.location.strip()
+    conflict = await find_location_conflict(
+        db, location, weekday, slot["start_minute"], slot["end_minute"]
+    )
+    if conflict:
+        busy, busy_club_title = conflict
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"{location} занята: {busy_club_title}, {busy.day_of_week} "
+                f"{format_minute(busy.start_minute)}-{format_minute(busy.end_minute)}"
+            )
+        )
+    
     new_schedule = Schedule(
         club_id=club_id,
-        day_of_week=schedule_data.day_of_week,
+        day_of_week=WEEKDAYS[weekday],
         start_time=start_time_obj,
-        location=schedule_data.location
+        location=location,
+        duration_minutes=duration,
+        **slot
     )
     
     db.add(new_schedule)
+    await db.execute(bump_club_version(club_id))
     await db.commit()
+    invalidate_club(club_id)
     await db.refresh(new_schedule)
     
     return {"message": "Schedule item added successfully", "id": new_schedule.id}
@@ -254,7 +537,9 @@ async def delete_schedule_item(
         )
     
     await db.delete(schedule)
+    await db.execute(bump_club_version(club_id))
     await db.commit()
+    invalidate_club(club_id)
     
     return {"message": "Schedule item deleted successfully"}
 
@@ -265,12 +550,6 @@ async def get_club_stats(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    await verify_club_owner(club_id, current_user, db)
-    
-    # Подсчитываем количество студентов
-    students_count_result = await db.execute(
-        select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club_id)
-    )
-    total_students = students_count_result.scalar() or 0
+    club = await verify_club_owner(club_id, current_user, db)
     
-    return {"total_students": total_students}
+    return {"total_students": club.current_students}
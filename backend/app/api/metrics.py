@@ -0,0 +1,91 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.cache import catalogue_cache, principal_cache
+from app.core.events import seat_events
+from app.core.hashing import hashing_pool
+from app.core.metrics import REGISTRY
+from app.db.database import InstrumentedQueuePool, engine, replicas
+
+router = APIRouter()
+
+
+def _db_pool_metrics():
+    """Состояние пулов соединений основной базы и реплик"""
+    pools = [("primary", engine.pool)] + [
+        (f"replica{index}", replica_engine.pool)
+        for index, replica_engine in enumerate(replicas.engines)
+    ]
+    pools = [(name, pool) for name, pool in pools if isinstance(pool, InstrumentedQueuePool)]
+
+    yield "db_pool_size", "gauge", "Постоянный размер пула соединений", [
+        ("", {"pool": name}, pool.size()) for name, pool in pools
+    ]
+    yield "db_pool_checked_out", "gauge", "Соединения, выданные запросам", [
+        ("", {"pool": name}, pool.checkedout()) for name, pool in pools
+    ]
+    yield "db_pool_overflow", "gauge", "Соединения сверх постоянного размера пула", [
+        ("", {"pool": name}, max(pool.overflow(), 0)) for name, pool in pools
+    ]
+    yield "db_pool_timeouts_total", "counter", "Запросы, не дождавшиеся соединения", [
+        ("", {"pool": name}, pool.timeouts) for name, pool in pools
+    ]
+    yield "db_pool_wait_seconds", "histogram", "Ожидание соединения из пула", [
+        sample for name, pool in pools for sample in pool.wait_seconds.samples({"pool": name})
+    ]
+
+
+def _cache_metrics():
+    """Счетчики кэшей процесса"""
+    caches = [("catalogue", catalogue_cache.stats()), ("principal", principal_cache.stats())]
+    for key, type_name, help_text in [
+        ("size", "gauge", "Число записей в кэше"),
+        ("hits", "counter", "Попадания в кэш"),
+        ("misses", "counter", "Промахи кэша"),
+        ("evictions", "counter", "Записи, вытесненные при переполнении"),
+        ("expirations", "counter", "Записи, удаленные по истечении TTL"),
+    ]:
+        name = f"cache_{key}" if type_name == "gauge" else f"cache_{key}_total"
+        yield name, type_name, help_text, [
+            ("", {"cache": cache_name}, stats[key]) for cache_name, stats in caches
+        ]
+
+
+def _hashing_metrics():
+    """Загрузка пула хеширования паролей"""
+    yield "password_hash_pending", "gauge", "Задачи хеширования в пуле и в очереди", [
+        ("", {}, hashing_pool.pending)
+    ]
+    yield "password_hash_rejected_total", "counter", "Задачи, отклоненные из-за переполнения очереди", [
+        ("", {}, hashing_pool.rejected)
+    ]
+    yield "password_hash_seconds", "histogram", "Время хеширования пароля", list(
+        hashing_pool.hash_seconds.samples({})
+    )
+    yield "password_hash_queue_wait_seconds", "histogram", "Ожидание свободного потока хеширования", list(
+        hashing_pool.wait_seconds.samples({})
+    )
+
+
+def _seat_stream_metrics():
+    """Подписчики потока мест в этом процессе"""
+    yield "seat_stream_subscribers", "gauge", "Открытые потоки заполненности кружков", [
+        ("", {}, seat_events.subscriber_count())
+    ]
+    yield "seat_events_received_total", "counter", "События о местах, принятые процессом", [
+        ("", {}, seat_events.received)
+    ]
+
+
+REGISTRY.add_collector(_db_pool_metrics)
+REGISTRY.add_collector(_cache_metrics)
+REGISTRY.add_collector(_hashing_metrics)
+REGISTRY.add_collector(_seat_stream_metrics)
+
+
+@router.get("", response_class=PlainTextResponse)
+def metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
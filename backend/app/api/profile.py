@@ -1,14 +1,16 @@
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from app.db.database import get_db
-from app.db.models import User, Club, ClubMembership, Attendance, Schedule
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app.db.models import User, Club, ClubMembership, AttendanceStats, Schedule
 from app.schemas.profile import (
     StudentProfileResponse, TeacherProfileResponse,
-    StudentStats, TeacherStats, StudentClubInfo, TeacherClubInfo, ScheduleItem
+    StudentStats, TeacherStats, StudentClubInfo, TeacherClubInfo, ScheduleItem,
+    ScheduleConflict
 )
-from app.api.auth import get_current_user
-from datetime import date
+from app.db.schedule import student_conflicts_query, format_minute
+from app.api.auth import get_current_user, get_read_db
 
 router = APIRouter()
 
@@ -16,7 +18,7 @@ router = APIRouter()
 @router.get("/student", response_model=StudentProfileResponse)
 async def get_student_profile(
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.is_teacher:
         raise HTTPException(
@@ -24,19 +26,40 @@ async def get_student_profile(
             detail="This endpoint is for students only"
         )
     
-    # Получаем все кружки студента
-    memberships_result = await db.execute(
-        select(ClubMembership).where(ClubMembership.student_id == current_user.id)
+    # Кружки студента вместе с именами преподавателей одним запросом
+    owner = aliased(User)
+    clubs_result = await db.execute(
+        select(Club, owner.full_name)
+        .select_from(ClubMembership)
+        .join(Club, Club.id == ClubMembership.club_id)
+        .join(owner, owner.id == Club.owner_id)
+        .where(ClubMembership.student_id == current_user.id)
+        .order_by(ClubMembership.id)
     )
-    memberships = memberships_result.scalars().all()
+    clubs = clubs_result.all()
+    club_ids = [club.id for club, _ in clubs]
     
-    my_clubs = len(memberships)
+    my_clubs = len(clubs)
     
-    # Подсчитываем общее количество посещений
-    total_visits_result = await db.execute(
-        select(func.count(Attendance.id)).where(Attendance.student_id == current_user.id)
+    # Посещения студента по всем кружкам (включая покинутые) из сводной таблицы
+    visits_result = await db.execute(
+        select(AttendanceStats.club_id, AttendanceStats.visits)
+        .where(AttendanceStats.student_id == current_user.id)
     )
-    total_visits = total_visits_result.scalar() or 0
+    visits_by_club = dict(visits_result.all())
+    total_visits = sum(visits_by_club.values())
+    
+    schedules_by_club = {club_id: [] for club_id in club_ids}
+    
+    if club_ids:
+        # Расписание всех кружков студента
+        schedules_result = await db.execute(
+            select(Schedule)
+            .where(Schedule.club_id.in_(club_ids))
+            .order_by(Schedule.id)
+        )
+        for schedule in schedules_result.scalars().all():
+            schedules_by_club[schedule.club_id].append(schedule)
     
     # Подсчитываем процент посещаемости
     # Для каждого кружка считаем посещения и общее количество занятий
@@ -46,41 +69,10 @@ async def get_student_profile(
     club_infos = []
     all_schedule_items = []
     
-    for membership in memberships:
-        club_result = await db.execute(
-            select(Club).where(Club.id == membership.club_id)
-        )
-        club = club_result.scalar_one()
-        
-        # Получаем количество студентов в кружке
-        students_count_result = await db.execute(
-            select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club.id)
-        )
-        current_students = students_count_result.scalar() or 0
-        
-        # Получаем имя преподавателя
-        owner_result = await db.execute(select(User).where(User.id == club.owner_id))
-        owner = owner_result.scalar_one()
-        
-        # Подсчитываем посещения для этого кружка
-        visits_result = await db.execute(
-            select(func.count(Attendance.id)).where(
-                and_(
-                    Attendance.club_id == club.id,
-                    Attendance.student_id == current_user.id
-                )
-            )
-        )
-        visits = visits_result.scalar() or 0
-        
-        # Подсчитываем общее количество занятий (по датам посещений)
-        # Упрощенно: считаем уникальные даты посещений для всех студентов кружка
-        classes_result = await db.execute(
-            select(func.count(func.distinct(Attendance.date))).where(
-                Attendance.club_id == club.id
-            )
-        )
-        total_classes_for_club = classes_result.scalar() or 0
+    for club, teacher_name in clubs:
+        visits = visits_by_club.get(club.id, 0)
+        # Общее количество проведенных занятий хранится в кружке
+        total_classes_for_club = club.sessions_count
         
         total_classes += total_classes_for_club
         total_attended += visits
@@ -91,26 +83,21 @@ async def get_student_profile(
         club_infos.append(StudentClubInfo(
             club_id=club.id,
             club_title=club.title,
-            teacher_name=owner.full_name,
-            current_students=current_students,
+            teacher_name=teacher_name,
+            current_students=club.current_students,
             max_students=club.max_students,
             visits=visits,
             total_classes=total_classes_for_club,
             attendance_percentage=round(attendance_percentage, 1)
         ))
         
-        # Получаем расписание для этого кружка
-        schedules_result = await db.execute(
-            select(Schedule).where(Schedule.club_id == club.id)
-        )
-        schedules = schedules_result.scalars().all()
-        
-        for schedule in schedules:
+        for schedule in schedules_by_club[club.id]:
             all_schedule_items.append(ScheduleItem(
                 club_title=club.title,
                 day_of_week=schedule.day_of_week,
                 start_time=schedule.start_time.strftime("%H:%M"),
-                location=schedule.location
+                location=schedule.location,
+                duration_minutes=schedule.duration_minutes
             ))
     
     # Общий процент посещаемости
@@ -134,10 +121,41 @@ async def get_student_profile(
     )
 
 
+@router.get("/student/conflicts", response_model=List[ScheduleConflict])
+async def get_student_conflicts(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Занятия разных кружков студента, пересекающиеся по времени"""
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This endpoint is for students only"
+        )
+    
+    result = await db.execute(student_conflicts_query(current_user.id))
+    return [
+        {
+            "day_of_week": first.day_of_week,
+            "club_id": first.club_id,
+            "club_title": first_title,
+            "start_time": format_minute(first.start_minute),
+            "end_time": format_minute(first.end_minute),
+            "location": first.location,
+            "other_club_id": second.club_id,
+            "other_club_title": second_title,
+            "other_start_time": format_minute(second.start_minute),
+            "other_end_time": format_minute(second.end_minute),
+            "other_location": second.location,
+        }
+        for first, first_title, second, second_title in result.all()
+    ]
+
+
 @router.get("/teacher", response_model=TeacherProfileResponse)
 async def get_teacher_profile(
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if not current_user.is_teacher:
         raise HTTPException(
@@ -156,16 +174,10 @@ async def get_teacher_profile(
     
     club_infos = []
     for club in clubs:
-        # Подсчитываем количество студентов
-        students_count_result = await db.execute(
-            select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club.id)
-        )
-        student_count = students_count_result.scalar() or 0
-        
         club_infos.append(TeacherClubInfo(
             id=club.id,
             title=club.title,
-            student_count=student_count,
+            student_count=club.current_students,
             recruitment_open=club.recruitment_open
         ))
     
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from app.core.config import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Кэш в памяти процесса с ограничением размера (LRU) и временем жизни записей.
+
+    set с устаревшим generation игнорируется: значение, прочитанное до
+    инвалидации, не попадет в кэш после нее.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        """Удаляет одну запись или, если ключ не указан, весь кэш"""
+        if key is _MISSING:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+        self.generation += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Удаляет все записи, ключ которых удовлетворяет условию"""
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+        self.generation += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Сериализованные страницы публичного каталога, ключ - (фильтры, limit, курсор,
+# хеш id и версий кружков страницы)
+catalogue_cache = TTLCache(
+    maxsize=settings.CATALOGUE_CACHE_SIZE,
+    ttl=settings.CATALOGUE_CACHE_TTL
+)
+
+# Аутентифицированные пользователи, ключ - (user_id, время выпуска токена).
+# Имя и роль пользователя приложение не меняет, а хеш пароля в кэш не попадает,
+# поэтому запись устаревает только по PRINCIPAL_CACHE_TTL
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL
+)
@@ -4,6 +4,58 @@ class Settings(BaseSettings):
     APP_NAME: str = "Student Clubs Management"
     DATABASE_URL: str
 
+    # Пул соединений с базой (на каждый процесс uvicorn).
+    # Суммарно воркеры держат до (DB_POOL_SIZE + DB_MAX_OVERFLOW) * число воркеров
+    # соединений - это значение должно укладываться в max_connections Postgres
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Реплики для читающих запросов (через запятую); пусто - все идет в DATABASE_URL.
+    # После записи пользователь REPLICA_STICKY_SECONDS читает с основной базы,
+    # недоступная реплика исключается на REPLICA_RETRY_SECONDS
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_RETRY_SECONDS: float = 30.0
+
+    # Лог медленных запросов: порог и доля запросов, для которых собирается SQL
+    SLOW_REQUEST_MS: float = 500.0
+    SLOW_REQUEST_SAMPLE_RATE: float = 0.1
+
+    # Полнотекстовый поиск ранжирует не больше этого числа последних совпадений
+    SEARCH_MAX_CANDIDATES: int = 1000
+
+    # Строк в одной порции потоковой выгрузки посещаемости
+    EXPORT_CHUNK_ROWS: int = 2000
+
+    # Доставка событий о местах в кружках: memory - в пределах процесса,
+    # postgres - всем воркерам через LISTEN/NOTIFY. Поток мест шлет
+    # комментарий-пинг, если SEAT_STREAM_HEARTBEAT секунд не было событий
+    EVENTS_BACKEND: str = "memory"
+    SEAT_STREAM_HEARTBEAT: float = 15.0
+
+    # Кэш публичного каталога кружков
+    CATALOGUE_CACHE_SIZE: int = 256
+    CATALOGUE_CACHE_TTL: float = 60.0
+
+    # Кэш пользователей, разрешенных по JWT
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 30.0
+
+    # Пул потоков для bcrypt: число потоков и допустимая длина очереди
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+
+    # Политика хеширования новых паролей (bcrypt или scrypt) и ее стоимость.
+    # Хеши со старыми параметрами обновляются при входе пользователя
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_SCRYPT_N: int = 16384
+    PASSWORD_SCRYPT_R: int = 8
+    PASSWORD_SCRYPT_P: int = 1
+
     class Config:
         env_file = ".env"
 
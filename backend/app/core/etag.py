@@ -0,0 +1,26 @@
+from fastapi import Request
+
+
+def make_etag(*parts) -> str:
+    """Строит сильный ETag из частей, прочитанных из базы (версии кружков).
+
+    Версии хранятся в базе, поэтому ETag одинаков на всех воркерах и
+    меняется сразу после коммита изменения, где бы оно ни выполнялось.
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Проверяет If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
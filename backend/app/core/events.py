@@ -0,0 +1,188 @@
+"""
+Рассылка заполненности кружков подписчикам потока /clubs/{club_id}/seats/stream.
+
+Подписка хранит только последнее состояние кружка: новое событие заменяет
+не отправленное, поэтому медленный клиент не копит очередь. Ожидающая
+подписка - это asyncio.Event, простаивающие подписчики не тратят процессор.
+
+Состояние публикуется внутри транзакции, которая его изменила, и доходит до
+подписчиков только после коммита:
+- EVENTS_BACKEND=memory - подписчикам своего процесса (один воркер);
+- EVENTS_BACKEND=postgres - через NOTIFY club_seats всем воркерам, которые
+  слушают канал на отдельном соединении (LISTEN). NOTIFY доставляется
+  в порядке коммитов, откат транзакции его отменяет.
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Set
+from sqlalchemy import select, func, cast, literal_column, event, Text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "club_seats"
+
+# Вместо состояния: события могли потеряться, подписчик перечитывает кружок сам
+RESYNC = object()
+
+# Паузы между попытками восстановить LISTEN, секунды
+RECONNECT_DELAYS = (0.5, 1, 2, 5, 10)
+
+
+class Subscription:
+    """Подписка на один кружок с ячейкой для последнего состояния"""
+
+    def __init__(self, club_id: int):
+        self.club_id = club_id
+        self._state = None
+        self._ready = asyncio.Event()
+
+    def offer(self, state) -> None:
+        self._state = state
+        self._ready.set()
+
+    async def next(self, timeout: float):
+        """Последнее состояние, RESYNC или None, если за timeout изменений не было"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        state, self._state = self._state, None
+        return state
+
+
+class SeatBroker:
+    """Подписчики процесса; события публикуются только в этот процесс"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self.received = 0
+
+    def subscribe(self, club_id: int) -> Subscription:
+        subscription = Subscription(club_id)
+        self._subscribers.setdefault(club_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.club_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.club_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def deliver(self, state: dict) -> None:
+        """Передает состояние подписчикам кружка в этом процессе"""
+        self.received += 1
+        for subscription in self._subscribers.get(state["club_id"], ()):
+            subscription.offer(state)
+
+    def resync_all(self) -> None:
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.offer(RESYNC)
+
+    async def start(self) -> None:
+        """Готовит прием событий; для памяти процесса ничего не нужно"""
+
+    async def publish(self, session: AsyncSession, state_query) -> None:
+        """Публикует состояние, которое state_query читает в транзакции сессии.
+
+        state_query возвращает одну строку с колонкой club_id; подписчики
+        получат ее после коммита сессии.
+        """
+        row = (await session.execute(state_query)).mappings().one_or_none()
+        if row is not None:
+            session.info.setdefault("seat_events", []).append(dict(row))
+
+
+class PostgresSeatBroker(SeatBroker):
+    """Публикация через NOTIFY и прием через LISTEN на отдельном соединении asyncpg"""
+
+    def __init__(self, database_url: str):
+        super().__init__()
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+        self._connecting: Optional[asyncio.Lock] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._connection is not None and not self._connection.is_closed():
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            if self._connection is None or self._connection.is_closed():
+                await self._listen()
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self._dsn)
+        await connection.add_listener(CHANNEL, self._on_notification)
+        connection.add_termination_listener(self._on_terminated)
+        self._connection = connection
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            state = json.loads(payload)
+        except ValueError:
+            logger.warning("Некорректное событие в канале %s: %r", channel, payload)
+            return
+        self.deliver(state)
+
+    def _on_terminated(self, connection) -> None:
+        logger.warning("Соединение LISTEN %s потеряно, переподключаемся", CHANNEL)
+        if self._reconnecting is None or self._reconnecting.done():
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        attempt = 0
+        while True:
+            await asyncio.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+            try:
+                await self._listen()
+            except Exception as error:
+                attempt += 1
+                logger.warning("Не удалось восстановить LISTEN %s: %s", CHANNEL, error)
+                continue
+            # Пока соединения не было, события не принимались
+            self.resync_all()
+            return
+
+    async def publish(self, session: AsyncSession, state_query) -> None:
+        state = state_query.subquery("seat_state")
+        await session.execute(
+            select(func.pg_notify(CHANNEL, cast(func.row_to_json(literal_column(state.name)), Text)))
+            .select_from(state)
+        )
+
+
+def create_broker() -> SeatBroker:
+    if settings.EVENTS_BACKEND == "memory":
+        return SeatBroker()
+    if settings.EVENTS_BACKEND == "postgres":
+        return PostgresSeatBroker(settings.DATABASE_URL)
+    raise ValueError(f"Неизвестный EVENTS_BACKEND: {settings.EVENTS_BACKEND}")
+
+
+seat_events = create_broker()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_committed(session):
+    for state in session.info.pop("seat_events", ()):
+        seat_events.deliver(state)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop("seat_events", None)
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional
+import bcrypt
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+
+class HashingPoolBusy(Exception):
+    """Очередь на хеширование паролей заполнена"""
+
+
+@dataclass(frozen=True)
+class HashPolicy:
+    """Алгоритм и стоимость хеширования новых паролей"""
+    scheme: str = "bcrypt"  # bcrypt или scrypt
+    bcrypt_rounds: int = 12
+    scrypt_n: int = 2 ** 14
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+
+    def describe(self) -> str:
+        if self.scheme == "scrypt":
+            return f"scrypt(n={self.scrypt_n}, r={self.scrypt_r}, p={self.scrypt_p})"
+        return f"bcrypt(rounds={self.bcrypt_rounds})"
+
+
+current_policy = HashPolicy(
+    scheme=settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    scrypt_n=settings.PASSWORD_SCRYPT_N,
+    scrypt_r=settings.PASSWORD_SCRYPT_R,
+    scrypt_p=settings.PASSWORD_SCRYPT_P
+)
+
+_SCRYPT_PREFIX = "$scrypt$"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode('utf-8'),
+        salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r * p,
+        dklen=32
+    )
+
+
+def _parse_scrypt(hashed_password: str):
+    """Разбирает хеш вида $scrypt$ln=14,r=8,p=1$<соль>$<хеш>"""
+    _, _, params, salt, digest = hashed_password.split("$")
+    values = dict(item.split("=") for item in params.split(","))
+    return 2 ** int(values["ln"]), int(values["r"]), int(values["p"]), _b64decode(salt), _b64decode(digest)
+
+
+def hash_password(password: str, policy: Optional[HashPolicy] = None) -> str:
+    """Хеширует пароль по заданной (или текущей) политике"""
+    policy = policy or current_policy
+    
+    if policy.scheme == "scrypt":
+        salt = os.urandom(16)
+        digest = _scrypt(password, salt, policy.scrypt_n, policy.scrypt_r, policy.scrypt_p)
+        log_n = policy.scrypt_n.bit_length() - 1
+        return (
+            f"{_SCRYPT_PREFIX}ln={log_n},r={policy.scrypt_r},p={policy.scrypt_p}"
+            f"${_b64encode(salt)}${_b64encode(digest)}"
+        )
+    
+    # Генерируем соль и хешируем пароль
+    salt = bcrypt.gensalt(rounds=policy.bcrypt_rounds)
+    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Проверяет пароль; алгоритм определяется по формату хеша"""
+    if hashed_password.startswith(_SCRYPT_PREFIX):
+        n, r, p, salt, digest = _parse_scrypt(hashed_password)
+        return hmac.compare_digest(_scrypt(plain_password, salt, n, r, p), digest)
+    
+    return bcrypt.checkpw(
+        plain_password.encode('utf-8'),
+        hashed_password.encode('utf-8')
+    )
+
+
+def needs_rehash(hashed_password: str, policy: Optional[HashPolicy] = None) -> bool:
+    """Проверяет, отличается ли алгоритм или стоимость хеша от политики"""
+    policy = policy or current_policy
+    
+    if hashed_password.startswith(_SCRYPT_PREFIX):
+        if policy.scheme != "scrypt":
+            return True
+        n, r, p, _, _ = _parse_scrypt(hashed_password)
+        return (n, r, p) != (policy.scrypt_n, policy.scrypt_r, policy.scrypt_p)
+    
+    if policy.scheme != "bcrypt":
+        return True
+    # Формат bcrypt: $2b$<стоимость>$<соль и хеш>
+    return int(hashed_password.split("$")[2]) != policy.bcrypt_rounds
+
+
+class HashingPool:
+    """Выполняет хеширование паролей в отдельных потоках, не блокируя цикл событий.
+
+    bcrypt и scrypt отпускают GIL, поэтому потоков достаточно. Если в работе и в
+    очереди уже workers + queue_limit задач, новая сразу отклоняется.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self.hash_seconds = Histogram()
+        self.wait_seconds = Histogram()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def run(self, func, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HashingPoolBusy()
+
+        submitted_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            return func(*args), started_at, time.perf_counter()
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, finished_at = await loop.run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+
+        # Метрики пишем в потоке цикла событий, чтобы обойтись без блокировок
+        self.wait_seconds.observe(started_at - submitted_at)
+        self.hash_seconds.observe(finished_at - started_at)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "hash_seconds": self.hash_seconds.snapshot(),
+            "queue_wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT
+)
+
+
+def benchmark_policy(policy: HashPolicy, duration: float) -> float:
+    """Возвращает число хешей в секунду для политики на этой машине"""
+    count = 0
+    started_at = time.perf_counter()
+    while True:
+        hash_password("benchmark-password", policy)
+        count += 1
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= duration:
+            return count / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скорость хеширования паролей для разных политик")
+    parser.add_argument("--seconds", type=float, default=2.0, help="время замера одной политики")
+    args = parser.parse_args()
+
+    policies = [current_policy]
+    policies += [HashPolicy(scheme="bcrypt", bcrypt_rounds=rounds) for rounds in (10, 11, 12, 13)]
+    policies += [replace(HashPolicy(scheme="scrypt"), scrypt_n=2 ** log_n) for log_n in (14, 15, 16)]
+
+    print(f"Текущая политика: {current_policy.describe()}")
+    for policy in dict.fromkeys(policies):
+        rate = benchmark_policy(policy, args.seconds)
+        print(f"{policy.describe():<40} {rate:8.1f} хешей/с  {1000 / rate:8.1f} мс/хеш")
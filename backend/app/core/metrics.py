@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import time
+from bisect import bisect_left
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Границы корзин в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (семантика le, как в Prometheus)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": buckets}
+
+    def samples(self, labels: Dict[str, str]) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield "_bucket", {**labels, "le": str(bound)}, cumulative
+        yield "_bucket", {**labels, "le": "+Inf"}, self.count
+        yield "_sum", labels, self.sum
+        yield "_count", labels, self.count
+
+
+# Семейство метрик для текстового формата: имя, тип, описание и значения
+# (суффикс имени, метки, значение)
+MetricFamily = Tuple[str, str, str, Iterable[Tuple[str, Dict[str, str], float]]]
+
+
+class _LabeledMetric:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+
+    def _labels(self, label_values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.label_names, label_values))
+
+
+class Counter(_LabeledMetric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self._values.items():
+            yield "", self._labels(label_values), value
+
+
+class Gauge(_LabeledMetric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self):
+        for label_values, value in self._values.items():
+            yield "", self._labels(label_values), value
+
+
+class HistogramFamily(_LabeledMetric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, ...], Histogram] = {}
+
+    def observe(self, *label_values: str, value: float) -> None:
+        histogram = self._histograms.get(label_values)
+        if histogram is None:
+            histogram = self._histograms[label_values] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def samples(self):
+        for label_values, histogram in self._histograms.items():
+            yield from histogram.samples(self._labels(label_values))
+
+
+class Registry:
+    """Метрики процесса и сборщики, вычисляющие значения в момент выгрузки"""
+
+    def __init__(self):
+        self._metrics: List[_LabeledMetric] = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self._collectors.append(collector)
+
+    def families(self) -> Iterable[MetricFamily]:
+        for metric in self._metrics:
+            yield metric.name, metric.type_name, metric.help_text, metric.samples()
+        for collector in self._collectors:
+            yield from collector()
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus (version 0.0.4)"""
+        lines = []
+        for name, type_name, help_text, samples in self.families():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+http_requests_total = REGISTRY.register(Counter(
+    "http_requests_total", "Число обработанных HTTP-запросов",
+    ("method", "route", "status")
+))
+http_requests_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Число HTTP-запросов в обработке"
+))
+http_request_duration_seconds = REGISTRY.register(HistogramFamily(
+    "http_request_duration_seconds", "Длительность обработки HTTP-запроса",
+    ("method", "route")
+))
+
+
+# Полные шаблоны маршрутов по id объекта маршрута. FastAPI кладет в scope["route"]
+# маршрут из подключенного роутера, и его path может быть без префикса роутера
+# ("/" и у /health/, и у /clubs/), поэтому префикс запоминается при подключении
+route_templates: Dict[int, str] = {}
+
+
+def include_router(app, router, prefix: str = "", **kwargs) -> None:
+    """app.include_router, запоминающий полные шаблоны маршрутов роутера для меток"""
+    for route in router.routes:
+        path = getattr(route, "path", None)
+        if path is not None:
+            route_templates[id(route)] = prefix + path
+    app.include_router(router, prefix=prefix, **kwargs)
+
+
+class MetricsMiddleware:
+    """Считает запросы и их длительность по шаблону маршрута.
+
+    Шаблон (например, /management/{club_id}/students) берется по scope["route"],
+    который FastAPI заполняет при маршрутизации, поэтому число рядов метрик
+    не растет вместе с числом разных club_id. Роутеры подключаются через
+    include_router этого модуля, чтобы в шаблоне был их префикс.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        http_requests_in_flight.inc()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            template = route_templates.get(id(route), route.path) if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests_total.inc(method, template, str(status_code))
+            http_request_duration_seconds.observe(
+                method, template, value=time.perf_counter() - started_at
+            )
+
+
+async def _benchmark_middleware(iterations: int) -> Tuple[float, float]:
+    """Время вызова пустого приложения без middleware и с ним, в микросекундах"""
+    route = SimpleNamespace(path="/management/{club_id}/students")
+
+    async def app(scope, receive, send):
+        scope["route"] = route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def run(target) -> float:
+        started_at = time.perf_counter()
+        for _ in range(iterations):
+            await target({"type": "http", "method": "GET", "path": "/management/1/students"}, receive, send)
+        return (time.perf_counter() - started_at) / iterations * 1e6
+
+    bare = await run(app)
+    instrumented = await run(MetricsMiddleware(app))
+    return bare, instrumented
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Накладные расходы MetricsMiddleware на запрос")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    bare, instrumented = asyncio.run(_benchmark_middleware(args.iterations))
+    print(f"Без middleware:  {bare:6.2f} мкс/запрос")
+    print(f"С middleware:    {instrumented:6.2f} мкс/запрос")
+    print(f"Накладные расходы: {instrumented - bare:6.2f} мкс/запрос (цель < 20)")
@@ -0,0 +1,130 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from app.core.config import settings
+
+logger = logging.getLogger("app.profiling")
+
+
+class QueryStats:
+    """Число SQL-запросов и суммарное время в базе для запроса или блока кода"""
+
+    def __init__(self, keep_statements: bool = False, parent: Optional["QueryStats"] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Optional[List[Tuple[str, float]]] = [] if keep_statements else None
+        self.parent = parent
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.seconds += duration
+        if self.statements is not None:
+            self.statements.append((statement, duration))
+        if self.parent is not None:
+            self.parent.record(statement, duration)
+
+    def format_statements(self) -> str:
+        return "\n".join(
+            f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())}"
+            for statement, duration in self.statements or []
+        )
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+# Слушаем класс Engine: учитываются и основная база, и реплики
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_query_stats.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    started = conn.info.get("query_started_at")
+    if stats is None or not started:
+        return
+    stats.record(statement, time.perf_counter() - started.pop())
+
+
+class QueryProfilerMiddleware:
+    """Считает SQL-запросы каждого HTTP-запроса.
+
+    Результат отдается в заголовках Server-Timing и X-DB-Queries. Для доли
+    SLOW_REQUEST_SAMPLE_RATE запросов собирается список выражений, и если
+    запрос шел дольше SLOW_REQUEST_MS, он пишется в лог.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < settings.SLOW_REQUEST_SAMPLE_RATE
+        stats = QueryStats(keep_statements=sampled, parent=current_query_stats.get())
+        token = current_query_stats.set(stats)
+        started_at = time.perf_counter()
+        long_lived = False
+
+        async def send_with_timing(message):
+            nonlocal long_lived
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                # Поток событий открыт, пока клиент не отключится: это не медленный запрос
+                long_lived = headers.get("content-type", "").startswith("text/event-stream")
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+                )
+                headers.append("X-DB-Queries", str(stats.count))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            if sampled and not long_lived and elapsed_ms >= settings.SLOW_REQUEST_MS:
+                logger.warning(
+                    "Медленный запрос %s %s: %.1f ms, SQL: %d запросов, %.1f ms\n%s",
+                    scope["method"], scope["path"], elapsed_ms,
+                    stats.count, stats.seconds * 1000, stats.format_statements()
+                )
+
+
+@contextmanager
+def count_queries():
+    """Считает SQL-запросы внутри блока, включая запросы вложенных HTTP-вызовов"""
+    stats = QueryStats(keep_statements=True, parent=current_query_stats.get())
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Для тестов: падает, если блок выполнил больше limit SQL-запросов.
+
+        with assert_max_queries(3):
+            response = await client.get("/management/1/students", headers=auth)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError(
+            f"Выполнено {stats.count} SQL-запросов, допустимо не больше {limit}:\n"
+            f"{stats.format_statements()}"
+        )
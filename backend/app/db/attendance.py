@@ -0,0 +1,84 @@
+from datetime import date
+from typing import List
+from sqlalchemy import insert, select, update, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Club, ClubSession, AttendanceStats
+
+
+def insert_skipping_duplicates(db: AsyncSession, model, rows: List[dict]):
+    """Многострочный INSERT, пропускающий строки, нарушающие уникальность"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql_insert(model).values(rows).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite_insert(model).values(rows).on_conflict_do_nothing()
+    return insert(model).values(rows)
+
+
+async def record_session(db: AsyncSession, club_id: int, session_date: date) -> bool:
+    """Регистрирует проведенное занятие кружка в текущей транзакции.
+
+    Повторная регистрация той же даты ничего не меняет. Возвращает True,
+    если занятие новое и счетчик занятий кружка увеличен.
+    """
+    result = await db.execute(
+        insert_skipping_duplicates(db, ClubSession, [{"club_id": club_id, "date": session_date}])
+        .returning(ClubSession.id)
+    )
+    if result.scalar_one_or_none() is None:
+        return False
+
+    await db.execute(
+        update(Club)
+        .where(Club.id == club_id)
+        .values(sessions_count=Club.sessions_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+async def add_visits(db: AsyncSession, club_id: int, student_ids: List[int], delta: int = 1):
+    """Изменяет счетчики посещений студентов кружка на delta в текущей транзакции"""
+    if not student_ids:
+        return
+
+    rows = [
+        {"club_id": club_id, "student_id": student_id, "visits": delta}
+        for student_id in student_ids
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+        statement = dialect_insert(AttendanceStats).values(rows)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[AttendanceStats.club_id, AttendanceStats.student_id],
+            set_={"visits": AttendanceStats.visits + statement.excluded.visits}
+        ))
+        return
+
+    existing_result = await db.execute(
+        select(AttendanceStats.student_id).where(
+            and_(
+                AttendanceStats.club_id == club_id,
+                AttendanceStats.student_id.in_(student_ids)
+            )
+        )
+    )
+    existing = set(existing_result.scalars().all())
+    if existing:
+        await db.execute(
+            update(AttendanceStats)
+            .where(
+                and_(
+                    AttendanceStats.club_id == club_id,
+                    AttendanceStats.student_id.in_(existing)
+                )
+            )
+            .values(visits=AttendanceStats.visits + delta)
+            .execution_options(synchronize_session=False)
+        )
+    missing = [row for row in rows if row["student_id"] not in existing]
+    if missing:
+        await db.execute(insert(AttendanceStats).values(missing))
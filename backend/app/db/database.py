@@ -1,15 +1,267 @@
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError, InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import Headers, MutableHeaders
 from app.core.config import settings
+from app.core.metrics import Histogram
 
-db_url = settings.DATABASE_URL
-if db_url.startswith("postgresql://") and "asyncpg" not in db_url:
-    db_url = db_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+# Ожидание соединения обычно укладывается в миллисекунды,
+# верхние корзины ловят исчерпание пула
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
 
-engine = create_async_engine(db_url, echo=False)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий ожидание свободного соединения"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_seconds = Histogram(POOL_WAIT_BUCKETS)
+        self.timeouts = 0
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_seconds.observe(time.perf_counter() - started_at)
+
+
+def normalize_db_url(url: str) -> str:
+    if url.startswith("postgresql://") and "asyncpg" not in url:
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def engine_options(url: str) -> dict:
+    """Параметры пула из настроек; SQLite (тесты, локальный запуск) оставляем по умолчанию"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_stats(target_engine) -> dict:
+    """Состояние пула соединений движка в текущем процессе"""
+    pool = target_engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "timeouts": pool.timeouts,
+        "wait_seconds": pool.wait_seconds.snapshot(),
+    }
+
+
+db_url = normalize_db_url(settings.DATABASE_URL)
+
+engine = create_async_engine(db_url, echo=False, **engine_options(db_url))
 
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def get_db():
     async with async_session() as session:
         yield session
+
+
+# Пользователь текущего запроса; выставляется в get_current_user
+request_user_id: ContextVar[Optional[int]] = ContextVar("request_user_id", default=None)
+
+# Отметка записи, которую клиент хранит и возвращает с запросами: до этого
+# момента (unix-время, секунды) его чтения идут на основную базу
+READ_PRIMARY_HEADER = "X-Read-Primary-Until"
+
+
+class ReplicaRequestState:
+    """Отметка записи из запроса клиента и признак коммита в этом запросе"""
+
+    def __init__(self, primary_until: float = 0.0):
+        self.primary_until = primary_until
+        self.committed = False
+
+
+request_replica_state: ContextVar[Optional[ReplicaRequestState]] = ContextVar(
+    "request_replica_state", default=None
+)
+
+# Ошибки, после которых реплика считается недоступной
+REPLICA_CONNECTION_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, OSError)
+
+
+class ReplicaRouter:
+    """Распределяет читающие сессии по репликам по кругу с учетом их доступности.
+
+    Чтобы пользователь видел собственные изменения, после его коммита
+    чтения на REPLICA_STICKY_SECONDS уходят на основную базу. Отметку
+    записи несет клиент (заголовок X-Read-Primary-Until, см.
+    ReadYourWritesMiddleware), поэтому она действует на любом воркере.
+    Отметки в памяти процесса - по пользователю для клиентов, которые
+    заголовок не возвращают, и для общих данных (каталог, карточки кружков)
+    после любого их изменения - видны только воркеру, выполнившему запись.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.engines = [create_async_engine(url, echo=False, **engine_options(url)) for url in urls]
+        self.sessionmakers = [
+            sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False, info={"replica": True})
+            for replica_engine in self.engines
+        ]
+        self._next = 0
+        self._down_until = [0.0] * len(urls)
+        self._user_sticky_until: Dict[int, float] = {}
+        self._shared_sticky_until = 0.0
+
+    def mark_user_write(self, user_id: int) -> None:
+        now = time.monotonic()
+        if len(self._user_sticky_until) > 10000:
+            self._user_sticky_until = {
+                key: until for key, until in self._user_sticky_until.items() if until > now
+            }
+        self._user_sticky_until[user_id] = now + settings.REPLICA_STICKY_SECONDS
+
+    def mark_shared_write(self) -> None:
+        self._shared_sticky_until = time.monotonic() + settings.REPLICA_STICKY_SECONDS
+
+    def mark_down(self, index: int) -> None:
+        self._down_until[index] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+    def candidates(self, user_id: Optional[int], shared: bool) -> List[int]:
+        """Доступные реплики в порядке обхода; пустой список - читать с основной базы"""
+        if not self.engines:
+            return []
+        state = request_replica_state.get()
+        if state is not None and state.primary_until > time.time():
+            return []
+        now = time.monotonic()
+        if user_id is not None and self._user_sticky_until.get(user_id, 0.0) > now:
+            return []
+        if shared and self._shared_sticky_until > now:
+            return []
+
+        start = self._next
+        self._next = (self._next + 1) % len(self.engines)
+        order = [(start + offset) % len(self.engines) for offset in range(len(self.engines))]
+        return [index for index in order if self._down_until[index] <= now]
+
+
+replicas = ReplicaRouter([
+    normalize_db_url(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+])
+
+
+if replicas.engines:
+    @event.listens_for(Session, "after_commit")
+    def _remember_writer(session):
+        if session.info.get("replica"):
+            return
+        state = request_replica_state.get()
+        if state is not None:
+            state.committed = True
+        user_id = request_user_id.get()
+        if user_id is not None:
+            replicas.mark_user_write(user_id)
+
+
+class ReadYourWritesMiddleware:
+    """Переносит отметку записи пользователя между воркерами через клиента.
+
+    После коммита на основную базу ответ получает заголовок
+    X-Read-Primary-Until со временем конца окна REPLICA_STICKY_SECONDS;
+    клиент возвращает его в следующих запросах, и их чтения идут на основную
+    базу, на каком бы воркере они ни выполнялись. Отметка дальше окна от
+    текущего времени не принимается: клиент не может закрепить себя за
+    основной базой дольше. Часы воркеров должны быть синхронизированы.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas.engines:
+            await self.app(scope, receive, send)
+            return
+
+        state = ReplicaRequestState(_parse_primary_until(Headers(scope=scope).get(READ_PRIMARY_HEADER)))
+        token = request_replica_state.set(state)
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start" and state.committed:
+                MutableHeaders(scope=message).append(
+                    READ_PRIMARY_HEADER, f"{time.time() + settings.REPLICA_STICKY_SECONDS:.3f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            request_replica_state.reset(token)
+
+
+def _parse_primary_until(value: Optional[str]) -> float:
+    try:
+        primary_until = float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+    if primary_until > time.time() + settings.REPLICA_STICKY_SECONDS + 1:
+        return 0.0
+    return primary_until
+
+
+@asynccontextmanager
+async def read_session(user_id: Optional[int] = None, shared: bool = False):
+    """Сессия для чтения на очередной доступной реплике или на основной базе.
+
+    Соединение с репликой берется сразу: если реплика недоступна, она
+    исключается из обхода на REPLICA_RETRY_SECONDS и пробуется следующая,
+    а когда реплик не осталось - сессия открывается на основной базе. С ней
+    соединение берется лениво, поэтому ответы из кэша и 304 его не занимают.
+    Реплика, на которой запрос упал с ошибкой соединения позже, тоже
+    исключается из обхода.
+    """
+    for index in replicas.candidates(user_id, shared):
+        session = replicas.sessionmakers[index]()
+        try:
+            await session.connection()
+        except REPLICA_CONNECTION_ERRORS:
+            await session.close()
+            replicas.mark_down(index)
+            continue
+
+        try:
+            async with session:
+                yield session
+        except REPLICA_CONNECTION_ERRORS:
+            replicas.mark_down(index)
+            raise
+        return
+
+    async with async_session() as session:
+        yield session
+
+
+async def get_catalogue_db():
+    """Сессия для публичных читающих обработчиков (каталог)"""
+    async with read_session(shared=True) as session:
+        yield session
@@ -0,0 +1,231 @@
+"""
+Потоковая выгрузка посещаемости кружков в CSV и NDJSON.
+
+Строка выгрузки - пара (проведенное занятие, текущий участник кружка) с
+признаком присутствия. Строки читаются курсором на стороне сервера частями
+по EXPORT_CHUNK_ROWS и сразу кодируются, поэтому память не зависит от
+длины истории.
+
+Замер памяти на синтетических данных (отдельная база):
+    python -m app.db.export --rows 5000000 --max-rss-mb 200
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import resource
+import time
+from datetime import date
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import select, insert, and_
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core.config import settings
+from app.db.models import Base, Club, User, ClubMembership, ClubSession, Attendance
+
+EXPORT_COLUMNS = ["club_id", "club_title", "date", "student_id", "student_name", "present"]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def attendance_export_query(
+    club_ids: List[int],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Матрица посещаемости в длинном формате, по кружкам, датам и порядку записи"""
+    query = (
+        select(
+            ClubSession.club_id,
+            Club.title,
+            ClubSession.date,
+            User.id,
+            User.full_name,
+            Attendance.id.is_not(None)
+        )
+        .select_from(ClubSession)
+        .join(Club, Club.id == ClubSession.club_id)
+        .join(ClubMembership, ClubMembership.club_id == ClubSession.club_id)
+        .join(User, User.id == ClubMembership.student_id)
+        .outerjoin(
+            Attendance,
+            and_(
+                Attendance.club_id == ClubSession.club_id,
+                Attendance.student_id == ClubMembership.student_id,
+                Attendance.date == ClubSession.date
+            )
+        )
+        .where(ClubSession.club_id.in_(club_ids))
+        .order_by(ClubSession.club_id, ClubSession.date, ClubMembership.id)
+    )
+    if date_from is not None:
+        query = query.where(ClubSession.date >= date_from)
+    if date_to is not None:
+        query = query.where(ClubSession.date <= date_to)
+    return query
+
+
+def _encode_csv(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        # BOM нужен Excel, чтобы распознать кириллицу в UTF-8
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_COLUMNS)
+    for club_id, title, session_date, student_id, student_name, present in rows:
+        writer.writerow([club_id, title, session_date.isoformat(), student_id, student_name, int(present)])
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows, header: bool) -> bytes:
+    return "".join(
+        json.dumps(
+            {
+                "club_id": club_id,
+                "club_title": title,
+                "date": session_date.isoformat(),
+                "student_id": student_id,
+                "student_name": student_name,
+                "present": bool(present),
+            },
+            ensure_ascii=False
+        ) + "\n"
+        for club_id, title, session_date, student_id, student_name, present in rows
+    ).encode("utf-8")
+
+
+_ENCODERS = {"csv": _encode_csv, "ndjson": _encode_ndjson}
+
+
+async def stream_attendance(
+    session: AsyncSession,
+    query,
+    export_format: str,
+    chunk_rows: int = settings.EXPORT_CHUNK_ROWS
+) -> AsyncIterator[bytes]:
+    """Кодирует результат запроса частями, не загружая его целиком"""
+    encode = _ENCODERS[export_format]
+    if export_format == "csv":
+        yield encode([], header=True)
+
+    result = await session.stream(query.execution_options(yield_per=chunk_rows))
+    async for rows in result.partitions():
+        yield encode(rows, header=False)
+
+
+def _current_rss_mb() -> float:
+    """Текущий RSS процесса (Linux), иначе пиковый"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _seed(session: AsyncSession, rows: int, clubs: int, members: int) -> List[int]:
+    """Кружки с участниками и занятиями так, чтобы матрица дала не меньше rows строк"""
+    sessions_per_club = -(-rows // (clubs * members))
+    owner_id = await session.scalar(
+        insert(User).values(
+            username=f"export-bench-{time.time_ns()}", full_name="Benchmark",
+            password_hash="-", is_teacher=True
+        ).returning(User.id)
+    )
+    club_ids = []
+    for club_index in range(clubs):
+        club_id = await session.scalar(
+            insert(Club).values(
+                title=f"Кружок {club_index}", category="Программирование",
+                max_students=members, owner_id=owner_id
+            ).returning(Club.id)
+        )
+        club_ids.append(club_id)
+        student_ids = (await session.execute(
+            insert(User).returning(User.id),
+            [
+                {
+                    "username": f"export-bench-{club_id}-{index}",
+                    "full_name": f"Студент {club_id}-{index}",
+                    "password_hash": "-",
+                }
+                for index in range(members)
+            ]
+        )).scalars().all()
+        await session.execute(insert(ClubMembership), [
+            {"club_id": club_id, "student_id": student_id} for student_id in student_ids
+        ])
+        await session.execute(insert(ClubSession), [
+            {"club_id": club_id, "date": date.fromordinal(date(2020, 1, 1).toordinal() + day)}
+            for day in range(sessions_per_club)
+        ])
+    # Каждый второй студент отмечен на каждом занятии
+    await session.execute(
+        insert(Attendance).from_select(
+            ["club_id", "student_id", "date", "marked_at"],
+            select(ClubSession.club_id, ClubMembership.student_id, ClubSession.date, ClubSession.date)
+            .join(ClubMembership, ClubMembership.club_id == ClubSession.club_id)
+            .where(ClubSession.club_id.in_(club_ids), (ClubSession.id + ClubMembership.id) % 2 == 0)
+        )
+    )
+    await session.commit()
+    return club_ids
+
+
+async def benchmark(database_url: str, rows: int, clubs: int, members: int, export_format: str) -> dict:
+    """Наполняет отдельную базу и выгружает матрицу, измеряя RSS по ходу выгрузки"""
+    from app.db.database import normalize_db_url
+
+    bench_engine = create_async_engine(normalize_db_url(database_url))
+    async with bench_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(bench_engine) as session:
+        club_ids = (await session.execute(
+            select(Club.id).where(Club.title.like("Кружок %")).order_by(Club.id)
+        )).scalars().all()
+        if not club_ids:
+            club_ids = await _seed(session, rows, clubs, members)
+
+    rss_before = _current_rss_mb()
+    peak_rss = rss_before
+    exported_bytes = 0
+    exported_rows = 0
+    started_at = time.perf_counter()
+    async with AsyncSession(bench_engine) as session:
+        async for chunk in stream_attendance(session, attendance_export_query(club_ids), export_format):
+            exported_bytes += len(chunk)
+            exported_rows += chunk.count(b"\n")
+            peak_rss = max(peak_rss, _current_rss_mb())
+    elapsed = time.perf_counter() - started_at
+
+    await bench_engine.dispose()
+    if export_format == "csv":
+        exported_rows -= 1
+    return {
+        "rows": exported_rows,
+        "megabytes": round(exported_bytes / 2 ** 20, 1),
+        "seconds": round(elapsed, 1),
+        "rows_per_second": round(exported_rows / elapsed),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Память и скорость потоковой выгрузки посещаемости")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///export_bench.db",
+                        help="отдельная база для замера, не рабочая")
+    parser.add_argument("--rows", type=int, default=5000000)
+    parser.add_argument("--clubs", type=int, default=50)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--format", choices=sorted(_ENCODERS), default="csv")
+    parser.add_argument("--max-rss-mb", type=float, default=200.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args.database_url, args.rows, args.clubs, args.members, args.format))
+    print(report)
+    raise SystemExit(0 if report["peak_rss_mb"] <= args.max_rss_mb else 1)
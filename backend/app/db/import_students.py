@@ -0,0 +1,309 @@
+"""
+Массовый импорт студентов и их записей в кружки из CSV.
+
+Формат файла (первая строка - заголовок):
+    username,full_name,password,clubs
+    ivanov,Иванов Иван,secret123,1;4
+
+Вместо password можно передать готовый хеш в колонке password_hash.
+В clubs - id кружков через точку с запятой (колонку можно не заполнять).
+
+Запуск:
+    python -m app.db.import_students students.csv
+    python -m app.db.import_students students.csv --bcrypt-rounds 4
+
+Файл читается порциями по --batch-size строк. Пароли хешируются в пуле
+процессов, пока в базу пишется предыдущая порция. Пользователи вставляются
+многострочным INSERT, записи в кружки - через COPY в PostgreSQL. Проверки
+существующих логинов, повторных записей и свободных мест выполняются одним
+запросом на порцию. Каждая порция - отдельная транзакция.
+
+Хеш по облегченной политике (--bcrypt-rounds, --hash-scheme) заменяется на
+хеш по текущей политике при первом входе студента. Кэш каталога в
+работающих воркерах обновится по истечении CATALOGUE_CACHE_TTL.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import date
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select, update, insert, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.clubs import publish_seats
+from app.core.hashing import HashPolicy, current_policy, hash_password
+from app.db.attendance import insert_skipping_duplicates
+from app.db.database import async_session, engine
+from app.db.models import Club, User, ClubMembership, WaitlistEntry
+from app.db.waitlist import remove_from_waitlist
+
+# Префиксы поддерживаемых форматов хеша (bcrypt и scrypt)
+HASH_PREFIXES = ("$2a$", "$2b$", "$2y$", "$scrypt$")
+
+
+@dataclass
+class ImportRow:
+    line: int
+    username: str
+    full_name: str
+    password: Optional[str]
+    password_hash: Optional[str]
+    club_ids: List[int]
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    existing: int = 0
+    enrolled: int = 0
+    already_enrolled: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    def reject(self, line: int, reason: str):
+        self.errors.append((line, reason))
+
+
+def read_rows(path: str, report: ImportReport) -> Iterator[ImportRow]:
+    """Читает CSV построчно, пропуская некорректные и повторные строки"""
+    seen = set()
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        for line, record in enumerate(csv.DictReader(csv_file), start=2):
+            username = (record.get("username") or "").strip()
+            full_name = (record.get("full_name") or "").strip()
+            password = record.get("password") or None
+            password_hash = (record.get("password_hash") or "").strip() or None
+
+            if not username or not full_name:
+                report.reject(line, "не заполнены username или full_name")
+                continue
+            if username in seen:
+                report.reject(line, f"логин {username} уже встречался в файле")
+                continue
+            if password_hash and not password_hash.startswith(HASH_PREFIXES):
+                report.reject(line, "неизвестный формат password_hash")
+                continue
+            if not password and not password_hash:
+                report.reject(line, "не заполнены password или password_hash")
+                continue
+            try:
+                club_ids = [
+                    int(club_id) for club_id in (record.get("clubs") or "").split(";") if club_id.strip()
+                ]
+            except ValueError:
+                report.reject(line, "в clubs должны быть id кружков через ';'")
+                continue
+
+            seen.add(username)
+            yield ImportRow(line, username, full_name, password, password_hash, list(dict.fromkeys(club_ids)))
+
+
+def batches(rows: Iterator[ImportRow], size: int) -> Iterator[List[ImportRow]]:
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def hash_batch(pool: ProcessPoolExecutor, batch: List[ImportRow], policy: HashPolicy) -> List[str]:
+    """Хеши паролей порции; готовые хеши из файла не пересчитываются"""
+    passwords = [row.password for row in batch if not row.password_hash]
+    loop = asyncio.get_running_loop()
+    hashed = iter(await loop.run_in_executor(
+        None,
+        lambda: list(pool.map(partial(hash_password, policy=policy), passwords, chunksize=16))
+    ))
+    return [row.password_hash or next(hashed) for row in batch]
+
+
+async def insert_users(session: AsyncSession, batch: List[ImportRow], hashes: List[str],
+                       report: ImportReport) -> Dict[str, int]:
+    """Создает новых пользователей и возвращает id всех пользователей порции"""
+    usernames = [row.username for row in batch]
+    result = await session.execute(
+        select(User.username, User.id, User.is_teacher).where(User.username.in_(usernames))
+    )
+    existing = {username: (user_id, is_teacher) for username, user_id, is_teacher in result.all()}
+
+    user_ids = {}
+    new_rows = []
+    for row, password_hash in zip(batch, hashes):
+        if row.username in existing:
+            user_id, is_teacher = existing[row.username]
+            if is_teacher:
+                report.reject(row.line, f"{row.username} - преподаватель, запись в кружки пропущена")
+                continue
+            user_ids[row.username] = user_id
+            report.existing += 1
+        else:
+            new_rows.append({
+                "username": row.username,
+                "full_name": row.full_name,
+                "password_hash": password_hash,
+                "is_teacher": False,
+            })
+
+    if new_rows:
+        # Логин, занятый параллельной регистрацией, пропускается и ищется ниже
+        result = await session.execute(
+            insert_skipping_duplicates(session, User, new_rows).returning(User.username, User.id)
+        )
+        created = dict(result.all())
+        report.created += len(created)
+        user_ids.update(created)
+
+        raced = [row["username"] for row in new_rows if row["username"] not in created]
+        if raced:
+            result = await session.execute(
+                select(User.username, User.id).where(User.username.in_(raced), User.is_teacher == False)
+            )
+            user_ids.update(dict(result.all()))
+            report.existing += len(raced)
+    return user_ids
+
+
+async def copy_memberships(session: AsyncSession, pairs: List[Tuple[int, int]]):
+    """Вставляет записи в кружки: COPY в PostgreSQL, многострочный INSERT в остальных базах"""
+    joined_at = date.today()
+    if session.get_bind().dialect.name == "postgresql":
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            ClubMembership.__tablename__,
+            records=[(club_id, student_id, joined_at) for club_id, student_id in pairs],
+            columns=["club_id", "student_id", "joined_at"]
+        )
+        return
+    await session.execute(insert(ClubMembership), [
+        {"club_id": club_id, "student_id": student_id, "joined_at": joined_at}
+        for club_id, student_id in pairs
+    ])
+
+
+async def enroll(session: AsyncSession, batch: List[ImportRow], user_ids: Dict[str, int],
+                 report: ImportReport):
+    """Записывает студентов порции в кружки с проверкой мест одним набором запросов"""
+    requested = [
+        (row, club_id, user_ids[row.username])
+        for row in batch if row.username in user_ids
+        for club_id in row.club_ids
+    ]
+    if not requested:
+        return
+
+    club_ids = sorted({club_id for _, club_id, _ in requested})
+    student_ids = sorted({student_id for _, _, student_id in requested})
+
+    # Блокируем кружки: join_club и leave_club меняют счетчик под той же блокировкой строки
+    clubs_query = select(Club.id, Club.max_students, Club.current_students).where(Club.id.in_(club_ids))
+    if session.get_bind().dialect.name == "postgresql":
+        clubs_query = clubs_query.order_by(Club.id).with_for_update()
+    result = await session.execute(clubs_query)
+    free_seats = {club_id: max_students - current for club_id, max_students, current in result.all()}
+
+    result = await session.execute(
+        select(ClubMembership.club_id, ClubMembership.student_id).where(
+            ClubMembership.club_id.in_(club_ids),
+            ClubMembership.student_id.in_(student_ids)
+        )
+    )
+    enrolled = set(result.all())
+
+    pairs = []
+    added = defaultdict(int)
+    for row, club_id, student_id in requested:
+        if club_id not in free_seats:
+            report.reject(row.line, f"кружок {club_id} не найден")
+        elif (club_id, student_id) in enrolled:
+            report.already_enrolled += 1
+        elif added[club_id] >= free_seats[club_id]:
+            report.reject(row.line, f"в кружке {club_id} нет свободных мест")
+        else:
+            added[club_id] += 1
+            pairs.append((club_id, student_id))
+    if not pairs:
+        return
+
+    await copy_memberships(session, pairs)
+    await session.execute(
+        update(Club.__table__)
+        .where(Club.__table__.c.id == bindparam("b_club_id"))
+        .values(
+            current_students=Club.__table__.c.current_students + bindparam("b_added"),
+            version=Club.__table__.c.version + 1
+        ),
+        [{"b_club_id": club_id, "b_added": count} for club_id, count in added.items()]
+    )
+    # Записанные студенты больше не ждут места в этих кружках
+    students_by_club = defaultdict(list)
+    for club_id, student_id in pairs:
+        students_by_club[club_id].append(student_id)
+    for club_id, club_student_ids in students_by_club.items():
+        await remove_from_waitlist(session, club_id, WaitlistEntry.student_id.in_(club_student_ids))
+        # С EVENTS_BACKEND=postgres воркеры получат NOTIFY после коммита порции
+        await publish_seats(club_id, session)
+    report.enrolled += len(pairs)
+
+
+async def import_students(path: str, policy: HashPolicy, batch_size: int, workers: int) -> ImportReport:
+    report = ImportReport()
+    started_at = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = batches(read_rows(path, report), batch_size)
+        batch = next(rows, None)
+        hashing = asyncio.ensure_future(hash_batch(pool, batch, policy)) if batch else None
+
+        while batch:
+            hashes = await hashing
+            # Следующая порция хешируется, пока текущая пишется в базу
+            next_batch = next(rows, None)
+            if next_batch:
+                hashing = asyncio.ensure_future(hash_batch(pool, next_batch, policy))
+
+            async with async_session() as session:
+                user_ids = await insert_users(session, batch, hashes, report)
+                await enroll(session, batch, user_ids, report)
+                await session.commit()
+
+            processed = report.created + report.existing
+            print(f"Обработано студентов: {processed} ({processed / (time.perf_counter() - started_at):.0f}/с)")
+            batch = next_batch
+
+    await engine.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт студентов и записей в кружки из CSV")
+    parser.add_argument("path", help="CSV с колонками username, full_name, password или password_hash, clubs")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="процессов для хеширования")
+    parser.add_argument("--hash-scheme", choices=["bcrypt", "scrypt"], default=current_policy.scheme)
+    parser.add_argument("--bcrypt-rounds", type=int, default=current_policy.bcrypt_rounds,
+                        help="стоимость bcrypt для импорта; хеш обновится при первом входе")
+    args = parser.parse_args()
+
+    import_policy = replace(current_policy, scheme=args.hash_scheme, bcrypt_rounds=args.bcrypt_rounds)
+    print(f"Политика хеширования импорта: {import_policy.describe()}")
+
+    started = time.perf_counter()
+    result = asyncio.run(import_students(args.path, import_policy, args.batch_size, args.workers))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Создано студентов: {result.created}, уже были: {result.existing}, "
+        f"записей в кружки: {result.enrolled}, уже записаны: {result.already_enrolled}, "
+        f"за {elapsed:.1f} с"
+    )
+    for line, reason in result.errors[:20]:
+        print(f"Строка {line}: {reason}")
+    if len(result.errors) > 20:
+        print(f"... и еще {len(result.errors) - 20} ошибок")
+    raise SystemExit(1 if result.errors else 0)
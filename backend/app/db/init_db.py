@@ -5,6 +5,7 @@ import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.db.models import Base, User
+from app.db.search import create_search_index
 from app.api.auth import get_password_hash
 from app.core.config import settings
 
@@ -20,6 +21,7 @@ async def init_db():
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
     
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     
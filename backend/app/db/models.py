@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Time, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Time, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -23,6 +23,11 @@ class User(Base):
 
 class Club(Base):
     __tablename__ = "clubs"
+    __table_args__ = (
+        # Постраничный каталог: фильтр и порядок по id из одного индекса
+        Index("ix_clubs_category_id", "category", "id"),
+        Index("ix_clubs_recruitment_open_id", "recruitment_open", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -31,23 +36,45 @@ class Club(Base):
     max_students = Column(Integer, nullable=False)
     recruitment_open = Column(Boolean, default=True, nullable=False)
     image_url = Column(String, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Денормализованный счетчик участников, поддерживается join_club/leave_club
+    current_students = Column(Integer, default=0, server_default="0", nullable=False)
+    # Число проведенных занятий, поддерживается вместе с таблицей club_sessions
+    sessions_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Версия для ETag: увеличивается в той же транзакции, что и любое изменение
+    # кружка, его расписания или состава участников
+    version = Column(Integer, default=0, server_default="0", nullable=False)
 
     # Relationships
     owner = relationship("User", back_populates="owned_clubs", foreign_keys=[owner_id])
     memberships = relationship("ClubMembership", back_populates="club", cascade="all, delete-orphan")
     schedules = relationship("Schedule", back_populates="club", cascade="all, delete-orphan")
     attendances = relationship("Attendance", back_populates="club")
+    waitlist = relationship("WaitlistEntry", back_populates="club", cascade="all, delete-orphan")
+    sessions = relationship("ClubSession", back_populates="club", cascade="all, delete-orphan")
 
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    __table_args__ = (
+        # Расписание кружка и фильтр каталога по дню и времени занятия
+        Index("ix_schedules_club_id_day_of_week_start_time", "club_id", "day_of_week", "start_time"),
+        # Поиск занятий в той же аудитории, пересекающихся по времени
+        Index("ix_schedules_location_weekday_start_minute", "location", "weekday", "start_minute"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
     day_of_week = Column(String, nullable=False)  # Понедельник, Вторник, etc.
     start_time = Column(Time, nullable=False)
     location = Column(String, nullable=False)
+    duration_minutes = Column(Integer, nullable=False, default=90, server_default="90")
+    # Занятие как интервал минут [start_minute, end_minute) дня weekday (0 - понедельник),
+    # заполняется из day_of_week, start_time и duration_minutes (app.db.schedule.schedule_slot).
+    # NULL - день недели не распознан, такое занятие не проверяется на пересечения
+    weekday = Column(Integer, nullable=True)
+    start_minute = Column(Integer, nullable=True)
+    end_minute = Column(Integer, nullable=True)
 
     # Relationships
     club = relationship("Club", back_populates="schedules")
@@ -55,6 +82,11 @@ class Schedule(Base):
 
 class ClubMembership(Base):
     __tablename__ = "club_memberships"
+    __table_args__ = (
+        UniqueConstraint("club_id", "student_id", name="uq_club_memberships_club_student"),
+        # Кружки студента (профиль) без обращения к таблице
+        Index("ix_club_memberships_student_id_club_id", "student_id", "club_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
@@ -68,6 +100,14 @@ class ClubMembership(Base):
 
 class Attendance(Base):
     __tablename__ = "attendances"
+    __table_args__ = (
+        # Одна отметка на студента и дату; префикс (club_id, student_id) - посещения студента
+        UniqueConstraint("club_id", "student_id", "date", name="uq_attendances_club_student_date"),
+        # Уникальные даты занятий кружка и отметки за дату
+        Index("ix_attendances_club_id_date_student_id", "club_id", "date", "student_id"),
+        # Посещения студента по кружкам (профиль)
+        Index("ix_attendances_student_id_club_id", "student_id", "club_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
@@ -79,3 +119,50 @@ class Attendance(Base):
     club = relationship("Club", back_populates="attendances")
     student = relationship("User", back_populates="attendances")
 
+
+class WaitlistEntry(Base):
+    __tablename__ = "club_waitlist"
+    __table_args__ = (
+        UniqueConstraint("club_id", "student_id", name="uq_club_waitlist_club_student"),
+        # Голова очереди и позиция студента ищутся по номеру внутри кружка
+        Index("ix_club_waitlist_club_id_seq", "club_id", "seq"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Номер в очереди кружка, без разрывов от головы (см. app.db.waitlist)
+    seq = Column(Integer, nullable=False)
+    created_at = Column(Date, default=datetime.now().date(), nullable=False)
+
+    # Relationships
+    club = relationship("Club", back_populates="waitlist")
+    student = relationship("User")
+
+
+class ClubSession(Base):
+    """Проведенное занятие кружка: одна строка на дату"""
+    __tablename__ = "club_sessions"
+    __table_args__ = (
+        UniqueConstraint("club_id", "date", name="uq_club_sessions_club_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
+    date = Column(Date, nullable=False)
+
+    # Relationships
+    club = relationship("Club", back_populates="sessions")
+
+
+class AttendanceStats(Base):
+    """Число посещений студента в кружке, поддерживается при отметке посещаемости"""
+    __tablename__ = "attendance_stats"
+    __table_args__ = (
+        # Посещения студента по всем кружкам (профиль)
+        Index("ix_attendance_stats_student_id", "student_id"),
+    )
+
+    club_id = Column(Integer, ForeignKey("clubs.id"), primary_key=True)
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    visits = Column(Integer, default=0, server_default="0", nullable=False)
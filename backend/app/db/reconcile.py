@@ -0,0 +1,151 @@
+"""
+Скрипт для проверки и исправления денормализованных счетчиков.
+
+Запуск:
+    python -m app.db.reconcile                  # только показать расхождения
+    python -m app.db.reconcile --fix            # исправить расхождения
+    python -m app.db.reconcile --rebuild-stats  # пересчитать attendance_stats с нуля
+
+Пересобирать attendance_stats лучше вне перекличек: отметки, сделанные
+во время пересборки, могут учесться дважды.
+"""
+import argparse
+import asyncio
+from sqlalchemy import select, insert, update, delete, func, and_
+from app.db.database import async_session, engine
+from app.db.models import Club, ClubMembership, ClubSession, Attendance, AttendanceStats
+
+
+def _count_by_club(model):
+    """Коррелированный подсчет строк таблицы для каждого кружка"""
+    return (
+        select(func.count(model.id))
+        .where(model.club_id == Club.id)
+        .scalar_subquery()
+    )
+
+
+# Счетчик кружка и таблица, по которой он пересчитывается
+COUNTERS = [
+    (Club.current_students, ClubMembership),
+    (Club.sessions_count, ClubSession),
+]
+
+
+async def find_counter_drift(session, counter, model):
+    """Возвращает кружки, у которых счетчик не совпадает с числом строк в таблице"""
+    actual = _count_by_club(model)
+    result = await session.execute(
+        select(Club.id, Club.title, counter, actual)
+        .where(counter != actual)
+        .order_by(Club.id)
+    )
+    return result.all()
+
+
+def _visits_by_student():
+    """Посещения каждой пары (кружок, студент), посчитанные по сырым отметкам"""
+    return (
+        select(
+            Attendance.club_id.label("club_id"),
+            Attendance.student_id.label("student_id"),
+            func.count(Attendance.id).label("visits")
+        )
+        .group_by(Attendance.club_id, Attendance.student_id)
+        .subquery()
+    )
+
+
+async def find_stats_drift(session):
+    """Возвращает пары (кружок, студент), для которых сводка расходится с отметками"""
+    actual = _visits_by_student()
+    stored_visits = func.coalesce(AttendanceStats.visits, 0)
+
+    wrong_result = await session.execute(
+        select(actual.c.club_id, actual.c.student_id, stored_visits, actual.c.visits)
+        .outerjoin(
+            AttendanceStats,
+            and_(
+                AttendanceStats.club_id == actual.c.club_id,
+                AttendanceStats.student_id == actual.c.student_id
+            )
+        )
+        .where(stored_visits != actual.c.visits)
+    )
+    # Записи сводки, для которых отметок нет совсем
+    orphaned_result = await session.execute(
+        select(AttendanceStats.club_id, AttendanceStats.student_id, AttendanceStats.visits)
+        .outerjoin(
+            actual,
+            and_(
+                actual.c.club_id == AttendanceStats.club_id,
+                actual.c.student_id == AttendanceStats.student_id
+            )
+        )
+        .where(and_(actual.c.visits.is_(None), AttendanceStats.visits != 0))
+    )
+    return wrong_result.all() + [(*row, 0) for row in orphaned_result.all()]
+
+
+async def rebuild_attendance_stats(session):
+    """Пересчитывает сводку посещений целиком в текущей транзакции"""
+    await session.execute(delete(AttendanceStats))
+    await session.execute(
+        insert(AttendanceStats).from_select(
+            ["club_id", "student_id", "visits"],
+            select(Attendance.club_id, Attendance.student_id, func.count(Attendance.id))
+            .group_by(Attendance.club_id, Attendance.student_id)
+        )
+    )
+
+
+async def reconcile(fix: bool = False, rebuild_stats: bool = False) -> int:
+    total_drift = 0
+
+    async with async_session() as session:
+        for counter, model in COUNTERS:
+            drift = await find_counter_drift(session, counter, model)
+            total_drift += len(drift)
+
+            for club_id, title, stored, actual in drift:
+                print(f"Кружок {club_id} ({title}): {counter.key}={stored}, в {model.__tablename__}: {actual}")
+
+            if drift and fix:
+                # Пересчитываем коррелированным подзапросом, чтобы не затереть
+                # записи, сделанные между проверкой и исправлением
+                await session.execute(
+                    update(Club)
+                    .where(Club.id.in_([club_id for club_id, *_ in drift]))
+                    .values({counter.key: _count_by_club(model), "version": Club.version + 1})
+                )
+                print(f"Исправлено счетчиков {counter.key}: {len(drift)}")
+
+        stats_drift = await find_stats_drift(session)
+        total_drift += len(stats_drift)
+        for club_id, student_id, stored, actual in stats_drift[:20]:
+            print(f"Кружок {club_id}, студент {student_id}: attendance_stats.visits={stored}, отметок: {actual}")
+        if len(stats_drift) > 20:
+            print(f"... и еще {len(stats_drift) - 20} расхождений в attendance_stats")
+
+        if rebuild_stats or (stats_drift and fix):
+            await rebuild_attendance_stats(session)
+            print("Сводка attendance_stats пересчитана")
+
+        if fix or rebuild_stats:
+            await session.commit()
+
+    if not total_drift:
+        print("Расхождений не найдено")
+
+    await engine.dispose()
+    return total_drift
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка денормализованных счетчиков и сводок")
+    parser.add_argument("--fix", action="store_true", help="исправить найденные расхождения")
+    parser.add_argument("--rebuild-stats", action="store_true", help="пересчитать attendance_stats с нуля")
+    args = parser.parse_args()
+
+    drift_count = asyncio.run(reconcile(fix=args.fix, rebuild_stats=args.rebuild_stats))
+    raise SystemExit(1 if drift_count and not (args.fix or args.rebuild_stats) else 0)
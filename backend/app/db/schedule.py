@@ -0,0 +1,218 @@
+"""
+Пересечения занятий: у студента (два его кружка в одно время) и у аудитории
+(два занятия в одном месте в одно время).
+
+Занятие хранится как интервал минут [start_minute, end_minute) дня weekday
+(0 - понедельник). Длительность не больше MAX_DURATION_MINUTES, поэтому все
+занятия, пересекающиеся с [start, end), начинаются в диапазоне
+(start - MAX_DURATION_MINUTES, end): проверка аудитории - один диапазон по
+индексу (location, weekday, start_minute), а не перебор расписания.
+
+Замер проверки аудитории на синтетическом расписании (отдельная база):
+    python -m app.db.schedule --schedules 50000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import time as time_of_day
+from typing import Optional
+from sqlalchemy import select, insert, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import aliased
+from app.db.models import Base, Club, User, ClubMembership, Schedule
+
+WEEKDAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+_WEEKDAY_ALIASES = {
+    **{name.lower(): index for index, name in enumerate(WEEKDAYS)},
+    **{name: index for index, name in enumerate(["пн", "вт", "ср", "чт", "пт", "сб", "вс"])},
+}
+
+DEFAULT_DURATION_MINUTES = 90
+MIN_DURATION_MINUTES = 15
+MAX_DURATION_MINUTES = 240
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_weekday(day_of_week: str) -> Optional[int]:
+    """Номер дня недели (0 - понедельник) по названию или сокращению, иначе None"""
+    return _WEEKDAY_ALIASES.get(day_of_week.strip().rstrip(".").lower())
+
+
+def schedule_slot(day_of_week: str, start_time: time_of_day, duration_minutes: int) -> dict:
+    """Колонки weekday, start_minute и end_minute занятия; weekday None, если день не распознан"""
+    start_minute = start_time.hour * 60 + start_time.minute
+    return {
+        "weekday": parse_weekday(day_of_week),
+        "start_minute": start_minute,
+        "end_minute": start_minute + duration_minutes,
+    }
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def overlapping(other, weekday, start_minute, end_minute) -> list:
+    """Условия на занятие other, пересекающееся с интервалом [start_minute, end_minute) дня weekday"""
+    return [
+        other.weekday == weekday,
+        # Нижняя граница не нужна для ответа, но сужает диапазон по индексу
+        other.start_minute > start_minute - MAX_DURATION_MINUTES,
+        other.start_minute < end_minute,
+        other.end_minute > start_minute,
+    ]
+
+
+async def find_location_conflict(
+    db: AsyncSession,
+    location: str,
+    weekday: int,
+    start_minute: int,
+    end_minute: int
+):
+    """Первое занятие в той же аудитории, пересекающееся по времени: (Schedule, название кружка) или None"""
+    result = await db.execute(
+        select(Schedule, Club.title)
+        .join(Club, Club.id == Schedule.club_id)
+        .where(
+            Schedule.location == location,
+            *overlapping(Schedule, weekday, start_minute, end_minute)
+        )
+        .order_by(Schedule.start_minute)
+        .limit(1)
+    )
+    return result.first()
+
+
+async def find_student_conflict(db: AsyncSession, student_id: int, club_id: int):
+    """Первое занятие кружков студента, пересекающееся с расписанием club_id.
+
+    Возвращает (занятие club_id, занятие другого кружка, название другого
+    кружка) или None.
+    """
+    target = aliased(Schedule)
+    other = aliased(Schedule)
+    result = await db.execute(
+        select(target, other, Club.title)
+        .select_from(ClubMembership)
+        .join(other, other.club_id == ClubMembership.club_id)
+        .join(target, and_(
+            target.club_id == club_id,
+            *overlapping(other, target.weekday, target.start_minute, target.end_minute)
+        ))
+        .join(Club, Club.id == other.club_id)
+        .where(ClubMembership.student_id == student_id, ClubMembership.club_id != club_id)
+        .order_by(target.weekday, target.start_minute)
+        .limit(1)
+    )
+    return result.first()
+
+
+def student_conflicts_query(student_id: int):
+    """Пары пересекающихся занятий разных кружков студента, каждая пара один раз"""
+    first_membership = aliased(ClubMembership)
+    second_membership = aliased(ClubMembership)
+    first = aliased(Schedule)
+    second = aliased(Schedule)
+    first_club = aliased(Club)
+    second_club = aliased(Club)
+    return (
+        select(first, first_club.title, second, second_club.title)
+        .select_from(first_membership)
+        .join(first, first.club_id == first_membership.club_id)
+        .join(second_membership, and_(
+            second_membership.student_id == first_membership.student_id,
+            second_membership.club_id > first_membership.club_id
+        ))
+        .join(second, and_(
+            second.club_id == second_membership.club_id,
+            *overlapping(second, first.weekday, first.start_minute, first.end_minute)
+        ))
+        .join(first_club, first_club.id == first.club_id)
+        .join(second_club, second_club.id == second.club_id)
+        .where(first_membership.student_id == student_id)
+        .order_by(first.weekday, first.start_minute, second.start_minute)
+    )
+
+
+async def benchmark(database_url: str, schedules: int, locations: int, checks: int, seed: int) -> dict:
+    """Наполняет отдельную базу расписанием и замеряет проверку аудитории"""
+    from app.db.database import normalize_db_url
+
+    rng = random.Random(seed)
+    bench_engine = create_async_engine(normalize_db_url(database_url))
+    async with bench_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    def random_slot():
+        day_of_week = rng.choice(WEEKDAYS[:6])
+        start_time = time_of_day(rng.randint(8, 20), rng.choice([0, 15, 30, 45]))
+        duration = rng.choice([45, 60, 90, 120])
+        return day_of_week, start_time, duration, f"Ауд. {rng.randint(1, locations)}"
+
+    async with AsyncSession(bench_engine) as session:
+        existing = await session.scalar(select(func.count(Schedule.id)))
+        if existing < schedules:
+            owner_id = await session.scalar(
+                insert(User).values(
+                    username=f"schedule-bench-{time.time_ns()}", full_name="Benchmark",
+                    password_hash="-", is_teacher=True
+                ).returning(User.id)
+            )
+            club_id = await session.scalar(
+                insert(Club).values(
+                    title="Кружок расписания", category="Связь", max_students=20, owner_id=owner_id
+                ).returning(Club.id)
+            )
+            rows = []
+            for _ in range(existing, schedules):
+                day_of_week, start_time, duration, location = random_slot()
+                rows.append({
+                    "club_id": club_id, "day_of_week": day_of_week, "start_time": start_time,
+                    "duration_minutes": duration, "location": location,
+                    **schedule_slot(day_of_week, start_time, duration),
+                })
+            for batch_start in range(0, len(rows), 5000):
+                await session.execute(insert(Schedule), rows[batch_start:batch_start + 5000])
+            await session.commit()
+
+        latencies = []
+        found = 0
+        for _ in range(checks):
+            day_of_week, start_time, duration, location = random_slot()
+            slot = schedule_slot(day_of_week, start_time, duration)
+            started_at = time.perf_counter()
+            conflict = await find_location_conflict(
+                session, location, slot["weekday"], slot["start_minute"], slot["end_minute"]
+            )
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            found += conflict is not None
+
+    await bench_engine.dispose()
+    latencies.sort()
+    return {
+        "schedules": max(schedules, existing),
+        "checks": checks,
+        "conflicts": found,
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка проверки пересечений занятий в аудитории")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///schedule_bench.db",
+                        help="отдельная база для замера, не рабочая")
+    parser.add_argument("--schedules", type=int, default=50000)
+    parser.add_argument("--locations", type=int, default=400)
+    parser.add_argument("--checks", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p95-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args.database_url, args.schedules, args.locations, args.checks, args.seed))
+    print(report)
+    raise SystemExit(0 if report["p95_ms"] <= args.max_p95_ms else 1)
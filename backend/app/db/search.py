@@ -0,0 +1,281 @@
+"""
+Полнотекстовый поиск кружков по названию, описанию и категории.
+
+В PostgreSQL используется хранимая колонка clubs.search_vector (tsvector,
+конфигурация russian) с GIN-индексом, в SQLite - внешняя FTS5-таблица
+clubs_fts, которую поддерживают триггеры. Обе структуры создает миграция 0007,
+для баз, созданных через init_db, - create_search_index.
+
+Замер задержки поиска на синтетическом корпусе (отдельная база):
+    python -m app.db.search --clubs 100000 --database-url sqlite+aiosqlite:///search_bench.db
+"""
+import argparse
+import asyncio
+import html
+import random
+import re
+import time
+from itertools import accumulate
+from typing import List
+from sqlalchemy import select, insert, func, literal_column, text, table, column, true
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload
+from app.core.config import settings
+from app.db.models import Base, Club, User
+
+SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE clubs ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(category, '')), 'B') || "
+        "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+        ") STORED",
+        "CREATE INDEX IF NOT EXISTS ix_clubs_search_vector ON clubs USING gin (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS clubs_fts USING fts5("
+        "title, description, category, content='clubs', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS clubs_fts_insert AFTER INSERT ON clubs BEGIN "
+        "INSERT INTO clubs_fts (rowid, title, description, category) "
+        "VALUES (new.id, new.title, new.description, new.category); END",
+        "CREATE TRIGGER IF NOT EXISTS clubs_fts_delete AFTER DELETE ON clubs BEGIN "
+        "INSERT INTO clubs_fts (clubs_fts, rowid, title, description, category) "
+        "VALUES ('delete', old.id, old.title, old.description, old.category); END",
+        "CREATE TRIGGER IF NOT EXISTS clubs_fts_update AFTER UPDATE OF title, description, category ON clubs BEGIN "
+        "INSERT INTO clubs_fts (clubs_fts, rowid, title, description, category) "
+        "VALUES ('delete', old.id, old.title, old.description, old.category); "
+        "INSERT INTO clubs_fts (rowid, title, description, category) "
+        "VALUES (new.id, new.title, new.description, new.category); END",
+        "INSERT INTO clubs_fts (clubs_fts) VALUES ('rebuild')",
+    ],
+}
+
+# Не больше слов в запросе: каждое слово - отдельное условие на индекс
+MAX_QUERY_TERMS = 8
+
+# Маркеры подсветки из области частного использования Unicode: в тексте
+# кружков их нет, поэтому текст можно экранировать и только потом вставить <mark>
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+
+def create_search_index(connection):
+    """Создает поисковый индекс для диалекта соединения (синхронное соединение)"""
+    for statement in SEARCH_DDL.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def query_terms(query: str) -> List[str]:
+    """Слова запроса в нижнем регистре; синтаксис tsquery/FTS5 отбрасывается"""
+    return re.findall(r"\w+", query.lower())[:MAX_QUERY_TERMS]
+
+
+def render_highlight(value):
+    """Экранирует HTML и заменяет маркеры совпадений на <mark>"""
+    if value is None:
+        return None
+    return (
+        html.escape(value)
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_END, "</mark>")
+    )
+
+
+def _postgresql_search(terms: List[str]):
+    # Каждое слово ищется как префикс: "прог" находит "программирование"
+    ts_query = func.to_tsquery("russian", " & ".join(f"{term}:*" for term in terms))
+    search_vector = literal_column("clubs.search_vector")
+    return {
+        "match": search_vector.op("@@")(ts_query),
+        "rank": func.ts_rank(search_vector, ts_query),
+        "title_highlight": func.ts_headline(
+            "russian", Club.title, ts_query,
+            f"StartSel={_MARK_START}, StopSel={_MARK_END}, HighlightAll=true"
+        ),
+        "description_highlight": func.ts_headline(
+            "russian", Club.description, ts_query,
+            f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxFragments=2, MaxWords=20, MinWords=5"
+        ),
+        "row_id": Club.id,
+        "join_on": None,
+    }
+
+
+_clubs_fts = table("clubs_fts", column("rowid"))
+
+
+def _sqlite_search(terms: List[str]):
+    fts = literal_column("clubs_fts")
+    return {
+        "match": fts.op("MATCH")(" ".join(f'"{term}"*' for term in terms)),
+        # bm25 тем меньше, чем лучше совпадение; веса: название, описание, категория
+        "rank": -func.bm25(fts, 10.0, 2.0, 5.0),
+        "title_highlight": func.highlight(fts, 0, _MARK_START, _MARK_END),
+        "description_highlight": func.snippet(fts, 1, _MARK_START, _MARK_END, "…", 20),
+        # Условие на rowid FTS5 проверяет по индексу, а не перебором совпадений
+        "row_id": _clubs_fts.c.rowid,
+        "join_on": _clubs_fts.c.rowid == Club.id,
+    }
+
+
+def search_clubs_query(dialect: str, terms: List[str], conditions: list, max_candidates: int):
+    """SELECT (Club, rank, подсветка названия, подсветка описания, truncated) по убыванию релевантности.
+
+    Стоимость ранжирования растет с числом совпадений, поэтому ранжируются
+    только max_candidates последних добавленных подходящих кружков. Граница -
+    id первого не вошедшего совпадения: FTS5 отдает совпадения по убыванию
+    rowid из индекса и останавливается на нем (0, если совпадений не больше
+    max_candidates), PostgreSQL отбирает id
+    совпадений по GIN-индексу без вычисления релевантности. truncated - были ли
+    отброшены более старые совпадения; клиенту стоит уточнить запрос.
+    """
+    if dialect == "postgresql":
+        search = _postgresql_search(terms)
+    elif dialect == "sqlite":
+        search = _sqlite_search(terms)
+    else:
+        raise NotImplementedError(f"Полнотекстовый поиск не поддерживается для {dialect}")
+
+    def matching(*columns):
+        query = select(*columns)
+        if search["join_on"] is not None:
+            query = query.select_from(Club).join(_clubs_fts, search["join_on"])
+        return query.where(search["match"], *conditions)
+
+    row_id = search["row_id"]
+    # Одна строка с границей: и условие, и признак truncated читают ее,
+    # поэтому совпадения для границы перебираются один раз
+    boundary = select(
+        func.coalesce(
+            matching(row_id)
+            .order_by(row_id.desc())
+            .offset(max_candidates)
+            .limit(1)
+            .scalar_subquery(),
+            0
+        ).label("first_excluded_id")
+    ).cte("boundary")
+    rank = search["rank"]
+    return (
+        matching(
+            Club,
+            rank.label("rank"),
+            search["title_highlight"].label("title_highlight"),
+            search["description_highlight"].label("description_highlight"),
+            (boundary.c.first_excluded_id > 0).label("truncated")
+        )
+        .join(boundary, true())
+        .where(row_id > boundary.c.first_excluded_id)
+        .order_by(rank.desc(), Club.id)
+    )
+
+
+async def search_clubs(db: AsyncSession, query: str, conditions: list, limit: int, offset: int = 0):
+    """Кружки, подходящие под поисковый запрос и условия каталога"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    statement = (
+        search_clubs_query(
+            db.get_bind().dialect.name, terms, conditions, settings.SEARCH_MAX_CANDIDATES
+        )
+        .options(selectinload(Club.schedules))
+        .limit(limit)
+        .offset(offset)
+    )
+    result = await db.execute(statement)
+    return result.all()
+
+
+_SYLLABLES = (
+    "ба ва га да жа за ка ла ма на па ра са та фа ха ча ша бо во го до ко ло мо "
+    "но по ро со то ку лу му ну ру ту ки ли ми ни ри ти ень ост ция ика ор ер ан ин"
+).split()
+_CATEGORIES = ["Спортивные", "Творчество", "Точные науки", "Инжиниринг", "БПЛА",
+               "Информационная безопасность", "Связь", "Программирование"]
+
+
+def synthetic_vocabulary(rng: random.Random, size: int = 8000):
+    """Словарь из псевдослов с частотами по закону Ципфа, как в живых текстах"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    # Сдвиг ранга убирает "стоп-слова", которые встречаются в каждом описании
+    cum_weights = list(accumulate(1 / (rank + 20) for rank in range(size)))
+    return words, cum_weights
+
+
+async def benchmark(database_url: str, clubs: int, queries: int, seed: int) -> dict:
+    """Наполняет отдельную базу синтетическими кружками и замеряет задержку поиска"""
+    from app.db.database import normalize_db_url
+
+    rng = random.Random(seed)
+    words, cum_weights = synthetic_vocabulary(rng)
+
+    def sample(count: int) -> List[str]:
+        return rng.choices(words, cum_weights=cum_weights, k=count)
+
+    bench_engine = create_async_engine(normalize_db_url(database_url))
+    async with bench_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
+
+    async with AsyncSession(bench_engine) as session:
+        existing = await session.scalar(select(func.count(Club.id)))
+        if existing < clubs:
+            owner_id = await session.scalar(
+                insert(User).values(
+                    username=f"search-bench-{time.time_ns()}", full_name="Benchmark",
+                    password_hash="-", is_teacher=True
+                ).returning(User.id)
+            )
+            for batch_start in range(existing, clubs, 5000):
+                await session.execute(insert(Club), [
+                    {
+                        "title": " ".join(sample(3)).capitalize(),
+                        "description": " ".join(sample(rng.randint(15, 40))),
+                        "category": rng.choice(_CATEGORIES),
+                        "max_students": 20,
+                        "recruitment_open": True,
+                        "owner_id": owner_id,
+                    }
+                    for _ in range(batch_start, min(batch_start + 5000, clubs))
+                ])
+            await session.commit()
+
+        latencies = []
+        for _ in range(queries):
+            # Частые слова ищут чаще; слова обрезаны, как при наборе
+            query = " ".join(word[:rng.randint(3, len(word))] for word in sample(rng.randint(1, 2)))
+            started_at = time.perf_counter()
+            await search_clubs(session, query, [], limit=20)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+    await bench_engine.dispose()
+    latencies.sort()
+    return {
+        "clubs": max(clubs, existing),
+        "queries": queries,
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка полнотекстового поиска на синтетическом корпусе")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///search_bench.db",
+                        help="отдельная база для замера, не рабочая")
+    parser.add_argument("--clubs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p95-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args.database_url, args.clubs, args.queries, args.seed))
+    print(report)
+    raise SystemExit(0 if report["p95_ms"] <= args.max_p95_ms else 1)
@@ -0,0 +1,245 @@
+"""
+Генератор синтетических данных: преподаватели, кружки, расписание, студенты,
+записи в кружки и история посещаемости.
+
+Запуск:
+    python -m app.db.seed --teachers 20 --clubs 200 --students 5000
+    python -m app.db.seed --students 50000 --skew 1.5 --weeks 30 --seed 7
+
+При одинаковых параметрах и --seed данные одинаковы (даты отсчитываются от
+текущего дня). --skew задает неравномерность популярности кружков (0 -
+равномерно, 1 и выше - почти все хотят в несколько популярных кружков, как
+при открытии записи). У всех пользователей один пароль (--password), хеш
+считается один раз. Счетчики и сводки заполняются согласованно:
+python -m app.db.reconcile расхождений не находит.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from dataclasses import replace
+from datetime import date, time as time_of_day, timedelta
+from itertools import accumulate
+from typing import List
+from sqlalchemy import select, insert, func
+from app.core.hashing import current_policy, hash_password
+from app.db.database import async_session, engine
+from app.db.schedule import WEEKDAYS, DEFAULT_DURATION_MINUTES, schedule_slot
+from app.db.models import (
+    User, Club, Schedule, ClubMembership, Attendance, ClubSession, AttendanceStats
+)
+
+CATEGORIES = ["Спортивные", "Творчество", "Точные науки", "Инжиниринг", "БПЛА",
+              "Информационная безопасность", "Связь", "Программирование"]
+TOPICS = ["Шахматы", "Робототехника", "Футбол", "Фотография", "Олимпиадная математика",
+          "Беспилотники", "Радиосвязь", "Python", "Вокал", "Театр", "Кибербезопасность",
+          "Астрономия", "3D-моделирование", "Волейбол", "Журналистика", "Электроника"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов",
+              "Михайлов", "Новиков", "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев"]
+FIRST_NAMES = ["Александр", "Мария", "Дмитрий", "Анна", "Максим", "Елена", "Иван",
+               "Софья", "Артем", "Полина", "Никита", "Дарья", "Михаил", "Ксения"]
+
+# Строк в одном многострочном INSERT
+CHUNK_ROWS = 5000
+
+
+async def _insert_chunks(session, model, rows: List[dict]):
+    for start in range(0, len(rows), CHUNK_ROWS):
+        await session.execute(insert(model), rows[start:start + CHUNK_ROWS])
+
+
+async def _insert_users(session, rows: List[dict]) -> List[int]:
+    ids = []
+    for start in range(0, len(rows), CHUNK_ROWS):
+        result = await session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            rows[start:start + CHUNK_ROWS]
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"
+
+
+async def seed(
+    teachers: int,
+    clubs: int,
+    students: int,
+    memberships_per_student: int,
+    weeks: int,
+    skew: float,
+    attendance_rate: float,
+    seed_value: int,
+    prefix: str,
+    password: str,
+    bcrypt_rounds: int
+) -> dict:
+    rng = random.Random(seed_value)
+    password_hash = hash_password(password, replace(current_policy, bcrypt_rounds=bcrypt_rounds))
+    today = date.today()
+
+    async with async_session() as session:
+        taken = await session.scalar(
+            select(func.count(User.id)).where(User.username.like(f"{prefix}-%"))
+        )
+        if taken:
+            raise SystemExit(f"В базе уже есть пользователи с префиксом {prefix}: выберите другой --prefix")
+
+        teacher_ids = await _insert_users(session, [
+            {"username": f"{prefix}-teacher-{index}", "full_name": _person(rng),
+             "password_hash": password_hash, "is_teacher": True}
+            for index in range(teachers)
+        ])
+        student_ids = await _insert_users(session, [
+            {"username": f"{prefix}-student-{index}", "full_name": _person(rng),
+             "password_hash": password_hash, "is_teacher": False}
+            for index in range(students)
+        ])
+
+        club_rows = [
+            {
+                "title": f"{rng.choice(TOPICS)} {index + 1}",
+                "description": f"Занятия для студентов, набор {rng.randint(2020, 2026)}",
+                "category": rng.choice(CATEGORIES),
+                "max_students": rng.choice([10, 15, 20, 25, 30, 50]),
+                "recruitment_open": rng.random() < 0.85,
+                "owner_id": rng.choice(teacher_ids),
+            }
+            for index in range(clubs)
+        ]
+        result = await session.execute(
+            insert(Club).returning(Club.id, sort_by_parameter_order=True), club_rows
+        )
+        club_ids = result.scalars().all()
+
+        # Расписание: 1-3 занятия в неделю в разные дни
+        schedule_rows = []
+        club_weekdays = {}
+        for club_id in club_ids:
+            weekdays = sorted(rng.sample(range(6), k=rng.randint(1, 3)))
+            club_weekdays[club_id] = weekdays
+            for weekday in weekdays:
+                start_time = time_of_day(rng.choice([9, 11, 13, 15, 17, 19]), rng.choice([0, 30]))
+                schedule_rows.append({
+                    "club_id": club_id,
+                    "day_of_week": WEEKDAYS[weekday],
+                    "start_time": start_time,
+                    "location": f"Ауд. {rng.randint(100, 450)}",
+                    "duration_minutes": DEFAULT_DURATION_MINUTES,
+                    **schedule_slot(WEEKDAYS[weekday], start_time, DEFAULT_DURATION_MINUTES),
+                })
+        await _insert_chunks(session, Schedule, schedule_rows)
+
+        # Популярность кружков по закону Ципфа с показателем skew
+        popularity = list(accumulate(1 / (rank + 1) ** skew for rank in range(len(club_ids))))
+        by_popularity = club_ids[:]
+        rng.shuffle(by_popularity)
+        capacity = {club_id: row["max_students"] for club_id, row in zip(club_ids, club_rows)}
+        members = defaultdict(list)
+        for student_id in student_ids:
+            wanted = set(rng.choices(by_popularity, cum_weights=popularity, k=memberships_per_student))
+            for club_id in wanted:
+                if len(members[club_id]) < capacity[club_id]:
+                    members[club_id].append(student_id)
+
+        membership_rows = []
+        for club_id, club_members in members.items():
+            for student_id in club_members:
+                membership_rows.append({
+                    "club_id": club_id,
+                    "student_id": student_id,
+                    "joined_at": today - timedelta(weeks=weeks),
+                })
+        await _insert_chunks(session, ClubMembership, membership_rows)
+
+        # История: занятие в каждый день расписания за последние weeks недель
+        start = today - timedelta(weeks=weeks)
+        session_rows = []
+        attendance_rows = []
+        visits = defaultdict(int)
+        sessions_count = {}
+        student_rate = {}
+        for club_id in club_ids:
+            dates = [
+                start + timedelta(days=offset)
+                for offset in range(weeks * 7)
+                if (start + timedelta(days=offset)).weekday() in club_weekdays[club_id]
+            ]
+            sessions_count[club_id] = len(dates)
+            session_rows.extend({"club_id": club_id, "date": session_date} for session_date in dates)
+            for student_id in members[club_id]:
+                rate = student_rate.setdefault(
+                    student_id, min(1.0, max(0.0, rng.gauss(attendance_rate, 0.15)))
+                )
+                for session_date in dates:
+                    if rng.random() < rate:
+                        attendance_rows.append({
+                            "club_id": club_id,
+                            "student_id": student_id,
+                            "date": session_date,
+                            "marked_at": session_date,
+                        })
+                        visits[(club_id, student_id)] += 1
+        await _insert_chunks(session, ClubSession, session_rows)
+        await _insert_chunks(session, Attendance, attendance_rows)
+        await _insert_chunks(session, AttendanceStats, [
+            {"club_id": club_id, "student_id": student_id, "visits": count}
+            for (club_id, student_id), count in visits.items()
+        ])
+
+        # Счетчики кружков пишем одним UPDATE на кружок
+        for club_id in club_ids:
+            await session.execute(
+                Club.__table__.update()
+                .where(Club.__table__.c.id == club_id)
+                .values(current_students=len(members[club_id]), sessions_count=sessions_count[club_id])
+            )
+
+        await session.commit()
+
+    await engine.dispose()
+    return {
+        "teachers": len(teacher_ids),
+        "clubs": len(club_ids),
+        "schedules": len(schedule_rows),
+        "students": len(student_ids),
+        "memberships": len(membership_rows),
+        "sessions": len(session_rows),
+        "attendances": len(attendance_rows),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Наполнение базы синтетическими данными")
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--clubs", type=int, default=200)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--memberships-per-student", type=int, default=2)
+    parser.add_argument("--weeks", type=int, default=12, help="недель истории посещаемости")
+    parser.add_argument("--skew", type=float, default=1.0, help="неравномерность популярности кружков")
+    parser.add_argument("--attendance-rate", type=float, default=0.75, help="средняя доля посещенных занятий")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--prefix", default="seed", help="префикс логинов созданных пользователей")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--bcrypt-rounds", type=int, default=current_policy.bcrypt_rounds)
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    summary = asyncio.run(seed(
+        teachers=args.teachers,
+        clubs=args.clubs,
+        students=args.students,
+        memberships_per_student=args.memberships_per_student,
+        weeks=args.weeks,
+        skew=args.skew,
+        attendance_rate=args.attendance_rate,
+        seed_value=args.seed,
+        prefix=args.prefix,
+        password=args.password,
+        bcrypt_rounds=args.bcrypt_rounds
+    ))
+    print(", ".join(f"{name}: {count}" for name, count in summary.items()))
+    print(f"Готово за {time.perf_counter() - started_at:.1f} с")
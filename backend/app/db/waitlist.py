@@ -0,0 +1,85 @@
+"""
+Очередь ожидания кружка с номерами мест.
+
+У записи очереди есть номер seq; номера кружка идут подряд от головы, поэтому
+позиция студента - seq - min(seq) + 1: два поиска по индексу (club_id, seq)
+вместо подсчета всех записей перед студентом.
+
+- новая запись получает номер max(seq) + 1;
+- удаление головы (перевод в кружок) никого не сдвигает: меняется только min(seq);
+- удаление из середины (выход из очереди, прямая запись, импорт) сдвигает
+  записи за удаленной на единицу.
+
+Номера меняются под блокировкой строки кружка, поэтому параллельные постановки
+и удаления не выдают одинаковых номеров и не оставляют разрывов. Функции
+выполняются в транзакции вызывающего кода, коммит остается за ним.
+"""
+from typing import Optional
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.db.models import Club, WaitlistEntry
+
+
+async def lock_waitlist(db: AsyncSession, club_id: int):
+    """Блокирует строку кружка до конца транзакции (в SQLite запись и так одна)"""
+    await db.execute(select(Club.id).where(Club.id == club_id).with_for_update())
+
+
+async def add_to_waitlist(db: AsyncSession, club_id: int, student_id: int, created_at) -> int:
+    """Ставит студента в конец очереди и возвращает id записи.
+
+    Повторная постановка отсекается уникальным ограничением (IntegrityError).
+    """
+    await lock_waitlist(db, club_id)
+    tail_seq = await db.scalar(
+        select(func.max(WaitlistEntry.seq)).where(WaitlistEntry.club_id == club_id)
+    )
+    return await db.scalar(
+        insert(WaitlistEntry)
+        .values(club_id=club_id, student_id=student_id, seq=(tail_seq or 0) + 1, created_at=created_at)
+        .returning(WaitlistEntry.id)
+    )
+
+
+async def remove_from_waitlist(db: AsyncSession, club_id: int, *conditions) -> int:
+    """Удаляет записи очереди кружка по условиям и сдвигает стоявших за ними.
+
+    Возвращает число удаленных записей.
+    """
+    await lock_waitlist(db, club_id)
+    removed = (await db.execute(
+        delete(WaitlistEntry)
+        .where(WaitlistEntry.club_id == club_id, *conditions)
+        .returning(WaitlistEntry.seq)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    if not removed:
+        return 0
+
+    head_seq = await db.scalar(
+        select(func.min(WaitlistEntry.seq)).where(WaitlistEntry.club_id == club_id)
+    )
+    # С конца, чтобы номера еще не обработанных удалений не сдвинулись
+    for seq in sorted(removed, reverse=True):
+        if head_seq is None or seq < head_seq:
+            break
+        await db.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.club_id == club_id, WaitlistEntry.seq > seq)
+            .values(seq=WaitlistEntry.seq - 1)
+            .execution_options(synchronize_session=False)
+        )
+    return len(removed)
+
+
+async def waitlist_position(db: AsyncSession, club_id: int, student_id: int) -> Optional[int]:
+    """Позиция студента в очереди (1 - следующий на место) или None, если он не в очереди"""
+    head = aliased(WaitlistEntry)
+    head_seq = select(func.min(head.seq)).where(head.club_id == club_id).scalar_subquery()
+    return await db.scalar(
+        select(WaitlistEntry.seq - head_seq + 1).where(
+            WaitlistEntry.club_id == club_id,
+            WaitlistEntry.student_id == student_id
+        )
+    )
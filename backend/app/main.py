@@ -1,7 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.metrics import MetricsMiddleware, include_router
+from app.core.profiling import QueryProfilerMiddleware
+from app.db.database import ReadYourWritesMiddleware
+
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
 from app.api.auth import router as auth_router
 from app.api.clubs import router as clubs_router
 from app.api.profile import router as profile_router
@@ -16,10 +21,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Queries", "X-Next-Cursor", "X-Search-Truncated",
+                    "X-Read-Primary-Until"],
 )
 
-app.include_router(health_router, prefix="/health", tags=["Health"])
-app.include_router(auth_router, prefix="/auth", tags=["Auth"])
-app.include_router(clubs_router, prefix="/clubs", tags=["Clubs"])
-app.include_router(profile_router, prefix="/profile", tags=["Profile"])
-app.include_router(management_router, prefix="/management", tags=["Management"])
+# Число SQL-запросов и время в базе для каждого запроса
+app.add_middleware(QueryProfilerMiddleware)
+
+# Число запросов и задержки по шаблонам маршрутов для /metrics
+app.add_middleware(MetricsMiddleware)
+
+# После записи клиент получает отметку, и его чтения идут на основную базу
+app.add_middleware(ReadYourWritesMiddleware)
+
+include_router(app, health_router, prefix="/health", tags=["Health"])
+include_router(app, metrics_router, prefix="/metrics", tags=["Health"])
+include_router(app, auth_router, prefix="/auth", tags=["Auth"])
+include_router(app, clubs_router, prefix="/clubs", tags=["Clubs"])
+include_router(app, profile_router, prefix="/profile", tags=["Profile"])
+include_router(app, management_router, prefix="/management", tags=["Management"])
@@ -7,6 +7,7 @@ class ScheduleBase(BaseModel):
     day_of_week: str
     start_time: str  # "HH:MM"
     location: str
+    duration_minutes: int = 90
 
 
 class ScheduleCreate(ScheduleBase):
@@ -43,14 +44,21 @@ class ClubResponse(ClubBase):
     id: int
     recruitment_open: bool
     owner_id: int
+    current_students: int = 0
     schedules: List[ScheduleResponse] = []
 
     class Config:
         from_attributes = True
 
 
+class ClubSearchResult(ClubResponse):
+    rank: float
+    # HTML-экранированный текст, совпадения выделены тегом <mark>
+    title_highlight: str
+    description_highlight: Optional[str] = None
+
+
 class ClubDetailResponse(ClubResponse):
-    current_students: int
     owner_name: str
     is_member: bool = False
 
@@ -65,3 +73,7 @@ class ClubMembershipResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class WaitlistPositionResponse(BaseModel):
+    club_id: int
+    position: int
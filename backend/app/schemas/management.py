@@ -16,6 +16,23 @@ class MarkAttendanceRequest(BaseModel):
     date: date
 
 
+class BulkAttendanceRequest(BaseModel):
+    date: date
+    student_ids: List[int]
+    absent_ids: List[int] = []
+
+
+class BulkAttendanceResult(BaseModel):
+    student_id: int
+    status: str  # marked, already_marked, absent, unmarked, not_member
+
+
+class BulkAttendanceResponse(BaseModel):
+    date: date
+    marked: int
+    results: List[BulkAttendanceResult]
+
+
 class ClubSettingsUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -27,6 +44,7 @@ class ScheduleItemCreate(BaseModel):
     day_of_week: str
     start_time: str  # "HH:MM"
     location: str
+    duration_minutes: int = 90
 
 
 class ScheduleItemDelete(BaseModel):
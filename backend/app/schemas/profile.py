@@ -25,6 +25,21 @@ class ScheduleItem(BaseModel):
     day_of_week: str
     start_time: str
     location: str
+    duration_minutes: int
+
+
+class ScheduleConflict(BaseModel):
+    day_of_week: str
+    club_id: int
+    club_title: str
+    start_time: str
+    end_time: str
+    location: str
+    other_club_id: int
+    other_club_title: str
+    other_start_time: str
+    other_end_time: str
+    other_location: str
 
 
 class StudentProfileResponse(BaseModel):
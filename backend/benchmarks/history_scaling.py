@@ -0,0 +1,131 @@
+"""
+Проверка: профиль студента (GET /profile/student) и таблица посещаемости
+кружка (GET /management/{club_id}/students) не замедляются с ростом истории.
+
+Для каждого значения --weeks база наполняется app.db.seed под своим
+префиксом (одинаковое число кружков и студентов, разная длина истории
+посещаемости; если префикс уже есть, данные переиспользуются). Затем оба
+эндпоинта вызываются через ASGI, и p95 задержки на самой длинной истории
+сравнивается с самой короткой. Код выхода 1, если рост больше --max-growth
+или если число SQL-запросов зависит от длины истории.
+
+Запуск из каталога backend на отдельной базе:
+    DATABASE_URL=sqlite+aiosqlite:///history.db python -m benchmarks.history_scaling
+    python -m benchmarks.history_scaling --weeks 4 32 128 --requests 300
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict, List
+import httpx
+from sqlalchemy import select, func
+from app.core.cache import principal_cache
+from app.core.profiling import count_queries
+from app.db.database import async_session, engine
+from app.db.models import Attendance, User
+from app.db.seed import seed
+from app.main import app
+from benchmarks.loadtest import load_fixtures, percentile
+from benchmarks.roster_queries import prepare_database
+
+ENDPOINTS = ["GET /profile/student", "GET /management/{club_id}/students"]
+
+
+async def seed_history(args, weeks: int) -> str:
+    prefix = f"{args.prefix}-w{weeks}"
+    async with async_session() as session:
+        seeded = await session.scalar(select(func.count(User.id)).where(User.username.like(f"{prefix}-%")))
+    if not seeded:
+        print(f"Наполнение базы: {weeks} недель истории...")
+        await seed(
+            teachers=args.teachers, clubs=args.clubs, students=args.students,
+            memberships_per_student=2, weeks=weeks, skew=0.5, attendance_rate=0.75,
+            seed_value=1, prefix=prefix, password="password123", bcrypt_rounds=4
+        )
+    return prefix
+
+
+async def time_endpoints(client: httpx.AsyncClient, prefix: str, requests: int) -> Dict[str, dict]:
+    fixtures = await load_fixtures(prefix, requests)
+    calls = {
+        ENDPOINTS[0]: [
+            ("/profile/student", student["token"]) for student in fixtures.students
+        ],
+        ENDPOINTS[1]: [
+            (f"/management/{club_id}/students", teacher["token"])
+            for teacher in fixtures.teachers for club_id in teacher["clubs"]
+        ],
+    }
+    results = {}
+    for name, targets in calls.items():
+        latencies = []
+        queries = set()
+        for index in range(requests):
+            path, token = targets[index % len(targets)]
+            # Пользователь разрешается заново, как в первом запросе с токеном
+            principal_cache.invalidate()
+            started_at = time.perf_counter()
+            with count_queries() as stats:
+                response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            if response.status_code != 200:
+                raise SystemExit(f"{name}: ответ {response.status_code} на {path}")
+            queries.add(stats.count)
+        latencies.sort()
+        results[name] = {
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "queries": sorted(queries),
+        }
+    return results
+
+
+async def measure(args) -> List[dict]:
+    await prepare_database()
+    prefixes = [(weeks, await seed_history(args, weeks)) for weeks in sorted(args.weeks)]
+    async with async_session() as session:
+        print(f"Отметок посещаемости в базе: {await session.scalar(select(func.count(Attendance.id)))}")
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for weeks, prefix in prefixes:
+            # Прогрев: соединения пула и кэш планов
+            await time_endpoints(client, prefix, 10)
+            results.append({"weeks": weeks, "endpoints": await time_endpoints(client, prefix, args.requests)})
+    await engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка профиля и таблицы посещаемости по длине истории")
+    parser.add_argument("--weeks", type=int, nargs="+", default=[4, 16, 64], help="недель истории в наборах")
+    parser.add_argument("--prefix", default="history", help="префикс пользователей app.db.seed")
+    parser.add_argument("--teachers", type=int, default=10)
+    parser.add_argument("--clubs", type=int, default=50)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200, help="запросов к каждому эндпоинту")
+    parser.add_argument("--max-growth", type=float, default=2.0,
+                        help="во сколько раз p95 может вырасти от самой короткой истории к самой длинной")
+    args = parser.parse_args()
+
+    results = asyncio.run(measure(args))
+    for result in results:
+        for name, summary in result["endpoints"].items():
+            print(f"недель: {result['weeks']:>4}  {name:<36} p50 {summary['p50_ms']:>7} мс  "
+                  f"p95 {summary['p95_ms']:>7} мс  SQL-запросов: {summary['queries']}")
+
+    failed = False
+    shortest, longest = results[0], results[-1]
+    for name in ENDPOINTS:
+        growth = longest["endpoints"][name]["p95_ms"] / max(shortest["endpoints"][name]["p95_ms"], 0.01)
+        if growth > args.max_growth:
+            print(f"{name}: p95 вырос в {growth:.1f} раза при росте истории "
+                  f"с {shortest['weeks']} до {longest['weeks']} недель")
+            failed = True
+        if len({tuple(result["endpoints"][name]["queries"]) for result in results}) > 1:
+            print(f"{name}: число SQL-запросов зависит от длины истории")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("Задержка и число SQL-запросов не зависят от длины истории")
@@ -0,0 +1,101 @@
+"""
+Проверка записи на последнее место: --students студентов одновременно
+вызывают POST /clubs/{club_id}/join у кружка, где свободно одно место.
+
+После каждого из --rounds раундов (новый кружок):
+- ровно один ответ 200, остальные - 400 "мест нет", без 5xx;
+- участников в club_memberships не больше max_students;
+- clubs.current_students равен числу участников.
+
+Запросы выполняются через ASGI, одновременность ограничена пулом соединений.
+Код выхода 1 при нарушении. Данные добавляются в базу из DATABASE_URL,
+поэтому запуск - на отдельной базе, из каталога backend:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.join_storm
+    python -m benchmarks.join_storm --students 200 --rounds 10
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from datetime import time as time_of_day
+from typing import List
+import httpx
+from sqlalchemy import select, insert, update, func
+from app.db.database import async_session, engine
+from app.db.models import Club, ClubMembership
+from app.main import app
+from benchmarks.loadtest import issue_token
+from benchmarks.roster_queries import prepare_database, create_teacher
+from benchmarks.waitlist_conflicts import create_students, create_scheduled_club
+
+
+async def prepare_round(prefix: str, seats: int, students: int):
+    """Кружок на seats мест, из которых занято seats - 1, и студенты для шторма"""
+    async with async_session() as session:
+        teacher = await create_teacher(session, prefix)
+        club_id = await create_scheduled_club(session, teacher["id"], f"{prefix} шторм", seats, time_of_day(10, 0))
+        members = await create_students(session, f"{prefix}-member", seats - 1)
+        if members:
+            await session.execute(insert(ClubMembership), [
+                {"club_id": club_id, "student_id": member["id"]} for member in members
+            ])
+        await session.execute(update(Club).where(Club.id == club_id).values(current_students=len(members)))
+        storm = await create_students(session, f"{prefix}-storm", students)
+        await session.commit()
+    return club_id, storm
+
+
+async def run_round(client: httpx.AsyncClient, prefix: str, args) -> List[str]:
+    club_id, storm = await prepare_round(prefix, args.seats, args.students)
+    responses = await asyncio.gather(*(
+        client.post(f"/clubs/{club_id}/join", headers={"Authorization": f"Bearer {issue_token(student)}"})
+        for student in storm
+    ))
+    statuses = Counter(response.status_code for response in responses)
+
+    async with async_session() as session:
+        max_students, current_students = (await session.execute(
+            select(Club.max_students, Club.current_students).where(Club.id == club_id)
+        )).one()
+        members = await session.scalar(
+            select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club_id)
+        )
+    print(f"кружок {club_id}: ответы {dict(sorted(statuses.items()))}, участников {members}, "
+          f"current_students {current_students}, max_students {max_students}")
+
+    failures = []
+    if statuses[200] != 1 or statuses[400] != len(storm) - 1:
+        failures.append(f"кружок {club_id}: ожидался один ответ 200 и {len(storm) - 1} ответов 400, "
+                        f"получено {dict(statuses)}")
+    if members > max_students:
+        failures.append(f"кружок {club_id}: участников {members} при max_students {max_students}")
+    if current_students != members:
+        failures.append(f"кружок {club_id}: current_students {current_students}, участников {members}")
+    return failures
+
+
+async def check(args) -> List[str]:
+    await prepare_database()
+    prefix = f"storm-{time.time_ns()}"
+    failures = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for index in range(args.rounds):
+            failures += await run_round(client, f"{prefix}-{index}", args)
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Одновременная запись на последнее место в кружке")
+    parser.add_argument("--students", type=int, default=100, help="одновременных запросов на запись")
+    parser.add_argument("--seats", type=int, default=20, help="мест в кружке, свободно одно")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = asyncio.run(check(args))
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("Одновременная запись не превышает лимит мест и не расходится со счетчиком")
@@ -0,0 +1,434 @@
+"""
+Нагрузочный тест API на данных из app.db.seed.
+
+Сценарии:
+- browse: каталог с фильтрами и постраничной выдачей, поиск, карточка кружка
+  (с повторной проверкой ETag), профиль студента
+- enrollment: шторм записи - студентов больше, чем свободных мест, все
+  записываются в один кружок одновременно; проверяется, что мест не выдано
+  больше, чем есть, после раунда записавшиеся выходят из кружка
+- rollcall: преподаватели отмечают занятия целиком и открывают таблицу посещаемости
+
+Тест меняет данные (записи, отметки), поэтому его запускают на отдельной
+наполненной базе. Запуск из каталога backend:
+    python -m app.db.seed --students 5000 --bcrypt-rounds 4
+    python -m benchmarks.loadtest run --scenario browse --duration 20 --out results/browse.json
+    python -m benchmarks.loadtest run --target http --base-url http://localhost:8000
+    python -m benchmarks.loadtest compare results/before.json results/after.json
+
+По умолчанию приложение вызывается в процессе через ASGI (httpx.ASGITransport),
+с --target http - по сети. Токены выпускаются напрямую через
+create_access_token, проверки шторма читают базу из DATABASE_URL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httpx
+from sqlalchemy import select, func
+from app.api.auth import create_access_token
+from app.db.database import async_session, engine
+from app.db.models import User, Club, ClubMembership
+
+SCENARIOS = ["browse", "enrollment", "rollcall"]
+
+SEARCH_TERMS = ["шах", "робот", "фото", "python", "театр", "вокал", "астр", "беспил"]
+WEEKDAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        errors = sum(count for code, count in self.statuses.items() if code >= 500 or code == 0)
+        return {
+            "count": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 1),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "queries_mean": round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+            "queries_max": max(self.queries) if self.queries else None,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Процентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return round(sorted_values[int(rank) - 1], 2)
+
+
+class Recorder:
+    """Выполняет запросы и собирает задержки, статусы и число SQL-запросов по эндпоинтам"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.endpoints: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+
+    async def request(self, name: str, method: str, url: str, token: Optional[str] = None,
+                      **kwargs) -> Optional[httpx.Response]:
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        stats = self.endpoints[name]
+        started_at = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            stats.latencies.append((time.perf_counter() - started_at) * 1000)
+            stats.statuses[0] += 1
+            return None
+        stats.latencies.append((time.perf_counter() - started_at) * 1000)
+        stats.statuses[response.status_code] += 1
+        if "x-db-queries" in response.headers:
+            stats.queries.append(int(response.headers["x-db-queries"]))
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        return {name: stats.summary(elapsed) for name, stats in sorted(self.endpoints.items())}
+
+
+@dataclass
+class Fixtures:
+    students: List[dict]
+    teachers: List[dict]
+    clubs: List[int]
+
+
+def issue_token(user: dict) -> str:
+    return create_access_token(
+        data={"sub": user["username"], "user_id": user["id"], "is_teacher": user["is_teacher"]},
+        expires_delta=timedelta(hours=2)
+    )
+
+
+async def load_fixtures(prefix: str, max_students: int) -> Fixtures:
+    """Пользователи и кружки, созданные app.db.seed с этим префиксом"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(User.id, User.username, User.is_teacher)
+            .where(User.username.like(f"{prefix}-%"))
+            .order_by(User.id)
+        )
+        users = [
+            {"id": user_id, "username": username, "is_teacher": is_teacher}
+            for user_id, username, is_teacher in result.all()
+        ]
+        teachers = [user for user in users if user["is_teacher"]]
+        students = [user for user in users if not user["is_teacher"]][:max_students]
+
+        result = await session.execute(
+            select(Club.id, Club.owner_id).where(Club.owner_id.in_([user["id"] for user in teachers]))
+        )
+        owned = defaultdict(list)
+        clubs = []
+        for club_id, owner_id in result.all():
+            owned[owner_id].append(club_id)
+            clubs.append(club_id)
+
+    if not students or not clubs:
+        raise SystemExit(f"Нет данных с префиксом {prefix}: сначала выполните python -m app.db.seed")
+    for user in students + teachers:
+        user["token"] = issue_token(user)
+    for teacher in teachers:
+        teacher["clubs"] = owned[teacher["id"]]
+    return Fixtures(students, [teacher for teacher in teachers if teacher["clubs"]], clubs)
+
+
+async def browse_action(recorder: Recorder, fixtures: Fixtures, rng: random.Random, etags: dict):
+    """Одно действие посетителя каталога"""
+    roll = rng.random()
+    if roll < 0.25:
+        params = {}
+        if rng.random() < 0.5:
+            params["has_free_seats"] = "true"
+        if rng.random() < 0.3:
+            params["day_of_week"] = rng.choice(WEEKDAYS)
+        await recorder.request("GET /clubs/", "GET", "/clubs/", params=params)
+    elif roll < 0.45:
+        params = {"limit": 20}
+        for _ in range(rng.randint(1, 3)):
+            response = await recorder.request("GET /clubs/?limit", "GET", "/clubs/", params=params)
+            if response is None or "x-next-cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["x-next-cursor"]
+    elif roll < 0.6:
+        await recorder.request(
+            "GET /clubs/search", "GET", "/clubs/search", params={"q": rng.choice(SEARCH_TERMS)}
+        )
+    elif roll < 0.9:
+        student = rng.choice(fixtures.students)
+        club_id = rng.choice(fixtures.clubs)
+        key = (student["id"], club_id)
+        headers = {"If-None-Match": etags[key]} if key in etags else {}
+        response = await recorder.request(
+            "GET /clubs/{club_id}", "GET", f"/clubs/{club_id}", token=student["token"], headers=headers
+        )
+        if response is not None and "etag" in response.headers:
+            etags[key] = response.headers["etag"]
+    else:
+        student = rng.choice(fixtures.students)
+        await recorder.request("GET /profile/student", "GET", "/profile/student", token=student["token"])
+
+
+async def run_browse(recorder: Recorder, fixtures: Fixtures, concurrency: int, duration: float,
+                     seed: int) -> dict:
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int):
+        rng = random.Random(seed * 1000 + index)
+        etags = {}
+        while time.perf_counter() < deadline:
+            await browse_action(recorder, fixtures, rng, etags)
+
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    return {}
+
+
+async def _club_counts(club_id: int):
+    async with async_session() as session:
+        club = (await session.execute(
+            select(Club.max_students, Club.current_students, Club.recruitment_open).where(Club.id == club_id)
+        )).one()
+        members = await session.scalar(
+            select(func.count(ClubMembership.id)).where(ClubMembership.club_id == club_id)
+        )
+    return club, members
+
+
+async def run_enrollment(recorder: Recorder, fixtures: Fixtures, concurrency: int, duration: float,
+                         seed: int) -> dict:
+    """Раунды шторма записи, пока не истечет duration"""
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + duration
+    semaphore = asyncio.Semaphore(concurrency)
+    checks = {"rounds": 0, "overshoot": 0, "counter_drift": 0, "seats_offered": 0, "joined": 0}
+
+    async def join(student: dict, club_id: int) -> Optional[dict]:
+        async with semaphore:
+            response = await recorder.request(
+                "POST /clubs/{club_id}/join", "POST", f"/clubs/{club_id}/join", token=student["token"]
+            )
+        return student if response is not None and response.status_code == 200 else None
+
+    async def leave(student: dict, club_id: int):
+        async with semaphore:
+            await recorder.request(
+                "DELETE /clubs/{club_id}/leave", "DELETE", f"/clubs/{club_id}/leave", token=student["token"]
+            )
+
+    while time.perf_counter() < deadline:
+        club_id = rng.choice(fixtures.clubs)
+        club, _ = await _club_counts(club_id)
+        free_seats = club.max_students - club.current_students
+        if not club.recruitment_open or free_seats <= 0:
+            continue
+
+        async with async_session() as session:
+            members = set((await session.execute(
+                select(ClubMembership.student_id).where(ClubMembership.club_id == club_id)
+            )).scalars().all())
+        candidates = [student for student in fixtures.students if student["id"] not in members]
+        rng.shuffle(candidates)
+        # Желающих в несколько раз больше, чем мест
+        storm = candidates[:free_seats * 5 + concurrency]
+
+        joined = [student for student in await asyncio.gather(*(join(s, club_id) for s in storm)) if student]
+        club, members_count = await _club_counts(club_id)
+        checks["rounds"] += 1
+        checks["seats_offered"] += free_seats
+        checks["joined"] += len(joined)
+        checks["overshoot"] += max(0, members_count - club.max_students)
+        checks["counter_drift"] += abs(members_count - club.current_students)
+
+        await asyncio.gather(*(leave(student, club_id) for student in joined))
+    return checks
+
+
+async def run_rollcall(recorder: Recorder, fixtures: Fixtures, concurrency: int, duration: float,
+                       seed: int) -> dict:
+    """Преподаватели отмечают занятия на будущие даты (каждый раз новая дата) и смотрят таблицу"""
+    deadline = time.perf_counter() + duration
+    next_day = iter(range(1, 10 ** 6))
+
+    async def teacher_loop(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            teacher = rng.choice(fixtures.teachers)
+            club_id = rng.choice(teacher["clubs"])
+            response = await recorder.request(
+                "GET /management/{club_id}/students", "GET", f"/management/{club_id}/students",
+                token=teacher["token"]
+            )
+            if response is None or response.status_code != 200:
+                continue
+            student_ids = [student["student_id"] for student in response.json()]
+            present = [student_id for student_id in student_ids if rng.random() < 0.8]
+            await recorder.request(
+                "POST /management/{club_id}/attendance/bulk", "POST",
+                f"/management/{club_id}/attendance/bulk", token=teacher["token"],
+                json={
+                    "date": (date.today() + timedelta(days=next(next_day))).isoformat(),
+                    "student_ids": present,
+                    "absent_ids": [student_id for student_id in student_ids if student_id not in present],
+                }
+            )
+
+    await asyncio.gather(*(teacher_loop(index) for index in range(concurrency)))
+    return {}
+
+
+RUNNERS = {"browse": run_browse, "enrollment": run_enrollment, "rollcall": run_rollcall}
+
+
+def make_client(target: str, base_url: str) -> httpx.AsyncClient:
+    if target == "asgi":
+        from app.main import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest")
+    return httpx.AsyncClient(base_url=base_url, timeout=30.0)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    fixtures = await load_fixtures(args.prefix, args.students)
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": args.target,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "scenarios": {},
+    }
+
+    async with make_client(args.target, args.base_url) as client:
+        for scenario in scenarios:
+            recorder = Recorder(client)
+            started_at = time.perf_counter()
+            checks = await RUNNERS[scenario](recorder, fixtures, args.concurrency, args.duration, args.seed)
+            elapsed = time.perf_counter() - started_at
+            endpoints = recorder.summary(elapsed)
+            results["scenarios"][scenario] = {
+                "elapsed_s": round(elapsed, 2),
+                "requests": sum(endpoint["count"] for endpoint in endpoints.values()),
+                "throughput_rps": round(sum(endpoint["count"] for endpoint in endpoints.values()) / elapsed, 1),
+                "endpoints": endpoints,
+                "checks": checks,
+            }
+            print_scenario(scenario, results["scenarios"][scenario])
+
+    await engine.dispose()
+    return results
+
+
+def print_scenario(name: str, result: dict):
+    print(f"\n{name}: {result['requests']} запросов за {result['elapsed_s']} с, {result['throughput_rps']} rps")
+    print(f"{'эндпоинт':45} {'n':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>6} {'ошибки':>7}")
+    for endpoint, stats in result["endpoints"].items():
+        queries = stats["queries_mean"] if stats["queries_mean"] is not None else "-"
+        print(
+            f"{endpoint:45} {stats['count']:>7} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+            f"{stats['p99_ms']:>8} {queries:>6} {stats['errors']:>7}"
+        )
+    if result["checks"]:
+        print("проверки:", ", ".join(f"{key}={value}" for key, value in result["checks"].items()))
+
+
+def compare(old: dict, new: dict, max_regression: float) -> int:
+    """Печатает изменения метрик; возвращает число эндпоинтов с регрессией p95 или максимума SQL"""
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    regressions = 0
+    for scenario, new_result in new["scenarios"].items():
+        old_result = old["scenarios"].get(scenario)
+        if old_result is None:
+            continue
+        print(f"\n{scenario}: {old_result['throughput_rps']} -> {new_result['throughput_rps']} rps")
+        for endpoint, stats in new_result["endpoints"].items():
+            before = old_result["endpoints"].get(endpoint)
+            if before is None:
+                continue
+            changes = []
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "queries_mean"):
+                if before[metric] is None or stats[metric] is None:
+                    continue
+                delta = (stats[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                changes.append(f"{metric} {before[metric]} -> {stats[metric]} ({delta:+.0f}%)")
+            regressed = (
+                before["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + max_regression)
+            ) or (
+                # Среднее число SQL зависит от доли отказов, максимум - нет
+                before["queries_max"] is not None and stats["queries_max"] is not None
+                and stats["queries_max"] > before["queries_max"]
+            )
+            regressions += bool(regressed)
+            print(f"  {'!' if regressed else ' '} {endpoint}: " + ", ".join(changes))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="запустить сценарии")
+    run_parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    run_parser.add_argument("--target", choices=["asgi", "http"], default="asgi")
+    run_parser.add_argument("--base-url", default="http://localhost:8000")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--duration", type=float, default=20.0, help="секунд на сценарий")
+    run_parser.add_argument("--students", type=int, default=2000, help="сколько студентов использовать")
+    run_parser.add_argument("--prefix", default="seed", help="префикс пользователей app.db.seed")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--out", help="сохранить результаты в JSON")
+
+    compare_parser = commands.add_parser("compare", help="сравнить два файла результатов")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--max-regression", type=float, default=0.2,
+                                help="допустимый рост p95 (доля)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.old) as old_file, open(args.new) as new_file:
+            regressions = compare(json.load(old_file), json.load(new_file), args.max_regression)
+        sys.exit(1 if regressions else 0)
+
+    results = asyncio.run(run(args))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as out_file:
+            json.dump(results, out_file, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.out}")
+    overshoot = results["scenarios"].get("enrollment", {}).get("checks", {}).get("overshoot", 0)
+    if overshoot:
+        print(f"Выдано мест сверх лимита: {overshoot}")
+    sys.exit(1 if overshoot else 0)
@@ -0,0 +1,112 @@
+"""
+Пропускная способность аутентифицированных эндпоинтов с кэшем пользователей
+(app.core.cache.principal_cache) и без него.
+
+Несколько студентов с токенами параллельно вызывают GET /auth/me и
+GET /profile/student через ASGI. Без кэша каждый запрос заново читает
+пользователя из таблицы users (maxsize кэша = 0). Выводятся запросы в секунду,
+p95 и число SQL-запросов на вызов. Код выхода 1, если с кэшем запросов к
+базе не меньше или пропускная способность ниже, чем без него.
+
+Данные добавляются в базу из DATABASE_URL, поэтому запуск - на отдельной
+базе, из каталога backend:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.principal_cache
+    python -m benchmarks.principal_cache --requests 5000 --concurrency 32
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict, List
+import httpx
+from app.core.cache import principal_cache
+from app.core.profiling import count_queries
+from app.db.database import async_session, engine
+from app.main import app
+from benchmarks.loadtest import issue_token, percentile
+from benchmarks.roster_queries import prepare_database
+from benchmarks.waitlist_conflicts import create_students
+
+ENDPOINTS = ["/auth/me", "/profile/student"]
+
+
+async def prepare_tokens(students: int) -> List[str]:
+    prefix = f"principal-{time.time_ns()}"
+    async with async_session() as session:
+        users = await create_students(session, prefix, students)
+        await session.commit()
+    return [issue_token(user) for user in users]
+
+
+async def run(client: httpx.AsyncClient, path: str, tokens: List[str], requests: int,
+              concurrency: int) -> Dict[str, float]:
+    latencies = []
+    pending = iter(range(requests))
+
+    async def worker():
+        for index in pending:
+            headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+            started_at = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            if response.status_code != 200:
+                raise SystemExit(f"{path}: ответ {response.status_code}")
+
+    with count_queries() as stats:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+    latencies.sort()
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p95_ms": percentile(latencies, 95),
+        "queries": round(stats.count / requests, 2),
+    }
+
+
+async def measure(args) -> Dict[str, Dict[str, dict]]:
+    await prepare_database()
+    tokens = await prepare_tokens(args.students)
+    maxsize = principal_cache.maxsize
+    results: Dict[str, Dict[str, dict]] = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path in ENDPOINTS:
+            results[path] = {}
+            for mode, size in [("без кэша", 0), ("с кэшем", maxsize)]:
+                principal_cache.invalidate()
+                principal_cache.maxsize = size
+                try:
+                    # Прогрев: соединения пула и, в режиме с кэшем, сам кэш
+                    await run(client, path, tokens, len(tokens), args.concurrency)
+                    results[path][mode] = await run(client, path, tokens, args.requests, args.concurrency)
+                finally:
+                    principal_cache.maxsize = maxsize
+    await engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запросы в секунду с кэшем пользователей и без него")
+    parser.add_argument("--students", type=int, default=50, help="пользователей с токенами")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов к каждому эндпоинту в режиме")
+    # Без кэша запрос к /profile/student держит два соединения (users и сессия
+    # чтения), поэтому параллельность не больше половины пула DB_POOL_SIZE + DB_MAX_OVERFLOW
+    parser.add_argument("--concurrency", type=int, default=6)
+    args = parser.parse_args()
+
+    results = asyncio.run(measure(args))
+    failed = False
+    for path, modes in results.items():
+        for mode, summary in modes.items():
+            print(f"{path:<18} {mode:<9} {summary['rps']:>8} запросов/с  p95 {summary['p95_ms']:>7} мс  "
+                  f"SQL-запросов на вызов: {summary['queries']}")
+        cold, warm = modes["без кэша"], modes["с кэшем"]
+        if warm["queries"] >= cold["queries"]:
+            print(f"{path}: с кэшем SQL-запросов не меньше, чем без него")
+            failed = True
+        if warm["rps"] < cold["rps"]:
+            print(f"{path}: с кэшем пропускная способность ниже, чем без него")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("Кэш пользователей убирает чтение users из аутентифицированных запросов")
@@ -0,0 +1,130 @@
+"""
+Бюджеты SQL-запросов горячих эндпоинтов: каждый вызов проверяется
+app.core.profiling.assert_max_queries на маленьких и больших данных,
+и бюджет одинаков для обоих размеров.
+
+- GET /management/{club_id}/students - кружки на 10 и 1000 участников;
+- GET /profile/student и /profile/student/conflicts - студент в 1 и в 30 кружках;
+- GET /profile/teacher - преподаватель с 1 и с 30 кружками.
+
+Кэш пользователей сбрасывается перед каждым вызовом, поэтому бюджет
+покрывает первый запрос с токеном. Код выхода 1 при превышении бюджета.
+
+Данные добавляются в базу из DATABASE_URL, поэтому запуск - на отдельной
+базе, из каталога backend:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.query_budgets
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import time as time_of_day
+from typing import List, Tuple
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import principal_cache
+from app.core.profiling import assert_max_queries
+from app.db.database import async_session, engine
+from app.db.models import User, ClubMembership, AttendanceStats, Schedule
+from app.db.schedule import WEEKDAYS, DEFAULT_DURATION_MINUTES, schedule_slot
+from app.main import app
+from benchmarks.loadtest import issue_token
+from benchmarks.roster_queries import prepare_database, create_teacher, create_club
+
+# Допустимое число SQL-запросов на вызов, не зависящее от объема данных
+BUDGETS = {
+    "GET /management/{club_id}/students": 3,
+    "GET /profile/student": 4,
+    "GET /profile/student/conflicts": 2,
+    "GET /profile/teacher": 2,
+}
+
+
+async def create_student(session: AsyncSession, prefix: str, club_ids: List[int]) -> dict:
+    """Студент, записанный в club_ids, с посещениями и расписанием этих кружков"""
+    username = f"{prefix}-student-{len(club_ids)}"
+    student_id = await session.scalar(
+        insert(User).values(username=username, full_name="Студент", password_hash="-").returning(User.id)
+    )
+    await session.execute(insert(ClubMembership), [
+        {"club_id": club_id, "student_id": student_id} for club_id in club_ids
+    ])
+    await session.execute(insert(AttendanceStats), [
+        {"club_id": club_id, "student_id": student_id, "visits": 1} for club_id in club_ids
+    ])
+    schedule_rows = []
+    for index, club_id in enumerate(club_ids):
+        for weekday in (index % 6, (index + 2) % 6):
+            start_time = time_of_day(9 + index % 10, 0)
+            schedule_rows.append({
+                "club_id": club_id,
+                "day_of_week": WEEKDAYS[weekday],
+                "start_time": start_time,
+                "location": f"Ауд. {100 + index}",
+                "duration_minutes": DEFAULT_DURATION_MINUTES,
+                **schedule_slot(WEEKDAYS[weekday], start_time, DEFAULT_DURATION_MINUTES),
+            })
+    await session.execute(insert(Schedule), schedule_rows)
+    return {"id": student_id, "username": username, "is_teacher": False}
+
+
+async def prepare_calls(roster_sizes: List[int], club_counts: List[int]) -> List[Tuple[str, str, str, str]]:
+    """(эндпоинт, размер данных, путь, токен) для всех проверок"""
+    prefix = f"budgets-{time.time_ns()}"
+    calls = []
+    async with async_session() as session:
+        teacher = await create_teacher(session, f"{prefix}-roster")
+        for size in roster_sizes:
+            club_id = await create_club(session, teacher["id"], f"{prefix}-roster", size)
+            calls.append(("GET /management/{club_id}/students", f"{size} участников",
+                          f"/management/{club_id}/students", issue_token(teacher)))
+
+        for count in club_counts:
+            owner = await create_teacher(session, f"{prefix}-{count}")
+            club_ids = [
+                await create_club(session, owner["id"], f"{prefix}-{count}-{index}", 1, sessions=1)
+                for index in range(count)
+            ]
+            student = await create_student(session, prefix, club_ids)
+            for name, path in [("GET /profile/student", "/profile/student"),
+                               ("GET /profile/student/conflicts", "/profile/student/conflicts")]:
+                calls.append((name, f"{count} кружков", path, issue_token(student)))
+            calls.append(("GET /profile/teacher", f"{count} кружков", "/profile/teacher", issue_token(owner)))
+        await session.commit()
+    return calls
+
+
+async def check_budgets(args) -> List[str]:
+    await prepare_database()
+    calls = await prepare_calls(args.roster_sizes, args.club_counts)
+    failures = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name, size, path, token in calls:
+            # Пользователь разрешается заново, как в первом запросе с токеном
+            principal_cache.invalidate()
+            try:
+                with assert_max_queries(BUDGETS[name]) as stats:
+                    response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+            except AssertionError as error:
+                failures.append(f"{name}, {size}: {error}")
+                continue
+            print(f"{name:<36} {size:<16} SQL-запросов: {stats.count} (бюджет {BUDGETS[name]})")
+            if response.status_code != 200:
+                failures.append(f"{name}, {size}: ответ {response.status_code}")
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бюджеты SQL-запросов горячих эндпоинтов")
+    parser.add_argument("--roster-sizes", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--club-counts", type=int, nargs="+", default=[1, 30])
+    args = parser.parse_args()
+
+    failures = asyncio.run(check_budgets(args))
+    for failure in failures:
+        print(f"\n{failure}")
+    if failures:
+        sys.exit(1)
+    print("Все эндпоинты уложились в бюджет SQL-запросов")
@@ -0,0 +1,164 @@
+"""
+Проверка планов запросов: горячие запросы эндпоинтов не должны читать
+attendances, club_memberships и schedules полным перебором.
+
+База наполняется app.db.seed (по умолчанию около миллиона отметок
+посещаемости; если пользователи с --prefix уже есть, данные переиспользуются).
+Затем эндпоинты вызываются через ASGI, каждый выполненный SELECT
+пропускается через EXPLAIN QUERY PLAN (SQLite) или EXPLAIN (PostgreSQL),
+и полный перебор этих таблиц считается ошибкой: код выхода 1.
+
+Запуск из каталога backend на отдельной базе:
+    DATABASE_URL=sqlite+aiosqlite:///plans.db python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --weeks 10 --verbose
+"""
+import argparse
+import asyncio
+import re
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+import httpx
+from sqlalchemy import event, select, func
+from app.core.cache import catalogue_cache, principal_cache
+from app.db.database import async_session, engine
+from app.db.models import Attendance, ClubMembership, User
+from app.db.seed import seed
+from app.main import app
+from benchmarks.loadtest import load_fixtures
+from benchmarks.roster_queries import prepare_database
+
+WATCHED_TABLES = ("attendances", "club_memberships", "schedules")
+
+# Строка плана с полным перебором таблицы (в том числе под псевдонимом вида schedules_1)
+FULL_SCAN = {
+    "sqlite": re.compile(rf"^SCAN ({'|'.join(WATCHED_TABLES)})(_\d+)?\b"),
+    "postgresql": re.compile(rf"Seq Scan on ({'|'.join(WATCHED_TABLES)})\b"),
+}
+EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+
+
+class StatementRecorder:
+    """Запоминает SELECT-выражения с параметрами, выполненные внутри блока"""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, object]] = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statements.append((statement, parameters))
+
+
+async def explain(statement: str, parameters) -> List[str]:
+    dialect = engine.dialect.name
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(EXPLAIN_PREFIX[dialect] + statement, parameters)
+        rows = result.all()
+    # SQLite: (id, parent, notused, detail), PostgreSQL: одна колонка с текстом
+    return [row[-1] for row in rows]
+
+
+async def endpoint_calls(fixtures) -> List[Tuple[str, str, str, dict, dict]]:
+    """(название, метод, путь, заголовки, аргументы запроса) для горячих эндпоинтов"""
+    student = fixtures.students[0]
+    teacher = fixtures.teachers[0]
+    club_id = teacher["clubs"][0]
+    async with async_session() as session:
+        # Кружок, в котором студент не состоит, - для записи и выхода
+        other_club_id = await session.scalar(
+            select(func.min(ClubMembership.club_id)).where(ClubMembership.club_id.not_in(
+                select(ClubMembership.club_id).where(ClubMembership.student_id == student["id"])
+            ))
+        )
+        member_ids = (await session.execute(
+            select(ClubMembership.student_id).where(ClubMembership.club_id == club_id).limit(5)
+        )).scalars().all()
+    student_auth = {"Authorization": f"Bearer {student['token']}"}
+    teacher_auth = {"Authorization": f"Bearer {teacher['token']}"}
+    return [
+        ("GET /clubs/", "GET", "/clubs/", {},
+         {"params": {"day_of_week": "Среда", "has_free_seats": "true", "limit": 20}}),
+        ("GET /clubs/search", "GET", "/clubs/search", {}, {"params": {"q": "шах"}}),
+        ("GET /clubs/{club_id}", "GET", f"/clubs/{club_id}", student_auth, {}),
+        ("GET /profile/student", "GET", "/profile/student", student_auth, {}),
+        ("GET /profile/student/conflicts", "GET", "/profile/student/conflicts", student_auth, {}),
+        ("GET /management/{club_id}/students", "GET", f"/management/{club_id}/students", teacher_auth, {}),
+        ("GET /management/{club_id}/attendance/export", "GET",
+         f"/management/{club_id}/attendance/export", teacher_auth,
+         {"params": {"format": "csv", "date_from": (date.today() - timedelta(weeks=2)).isoformat()}}),
+        ("POST /management/{club_id}/attendance/bulk", "POST",
+         f"/management/{club_id}/attendance/bulk", teacher_auth,
+         {"json": {"date": (date.today() + timedelta(days=400)).isoformat(),
+                   "student_ids": member_ids[:3], "absent_ids": member_ids[3:]}}),
+        ("POST /clubs/{club_id}/join", "POST", f"/clubs/{other_club_id}/join", student_auth, {}),
+        ("DELETE /clubs/{club_id}/leave", "DELETE", f"/clubs/{other_club_id}/leave", student_auth, {}),
+    ]
+
+
+async def check_plans(args) -> Dict[str, List[str]]:
+    await prepare_database()
+    async with async_session() as session:
+        seeded = await session.scalar(select(func.count(User.id)).where(User.username.like(f"{args.prefix}-%")))
+    if not seeded:
+        print("Наполнение базы...")
+        print(await seed(
+            teachers=args.teachers, clubs=args.clubs, students=args.students,
+            memberships_per_student=2, weeks=args.weeks, skew=1.0, attendance_rate=0.75,
+            seed_value=1, prefix=args.prefix, password="password123", bcrypt_rounds=4
+        ))
+    async with async_session() as session:
+        print(f"Отметок посещаемости в базе: {await session.scalar(select(func.count(Attendance.id)))}")
+
+    fixtures = await load_fixtures(args.prefix, 10)
+    recorder = StatementRecorder()
+    event.listen(engine.sync_engine, "before_cursor_execute", recorder)
+    pattern = FULL_SCAN[engine.dialect.name]
+    failures = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://plans") as client:
+        for name, method, path, headers, request_args in await endpoint_calls(fixtures):
+            # Без кэшей, чтобы выполнились все запросы эндпоинта
+            catalogue_cache.invalidate()
+            principal_cache.invalidate()
+            recorder.statements.clear()
+            recorder.active = True
+            response = await client.request(method, path, headers=headers, **request_args)
+            recorder.active = False
+            print(f"{name}: {response.status_code}, SELECT-запросов: {len(recorder.statements)}")
+            if response.status_code >= 500:
+                failures.setdefault(name, []).append(f"ответ {response.status_code}: {response.text[:200]}")
+
+            for statement, parameters in list(recorder.statements):
+                plan = await explain(statement, parameters)
+                scans = [line for line in plan if pattern.search(line.strip())]
+                if scans:
+                    failures.setdefault(name, []).append(f"{' '.join(statement.split())}\n    " + "\n    ".join(plan))
+                if args.verbose:
+                    print(f"  {' '.join(statement.split())[:150]}")
+                    for line in plan:
+                        print(f"    {line}")
+
+    event.remove(engine.sync_engine, "before_cursor_execute", recorder)
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка планов горячих запросов на полный перебор таблиц")
+    parser.add_argument("--prefix", default="plans", help="префикс пользователей app.db.seed")
+    parser.add_argument("--teachers", type=int, default=40)
+    parser.add_argument("--clubs", type=int, default=400)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--weeks", type=int, default=160, help="недель истории (160 - около 1 млн отметок)")
+    parser.add_argument("--verbose", action="store_true", help="печатать все планы")
+    args = parser.parse_args()
+
+    failures = asyncio.run(check_plans(args))
+    for name, statements in failures.items():
+        print(f"\nПолный перебор в {name}:")
+        for statement in statements:
+            print(f"  {statement}")
+    if failures:
+        sys.exit(1)
+    print(f"Полных переборов {', '.join(WATCHED_TABLES)} нет")
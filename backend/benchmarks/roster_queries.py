@@ -0,0 +1,121 @@
+"""
+Проверка: таблица посещаемости кружка (GET /management/{club_id}/students)
+строится одним и тем же числом SQL-запросов при любом числе участников.
+
+Для каждого размера создается кружок с участниками, проведенными занятиями
+и сводкой посещений, запрос выполняется через ASGI, и число SQL-запросов
+сравнивается между размерами. Код выхода 1, если оно растет с размером.
+
+Данные добавляются в базу из DATABASE_URL, поэтому запуск - на отдельной
+базе, из каталога backend:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.roster_queries
+    python -m benchmarks.roster_queries --sizes 10 100 1000 5000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from typing import List
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import principal_cache
+from app.core.profiling import count_queries
+from app.db.database import async_session, engine
+from app.db.models import Base, User, Club, ClubMembership, ClubSession, AttendanceStats
+from app.db.search import create_search_index
+from app.main import app
+from benchmarks.loadtest import issue_token
+
+
+async def prepare_database():
+    """Создает таблицы, если база пустая"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
+
+
+async def create_teacher(session: AsyncSession, prefix: str) -> dict:
+    username = f"{prefix}-teacher"
+    teacher_id = await session.scalar(
+        insert(User).values(
+            username=username, full_name="Преподаватель", password_hash="-", is_teacher=True
+        ).returning(User.id)
+    )
+    return {"id": teacher_id, "username": username, "is_teacher": True}
+
+
+async def create_club(session: AsyncSession, owner_id: int, prefix: str, members: int,
+                      sessions: int = 30) -> int:
+    """Кружок с members участниками, sessions занятиями и сводкой посещений"""
+    club_id = await session.scalar(
+        insert(Club).values(
+            title=f"{prefix} {members}", category="Связь", max_students=members,
+            current_students=members, sessions_count=sessions, owner_id=owner_id
+        ).returning(Club.id)
+    )
+    student_ids = (await session.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [
+            {"username": f"{prefix}-{club_id}-{index}", "full_name": f"Студент {index}", "password_hash": "-"}
+            for index in range(members)
+        ]
+    )).scalars().all()
+    await session.execute(insert(ClubMembership), [
+        {"club_id": club_id, "student_id": student_id, "joined_at": date.today()}
+        for student_id in student_ids
+    ])
+    await session.execute(insert(ClubSession), [
+        {"club_id": club_id, "date": date.today() - timedelta(days=day)} for day in range(sessions)
+    ])
+    await session.execute(insert(AttendanceStats), [
+        {"club_id": club_id, "student_id": student_id, "visits": index % (sessions + 1)}
+        for index, student_id in enumerate(student_ids)
+    ])
+    return club_id
+
+
+async def measure(sizes: List[int]) -> List[dict]:
+    await prepare_database()
+    prefix = f"roster-{time.time_ns()}"
+    async with async_session() as session:
+        teacher = await create_teacher(session, prefix)
+        clubs = [(size, await create_club(session, teacher["id"], prefix, size)) for size in sizes]
+        await session.commit()
+
+    headers = {"Authorization": f"Bearer {issue_token(teacher)}"}
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for size, club_id in clubs:
+            # Пользователь разрешается заново, как в первом запросе с токеном
+            principal_cache.invalidate()
+            with count_queries() as stats:
+                response = await client.get(f"/management/{club_id}/students", headers=headers)
+            results.append({
+                "members": size,
+                "status": response.status_code,
+                "rows": len(response.json()) if response.status_code == 200 else None,
+                "queries": stats.count,
+            })
+    await engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Число SQL-запросов таблицы посещаемости по размерам кружка")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    results = asyncio.run(measure(args.sizes))
+    for result in results:
+        print(f"участников: {result['members']:>6}  строк: {result['rows']}  SQL-запросов: {result['queries']}")
+
+    failed = [result for result in results if result["status"] != 200 or result["rows"] != result["members"]]
+    if failed:
+        print(f"Ошибка ответа: {failed}")
+        sys.exit(1)
+    if len({result["queries"] for result in results}) > 1:
+        print("Число SQL-запросов зависит от числа участников")
+        sys.exit(1)
+    print("Число SQL-запросов не зависит от числа участников")
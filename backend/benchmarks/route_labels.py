@@ -0,0 +1,67 @@
+"""
+Проверка меток route в метриках /metrics: запросы к разным маршрутам
+попадают в ряды с полными шаблонами, включая префикс роутера
+(/health/ и /clubs/ - разные ряды, /clubs/1 и /clubs/2 - один).
+
+Запросы выполняются через ASGI к приложению, затем разбирается
+REGISTRY.render(). Код выхода 1, если метка не совпала с ожидаемой.
+
+Запуск из каталога backend на отдельной базе:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.route_labels
+"""
+import asyncio
+import re
+import sys
+from typing import Dict, List
+import httpx
+from app.core.metrics import REGISTRY
+from app.db.database import engine
+from app.main import app
+from benchmarks.roster_queries import prepare_database
+
+# Путь запроса и шаблон маршрута, который должен оказаться в метке route
+EXPECTED = [
+    ("/health/", "/health/"),
+    ("/clubs/", "/clubs/"),
+    ("/clubs/1", "/clubs/{club_id}"),
+    ("/clubs/2", "/clubs/{club_id}"),
+    ("/profile/student", "/profile/student"),
+    ("/management/1/students", "/management/{club_id}/students"),
+    ("/no-such-route", "unmatched"),
+]
+
+SAMPLE = re.compile(r'^http_requests_total\{method="GET",route="([^"]*)",status="\d+"\} (\d+)$')
+
+
+def requests_by_route() -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for line in REGISTRY.render().splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            counts[match.group(1)] = counts.get(match.group(1), 0) + int(match.group(2))
+    return counts
+
+
+async def check_labels() -> List[str]:
+    await prepare_database()
+    failures = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path, template in EXPECTED:
+            before = requests_by_route()
+            await client.get(path)
+            after = requests_by_route()
+            changed = sorted(route for route in after if after[route] != before.get(route, 0))
+            print(f"{path:<26} route={changed}")
+            if changed != [template]:
+                failures.append(f"{path}: ожидалась метка {template}, получено {changed}")
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    failures = asyncio.run(check_labels())
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("Метки route совпадают с полными шаблонами маршрутов")
@@ -0,0 +1,121 @@
+"""
+Проверка: пересечение расписания нельзя обойти через очередь ожидания.
+
+Кружок A (Понедельник 10:00-11:30, одно место, занято) и кружок B
+(Понедельник 10:30-12:00):
+- студент из B не может встать в очередь A;
+- студент, вставший в очередь A до записи в B, при освобождении места
+  удаляется из очереди, а место получает следующий в очереди;
+- повторная запись в свой кружок дает ошибку "уже записаны", а не
+  пересечение расписания.
+
+Запросы выполняются через ASGI. Код выхода 1 при нарушении.
+Данные добавляются в базу из DATABASE_URL, поэтому запуск - на отдельной
+базе, из каталога backend:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.waitlist_conflicts
+"""
+import asyncio
+import sys
+import time
+from datetime import time as time_of_day
+from typing import List
+import httpx
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import async_session, engine
+from app.db.models import User, Club, ClubMembership, Schedule, WaitlistEntry
+from app.db.schedule import schedule_slot
+from app.main import app
+from benchmarks.loadtest import issue_token
+from benchmarks.roster_queries import prepare_database, create_teacher
+
+
+async def create_students(session: AsyncSession, prefix: str, count: int) -> List[dict]:
+    student_ids = (await session.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [{"username": f"{prefix}-{index}", "full_name": f"Студент {index}", "password_hash": "-"}
+         for index in range(count)]
+    )).scalars().all()
+    return [
+        {"id": student_id, "username": f"{prefix}-{index}", "is_teacher": False}
+        for index, student_id in enumerate(student_ids)
+    ]
+
+
+async def create_scheduled_club(session: AsyncSession, owner_id: int, title: str, max_students: int,
+                                start_time: time_of_day) -> int:
+    club_id = await session.scalar(
+        insert(Club).values(title=title, category="Связь", max_students=max_students, owner_id=owner_id)
+        .returning(Club.id)
+    )
+    await session.execute(insert(Schedule).values(
+        club_id=club_id, day_of_week="Понедельник", start_time=start_time, location=f"Ауд. {club_id}",
+        duration_minutes=90, **schedule_slot("Понедельник", start_time, 90)
+    ))
+    return club_id
+
+
+async def check() -> List[str]:
+    await prepare_database()
+    prefix = f"waitlist-{time.time_ns()}"
+    async with async_session() as session:
+        teacher = await create_teacher(session, prefix)
+        club_a = await create_scheduled_club(session, teacher["id"], f"{prefix} A", 1, time_of_day(10, 0))
+        club_b = await create_scheduled_club(session, teacher["id"], f"{prefix} B", 10, time_of_day(10, 30))
+        member, late, queued, next_in_line = await create_students(session, prefix, 4)
+        await session.commit()
+
+    failures = []
+
+    def expect(name: str, response: httpx.Response, status_code: int, detail_part: str = ""):
+        detail = response.json().get("detail", "") if response.status_code >= 400 else ""
+        if response.status_code != status_code or detail_part not in detail:
+            failures.append(f"{name}: ответ {response.status_code} {response.text}")
+
+    def auth(user: dict) -> dict:
+        return {"Authorization": f"Bearer {issue_token(user)}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        expect("запись в A", await client.post(f"/clubs/{club_a}/join", headers=auth(member)), 200)
+
+        # Постановка в очередь проверяет расписание
+        expect("запись в B", await client.post(f"/clubs/{club_b}/join", headers=auth(late)), 200)
+        expect("очередь A из B", await client.post(f"/clubs/{club_a}/waitlist", headers=auth(late)),
+               400, "пересекается")
+
+        # Перевод из очереди пропускает студента, записавшегося с тех пор в B
+        expect("очередь A", await client.post(f"/clubs/{club_a}/waitlist", headers=auth(queued)), 200)
+        expect("очередь A, второй", await client.post(f"/clubs/{club_a}/waitlist", headers=auth(next_in_line)), 200)
+        expect("запись в B из очереди A", await client.post(f"/clubs/{club_b}/join", headers=auth(queued)), 200)
+        expect("выход из A", await client.delete(f"/clubs/{club_a}/leave", headers=auth(member)), 200)
+
+        response = await client.get("/profile/student/conflicts", headers=auth(queued))
+        if response.status_code != 200 or response.json():
+            failures.append(f"пересечения после перевода из очереди: {response.text}")
+
+        # Повторная запись - "уже записаны", даже если расписание пересекается
+        expect("повторная запись в B", await client.post(f"/clubs/{club_b}/join", headers=auth(queued)),
+               400, "уже записаны")
+
+    async with async_session() as session:
+        members_a = set((await session.execute(
+            select(ClubMembership.student_id).where(ClubMembership.club_id == club_a)
+        )).scalars().all())
+        waitlist_a = set((await session.execute(
+            select(WaitlistEntry.student_id).where(WaitlistEntry.club_id == club_a)
+        )).scalars().all())
+    if members_a != {next_in_line["id"]}:
+        failures.append(f"участники A после освобождения места: {members_a}, ожидался {next_in_line['id']}")
+    if waitlist_a:
+        failures.append(f"в очереди A остались: {waitlist_a}")
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    failures = asyncio.run(check())
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("Очередь ожидания не обходит проверку расписания")
@@ -0,0 +1,131 @@
+"""
+Проверка позиций в очереди ожидания (app.db.waitlist).
+
+1. Через ASGI: студенты встают в очередь заполненного кружка, часть уходит из
+   середины, освободившееся место получает голова. После каждого шага
+   GET /clubs/{club_id}/waitlist у всех оставшихся - 1, 2, 3... в порядке
+   постановки.
+2. На очереди из --queue-length записей позиция первого и последнего
+   студента считается одинаково быстро: медиана последнего не больше
+   --max-growth медиан первого.
+
+Код выхода 1 при нарушении. Данные добавляются в базу из DATABASE_URL,
+поэтому запуск - на отдельной базе, из каталога backend:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.waitlist_positions
+    python -m benchmarks.waitlist_positions --queue-length 50000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import date, time as time_of_day
+from typing import List
+import httpx
+from sqlalchemy import insert
+from app.db.database import async_session, engine
+from app.db.models import WaitlistEntry
+from app.db.waitlist import waitlist_position
+from app.main import app
+from benchmarks.loadtest import issue_token
+from benchmarks.roster_queries import prepare_database, create_teacher
+from benchmarks.waitlist_conflicts import create_students, create_scheduled_club
+
+
+async def check_positions(prefix: str) -> List[str]:
+    async with async_session() as session:
+        teacher = await create_teacher(session, prefix)
+        club_id = await create_scheduled_club(session, teacher["id"], f"{prefix} очередь", 1, time_of_day(10, 0))
+        member, *queued = await create_students(session, prefix, 9)
+        await session.commit()
+
+    failures = []
+
+    def auth(user: dict) -> dict:
+        return {"Authorization": f"Bearer {issue_token(user)}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def expect_positions(step: str, students: List[dict]):
+            for expected, student in enumerate(students, start=1):
+                response = await client.get(f"/clubs/{club_id}/waitlist", headers=auth(student))
+                position = response.json().get("position") if response.status_code == 200 else response.text
+                if position != expected:
+                    failures.append(f"{step}: у {student['username']} позиция {position}, ожидалась {expected}")
+
+        await client.post(f"/clubs/{club_id}/join", headers=auth(member))
+        for expected, student in enumerate(queued, start=1):
+            response = await client.post(f"/clubs/{club_id}/waitlist", headers=auth(student))
+            if response.json().get("position") != expected:
+                failures.append(f"постановка {student['username']}: ответ {response.text}, ожидалась {expected}")
+        await expect_positions("после постановки", queued)
+
+        for student in (queued[2], queued[5]):
+            await client.delete(f"/clubs/{club_id}/waitlist", headers=auth(student))
+        queued = [student for index, student in enumerate(queued) if index not in (2, 5)]
+        await expect_positions("после выхода из середины", queued)
+
+        await client.delete(f"/clubs/{club_id}/leave", headers=auth(member))
+        queued = queued[1:]
+        await expect_positions("после перевода головы в кружок", queued)
+
+        await client.delete(f"/clubs/{club_id}/waitlist", headers=auth(queued[-1]))
+        queued = queued[:-1]
+        await expect_positions("после выхода из хвоста", queued)
+    return failures
+
+
+async def time_positions(prefix: str, queue_length: int, repeats: int) -> dict:
+    async with async_session() as session:
+        teacher = await create_teacher(session, f"{prefix}-long")
+        club_id = await create_scheduled_club(session, teacher["id"], f"{prefix} длинная очередь", 1,
+                                              time_of_day(12, 0))
+        students = await create_students(session, f"{prefix}-long", queue_length)
+        await session.execute(insert(WaitlistEntry), [
+            {"club_id": club_id, "student_id": student["id"], "seq": seq, "created_at": date.today()}
+            for seq, student in enumerate(students, start=1)
+        ])
+        await session.commit()
+
+    timings = {}
+    async with async_session() as session:
+        for name, student in [("первый", students[0]), ("последний", students[-1])]:
+            samples = []
+            for _ in range(repeats):
+                started_at = time.perf_counter()
+                position = await waitlist_position(session, club_id, student["id"])
+                samples.append((time.perf_counter() - started_at) * 1000)
+            timings[name] = {"position": position, "median_ms": round(statistics.median(samples), 3)}
+    return timings
+
+
+async def check(args) -> List[str]:
+    await prepare_database()
+    prefix = f"positions-{time.time_ns()}"
+    failures = await check_positions(prefix)
+
+    timings = await time_positions(prefix, args.queue_length, args.repeats)
+    for name, timing in timings.items():
+        print(f"очередь {args.queue_length}: {name:<9} позиция {timing['position']:>7}  "
+              f"медиана {timing['median_ms']} мс")
+    if timings["последний"]["position"] != args.queue_length:
+        failures.append(f"позиция последнего {timings['последний']['position']}, ожидалась {args.queue_length}")
+    growth = timings["последний"]["median_ms"] / max(timings["первый"]["median_ms"], 0.001)
+    if growth > args.max_growth:
+        failures.append(f"позиция последнего считается в {growth:.1f} раза дольше, чем первого")
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Позиции в очереди ожидания")
+    parser.add_argument("--queue-length", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=200, help="замеров позиции каждого студента")
+    parser.add_argument("--max-growth", type=float, default=2.0)
+    args = parser.parse_args()
+
+    failures = asyncio.run(check(args))
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print("Позиции в очереди идут подряд и не зависят от длины очереди")
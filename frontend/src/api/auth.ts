@@ -39,12 +39,30 @@ export const removeToken = () => {
     localStorage.removeItem("access_token");
 };
 
+// Отметка записи от сервера: до этого момента чтения идут на основную базу,
+// и после записи в кружок или отметки посещаемости виден новый результат
+const READ_PRIMARY_HEADER = "X-Read-Primary-Until";
+
+export const rememberWrite = (response: Response) => {
+    const until = response.headers.get(READ_PRIMARY_HEADER);
+    if (until) {
+        localStorage.setItem("read_primary_until", until);
+    }
+};
+
+const getReadPrimaryUntil = (): string | null => {
+    const until = localStorage.getItem("read_primary_until");
+    return until && Number(until) * 1000 > Date.now() ? until : null;
+};
+
 // Получение заголовков с токеном
 export const getAuthHeaders = () => {
     const token = getToken();
+    const readPrimaryUntil = getReadPrimaryUntil();
     return {
         "Content-Type": "application/json",
         ...(token && { Authorization: `Bearer ${token}` }),
+        ...(readPrimaryUntil && { [READ_PRIMARY_HEADER]: readPrimaryUntil }),
     };
 };
 
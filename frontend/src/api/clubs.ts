@@ -1,4 +1,4 @@
-import { getAuthHeaders } from "./auth";
+import { getAuthHeaders, rememberWrite } from "./auth";
 
 const API_BASE_URL = "http://localhost:8000";
 
@@ -72,6 +72,8 @@ export const createClub = async (data: CreateClubRequest): Promise<Club> => {
         body: JSON.stringify(data),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Failed to create club");
@@ -86,6 +88,8 @@ export const joinClub = async (clubId: number): Promise<void> => {
         headers: getAuthHeaders(),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Ошибка записи на кружок");
@@ -98,6 +102,8 @@ export const leaveClub = async (clubId: number): Promise<void> => {
         headers: getAuthHeaders(),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Ошибка отписки от кружка");
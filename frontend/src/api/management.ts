@@ -1,4 +1,4 @@
-import { getAuthHeaders } from "./auth";
+import { getAuthHeaders, rememberWrite } from "./auth";
 
 const API_BASE_URL = "http://localhost:8000";
 
@@ -61,6 +61,8 @@ export const markAttendance = async (clubId: number, data: MarkAttendanceRequest
         body: JSON.stringify(data),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Failed to mark attendance");
@@ -87,6 +89,8 @@ export const updateClubSettings = async (clubId: number, settings: ClubSettingsU
         body: JSON.stringify(settings),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Failed to update settings");
@@ -100,6 +104,8 @@ export const addScheduleItem = async (clubId: number, schedule: ScheduleItemCrea
         body: JSON.stringify(schedule),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Failed to add schedule item");
@@ -112,6 +118,8 @@ export const deleteScheduleItem = async (clubId: number, scheduleId: number): Pr
         headers: getAuthHeaders(),
     });
 
+    rememberWrite(response);
+
     if (!response.ok) {
         const error = await response.json();
         throw new Error(error.detail || "Failed to delete schedule item");